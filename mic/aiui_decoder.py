@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+AIUI V3 响应解码器
+信封只解析一次，按payload键查表分发给已注册的处理函数，
+嵌套的base64/JSON仅对有订阅者的键解码
+"""
+
+import binascii
+import json
+from collections import deque
+
+
+# payload键 → 解码方式
+#   text:  base64 → utf-8文本
+#   json:  base64 → utf-8 → JSON对象
+#   audio: base64 → bytes（binascii直接解码，不经过中间str）
+PAYLOAD_DECODERS = {
+    'event': 'text',
+    'iat': 'json',
+    'cbm_tidy': 'json',
+    'cbm_intent_domain': 'text',
+    'cbm_semantic': 'json',
+    'nlp': 'text',
+    'tts': 'audio',
+}
+
+
+class AIUIFrame:
+    """一条AIUI响应消息"""
+
+    __slots__ = ('header', 'payload', 'parameter')
+
+    def __init__(self, header, payload, parameter):
+        self.header = header
+        self.payload = payload
+        self.parameter = parameter
+
+    @property
+    def code(self):
+        return self.header.get('code', 0)
+
+    @property
+    def sid(self):
+        return self.header.get('sid')
+
+    @property
+    def status(self):
+        return self.header.get('status')
+
+    def intent_index(self, key):
+        """获取某个结果所属的意图序号
+
+        Args:
+            key: payload键，如 cbm_semantic
+
+        Returns:
+            意图序号，没有时返回 "-"
+        """
+        if key in self.parameter:
+            return self.parameter[key]['loc']['intent']
+
+        return "-"
+
+
+class AIUIResponseDecoder:
+    """表驱动的AIUI响应解码器"""
+
+    def __init__(self):
+        self._handlers = {}
+        self._frame_handlers = []
+        self._error_handlers = []
+
+        # 已取消的会话（如被打断的上一轮），其后续消息直接丢弃
+        self._dropped_sids = deque(maxlen=16)
+
+    def subscribe(self, key, handler):
+        """订阅某个payload键
+
+        Args:
+            key: payload键，如 iat、nlp、tts
+            handler: 处理函数 handler(data, block, frame)
+                data: 解码后的数据（str / dict / bytes）
+                block: payload中该键对应的原始字典（含status等字段）
+                frame: AIUIFrame
+        """
+        self._handlers.setdefault(key, []).append(handler)
+
+    def unsubscribe(self, key, handler):
+        """取消订阅"""
+        handlers = self._handlers.get(key)
+        if handlers and handler in handlers:
+            handlers.remove(handler)
+            if not handlers:
+                del self._handlers[key]
+
+    def on_frame(self, handler):
+        """注册整帧处理函数 handler(frame)，在payload分发之后调用"""
+        self._frame_handlers.append(handler)
+
+    def on_error(self, handler):
+        """注册错误处理函数 handler(frame)，header.code非0时调用"""
+        self._error_handlers.append(handler)
+
+    def drop_session(self, sid):
+        """丢弃某个会话之后的所有消息（不再解码和分发）
+
+        Args:
+            sid: 服务端返回的会话ID
+        """
+        if sid and sid not in self._dropped_sids:
+            self._dropped_sids.append(sid)
+
+    def feed(self, message):
+        """解码一条WebSocket消息并分发
+
+        Args:
+            message: WebSocket收到的原始字符串
+
+        Returns:
+            AIUIFrame
+        """
+        data = json.loads(message)
+        frame = AIUIFrame(data.get('header', {}),
+                          data.get('payload', {}),
+                          data.get('parameter', {}))
+
+        if frame.sid in self._dropped_sids:
+            return frame
+
+        if frame.code != 0:
+            for handler in self._error_handlers:
+                handler(frame)
+            return frame
+
+        for key, block in frame.payload.items():
+            handlers = self._handlers.get(key)
+            if not handlers:
+                continue
+
+            # 处理函数（如本地指令）可能刚丢弃了这个会话，同一消息中剩余的结果也不再分发
+            if frame.sid in self._dropped_sids:
+                return frame
+
+            value = self._decode(key, block)
+            for handler in handlers:
+                handler(value, block, frame)
+
+        for handler in self._frame_handlers:
+            handler(frame)
+
+        return frame
+
+    @staticmethod
+    def _decode(key, block):
+        """按解码表解码payload中的一个结果块"""
+        kind = PAYLOAD_DECODERS.get(key, 'text')
+
+        if kind == 'audio':
+            audio = block.get('audio')
+            if not audio:
+                return b''
+            return binascii.a2b_base64(audio)
+
+        text = block.get('text')
+        if text is None:
+            return None
+
+        raw = binascii.a2b_base64(text)
+        if kind == 'json':
+            return json.loads(raw)
+        return raw.decode('utf-8')
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+AIUI V3 协议公共函数
+鉴权URL生成与请求构造，两个客户端与文本请求池、批处理等工具共用
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+from datetime import datetime
+from time import mktime
+from urllib.parse import urlencode, urlparse
+from wsgiref.handlers import format_date_time
+
+
+# 默认TTS合成音频格式（PCM）
+DEFAULT_TTS_FORMAT = {
+    "channels": 1,
+    "bit_depth": 16,
+    "sample_rate": 16000,
+    "encoding": "raw"
+}
+
+
+def generate_auth_url(base_url, api_key, api_secret):
+    """生成AIUI鉴权URL
+
+    Args:
+        base_url: 接口地址，如 wss://aiui.xf-yun.com/v3/aiint/sos
+        api_key: 应用API Key
+        api_secret: 应用API Secret
+
+    Returns:
+        str: 带鉴权参数的握手URL
+    """
+    host = urlparse(base_url).netloc
+    path = urlparse(base_url).path
+
+    # 生成RFC1123格式时间戳
+    now = datetime.now()
+    date = format_date_time(mktime(now.timetuple()))
+
+    # 拼接签名原文
+    signature_origin = f"host: {host}\n"
+    signature_origin += f"date: {date}\n"
+    signature_origin += f"GET {path} HTTP/1.1"
+
+    # HMAC-SHA256加密
+    signature_sha = hmac.new(
+        api_secret.encode('utf-8'),
+        signature_origin.encode('utf-8'),
+        digestmod=hashlib.sha256
+    ).digest()
+
+    signature_sha_base64 = base64.b64encode(signature_sha).decode('utf-8')
+
+    # 生成authorization
+    authorization_origin = f'api_key="{api_key}", algorithm="hmac-sha256", ' \
+                           f'headers="host date request-line", signature="{signature_sha_base64}"'
+    authorization = base64.b64encode(authorization_origin.encode('utf-8')).decode('utf-8')
+
+    # 拼接URL参数
+    params = {
+        "host": host,
+        "date": date,
+        "authorization": authorization
+    }
+
+    return base_url + '?' + urlencode(params)
+
+
+def _parameter(vcn, tts_format):
+    """请求参数，tts_format为None时不请求TTS（本轮以nlp最终结果结束）"""
+    parameter = {
+        "nlp": {
+            "nlp": {
+                "compress": "raw",
+                "format": "json",
+                "encoding": "utf8"
+            },
+            "new_session": True
+        }
+    }
+    if tts_format is not None:
+        parameter["tts"] = {
+            "vcn": vcn,
+            "tts": tts_format
+        }
+    return parameter
+
+
+def build_audio_request(appid, sn, scene, vcn, stmid, status, audio_chunk,
+                        sample_rate=16000, channels=1, tts_format=None, encoding="raw", tts=True):
+    """构造音频请求
+
+    Args:
+        appid: 应用ID
+        sn: 设备序列号
+        scene: 场景
+        vcn: 发音人
+        stmid: 本轮交互的流ID
+        status: 帧状态 (0=首帧, 1=中间帧, 2=尾帧)
+        audio_chunk: 音频数据（16bit PCM或encoding对应的压缩数据）
+        sample_rate: 采样率
+        channels: 声道数
+        tts_format: TTS音频格式，None使用DEFAULT_TTS_FORMAT
+        encoding: 上行音频编码，如 raw、opus-wb
+        tts: 是否请求TTS合成，只需要识别和语义结果时为False
+
+    Returns:
+        str: JSON请求
+    """
+    return json.dumps({
+        "header": {
+            "appid": appid,
+            "sn": sn,
+            "stmid": stmid,
+            "status": status,
+            "scene": scene,
+            "interact_mode": "continuous"
+        },
+        "parameter": _parameter(vcn, (tts_format or DEFAULT_TTS_FORMAT) if tts else None),
+        "payload": {
+            "audio": {
+                "encoding": encoding,
+                "sample_rate": sample_rate,
+                "channels": channels,
+                "bit_depth": 16,
+                "status": status,
+                "audio": base64.b64encode(audio_chunk).decode()
+            }
+        }
+    })
+
+
+def build_text_request(appid, sn, scene, vcn, stmid, question, tts_format=None, tts=True):
+    """构造文本请求（status固定为3，interact_mode固定为oneshot）
+
+    Args:
+        appid: 应用ID
+        sn: 设备序列号
+        scene: 场景
+        vcn: 发音人
+        stmid: 本轮交互的流ID
+        question: 问题文本
+        tts_format: TTS音频格式，None使用DEFAULT_TTS_FORMAT
+        tts: 是否请求TTS合成，只需要语义结果时为False
+
+    Returns:
+        str: JSON请求
+    """
+    return json.dumps({
+        "header": {
+            "appid": appid,
+            "sn": sn,
+            "stmid": stmid,
+            "status": 3,
+            "scene": scene,
+            "interact_mode": "oneshot"
+        },
+        "parameter": _parameter(vcn, (tts_format or DEFAULT_TTS_FORMAT) if tts else None),
+        "payload": {
+            "text": {
+                "compress": "raw",
+                "format": "plain",
+                "text": base64.b64encode(question.encode('utf-8')).decode('utf-8'),
+                "encoding": "utf8",
+                "status": 3
+            }
+        }
+    })
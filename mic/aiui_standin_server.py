@@ -0,0 +1,495 @@
+#!/usr/bin/env python3
+"""
+本地AIUI V3替身服务
+实现 v3/aiint/sos 的WebSocket请求/响应信封，按可配置的延迟和分片大小
+依次返回 event / iat中间结果 / iat最终结果 / cbm_semantic / nlp流式 / tts分片
+（请求压缩TTS且本机有编码器时返回压缩音频），并用假密钥校验HMAC鉴权。用于离线端到端测试、基准测试和长稳测试。
+
+只依赖标准库。用法：
+    python3 aiui_standin_server.py [端口]
+
+客户端改用替身服务（以voice_interaction为例）：
+    voice_interaction.AIUI_URL = "ws://127.0.0.1:8765/v3/aiint/sos"
+    voice_interaction.AIUI_APPID = FAKE_APPID
+    voice_interaction.AIUI_API_KEY = FAKE_API_KEY
+    voice_interaction.AIUI_API_SECRET = FAKE_API_SECRET
+"""
+
+import base64
+import hashlib
+import hmac
+import itertools
+import json
+import math
+import socketserver
+import struct
+import sys
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse, parse_qs
+
+from tts_codec import RAW, encode_pcm
+
+
+# 替身服务使用的假应用配置
+FAKE_APPID = "standin0"
+FAKE_API_KEY = "standin-api-key-0000000000000000"
+FAKE_API_SECRET = "standin-api-secret-000000000000"
+
+AIUI_PATH = "/v3/aiint/sos"
+
+# 鉴权时间允许的最大偏差（秒）
+MAX_CLOCK_SKEW = 300
+
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+OP_CONT = 0x0
+OP_TEXT = 0x1
+OP_BINARY = 0x2
+OP_CLOSE = 0x8
+OP_PING = 0x9
+OP_PONG = 0xA
+
+
+def make_tone(duration, rate=16000, freq=440, amplitude=8000):
+    """生成16bit单声道正弦音，作为替身TTS音频
+
+    Args:
+        duration: 时长（秒）
+        rate: 采样率
+        freq: 频率（Hz）
+        amplitude: 幅度
+
+    Returns:
+        bytes: PCM音频
+    """
+    n = int(duration * rate)
+    samples = (int(amplitude * math.sin(2 * math.pi * freq * i / rate)) for i in range(n))
+    return struct.pack(f'<{n}h', *samples)
+
+
+class StandInScript:
+    """一轮交互的响应脚本（内容、延迟、分片大小）"""
+
+    def __init__(self, iat_text="明天天气怎么样", answer_text="明天晴，气温十五到二十五度。",
+                 category="IFLYTEK.weather", event_delay=0.0, iat_every_frames=10,
+                 iat_final_delay=0.1, semantic_delay=0.1, nlp_chunk_chars=4, nlp_delay=0.05,
+                 first_tts_delay=0.2, tts_chunk_bytes=6400, tts_delay=0.05, tts_audio=None):
+        """初始化脚本
+
+        Args:
+            iat_text: 识别结果文本
+            answer_text: 回复文本（cbm_semantic answer 与 nlp 流式结果）
+            category: 命中技能
+            event_delay: 收到首帧音频后返回event的延迟（秒）
+            iat_every_frames: 每收到多少帧音频返回一次iat中间结果，0表示不返回
+            iat_final_delay: 收到尾帧后返回iat最终结果的延迟（秒）
+            semantic_delay: iat最终结果之后返回cbm_semantic的延迟（秒）
+            nlp_chunk_chars: nlp流式结果每片字数
+            nlp_delay: nlp分片间隔（秒）
+            first_tts_delay: nlp结束后返回首个tts分片的延迟（秒）
+            tts_chunk_bytes: tts每片PCM字节数
+            tts_delay: tts分片间隔（秒）
+            tts_audio: tts音频PCM，None则按回复长度生成正弦音
+        """
+        self.iat_text = iat_text
+        self.answer_text = answer_text
+        self.category = category
+        self.event_delay = event_delay
+        self.iat_every_frames = iat_every_frames
+        self.iat_final_delay = iat_final_delay
+        self.semantic_delay = semantic_delay
+        self.nlp_chunk_chars = nlp_chunk_chars
+        self.nlp_delay = nlp_delay
+        self.first_tts_delay = first_tts_delay
+        self.tts_chunk_bytes = tts_chunk_bytes
+        self.tts_delay = tts_delay
+        self.tts_audio = tts_audio if tts_audio is not None else make_tone(0.25 * len(answer_text))
+
+
+def verify_auth(path, host, api_key=FAKE_API_KEY, api_secret=FAKE_API_SECRET, now=None):
+    """校验握手URL中的HMAC鉴权参数
+
+    Args:
+        path: 请求行中的路径（含查询参数）
+        host: Host请求头
+        api_key: 期望的api_key
+        api_secret: 用于验签的api_secret
+        now: 当前时间戳，None表示time.time()
+
+    Returns:
+        str: 校验失败的原因，成功返回None
+    """
+    url = urlparse(path)
+    if url.path != AIUI_PATH:
+        return f"unknown path {url.path}"
+
+    query = parse_qs(url.query)
+    try:
+        date = query['date'][0]
+        authorization = base64.b64decode(query['authorization'][0]).decode('utf-8')
+    except (KeyError, ValueError):
+        return "missing date or authorization"
+
+    fields = {}
+    for item in authorization.split(','):
+        if '=' in item:
+            k, v = item.split('=', 1)
+            fields[k.strip()] = v.strip().strip('"')
+
+    if fields.get('api_key') != api_key:
+        return "invalid api_key"
+
+    try:
+        signed_at = parsedate_to_datetime(date).timestamp()
+    except (TypeError, ValueError):
+        return "invalid date"
+    if abs((now or time.time()) - signed_at) > MAX_CLOCK_SKEW:
+        return "date skew too large"
+
+    signature_origin = f"host: {host}\ndate: {date}\nGET {url.path} HTTP/1.1"
+    expected = base64.b64encode(hmac.new(api_secret.encode('utf-8'),
+                                         signature_origin.encode('utf-8'),
+                                         digestmod=hashlib.sha256).digest()).decode('utf-8')
+    if not hmac.compare_digest(expected, fields.get('signature', '')):
+        return "HMAC signature does not match"
+
+    return None
+
+
+def b64_text(text):
+    return base64.b64encode(text.encode('utf-8')).decode('utf-8')
+
+
+def b64_json(obj):
+    return b64_text(json.dumps(obj, ensure_ascii=False))
+
+
+class AIUIStandInHandler(socketserver.StreamRequestHandler):
+    """单个WebSocket连接"""
+
+    def setup(self):
+        super().setup()
+        self.send_lock = threading.Lock()
+        self.closed = False
+        self.turn = None
+
+    # ---------- WebSocket协议 ----------
+
+    def handle(self):
+        request_line = self.rfile.readline().decode('latin-1').strip()
+        headers = {}
+        while True:
+            line = self.rfile.readline().decode('latin-1').strip()
+            if not line:
+                break
+            k, _, v = line.partition(':')
+            headers[k.strip().lower()] = v.strip()
+
+        try:
+            method, path, _ = request_line.split(' ', 2)
+        except ValueError:
+            return
+
+        reason = verify_auth(path, headers.get('host', ''),
+                             self.server.api_key, self.server.api_secret)
+        if reason or method != 'GET' or 'sec-websocket-key' not in headers:
+            body = json.dumps({"message": reason or "bad request"}).encode('utf-8')
+            self.wfile.write(b"HTTP/1.1 401 Unauthorized\r\n"
+                             b"Content-Type: application/json\r\n"
+                             + f"Content-Length: {len(body)}\r\n\r\n".encode('latin-1') + body)
+            return
+
+        accept = base64.b64encode(hashlib.sha1(
+            (headers['sec-websocket-key'] + WS_GUID).encode('latin-1')).digest()).decode('latin-1')
+        self.wfile.write(("HTTP/1.1 101 Switching Protocols\r\n"
+                          "Upgrade: websocket\r\n"
+                          "Connection: Upgrade\r\n"
+                          f"Sec-WebSocket-Accept: {accept}\r\n\r\n").encode('latin-1'))
+
+        while not self.closed:
+            message = self.read_message()
+            if message is None:
+                break
+            try:
+                self.on_request(json.loads(message))
+            except (ValueError, KeyError) as e:
+                self.send_json({"header": {"code": 10160, "message": f"invalid request: {e}",
+                                           "sid": "", "status": 2}})
+
+        self.closed = True
+
+    def read_exact(self, n):
+        data = self.rfile.read(n)
+        if len(data) < n:
+            raise EOFError
+        return data
+
+    def read_message(self):
+        """读取一条完整消息（处理分片、ping、close）"""
+        parts = []
+        try:
+            while True:
+                b1, b2 = self.read_exact(2)
+                fin, opcode = b1 & 0x80, b1 & 0x0F
+                length = b2 & 0x7F
+                if length == 126:
+                    length = struct.unpack('>H', self.read_exact(2))[0]
+                elif length == 127:
+                    length = struct.unpack('>Q', self.read_exact(8))[0]
+                mask = self.read_exact(4) if b2 & 0x80 else None
+                data = self.read_exact(length)
+                if mask:
+                    key = (mask * (length // 4 + 1))[:length]
+                    data = (int.from_bytes(data, 'big') ^ int.from_bytes(key, 'big')).to_bytes(length, 'big')
+
+                if opcode == OP_CLOSE:
+                    self.send_frame(OP_CLOSE, data[:2])
+                    return None
+                if opcode == OP_PING:
+                    self.send_frame(OP_PONG, data)
+                    continue
+                if opcode == OP_PONG:
+                    continue
+
+                parts.append(data)
+                if fin:
+                    return b''.join(parts).decode('utf-8')
+        except (EOFError, OSError):
+            return None
+
+    def send_frame(self, opcode, data):
+        header = bytearray([0x80 | opcode])
+        length = len(data)
+        if length < 126:
+            header.append(length)
+        elif length < 65536:
+            header.append(126)
+            header.extend(struct.pack('>H', length))
+        else:
+            header.append(127)
+            header.extend(struct.pack('>Q', length))
+
+        with self.send_lock:
+            if self.closed:
+                return
+            try:
+                self.wfile.write(bytes(header) + data)
+            except OSError:
+                self.closed = True
+
+    def send_json(self, obj):
+        self.send_frame(OP_TEXT, json.dumps(obj, ensure_ascii=False).encode('utf-8'))
+
+    # ---------- AIUI协议 ----------
+
+    def on_request(self, req):
+        header = req['header']
+        if header.get('appid') != self.server.appid:
+            self.send_json({"header": {"code": 10313, "message": "invalid appid",
+                                       "sid": "", "status": 2}})
+            return
+
+        status = header['status']
+        payload = req.get('payload', {})
+
+        if status in (0, 3) or self.turn is None:
+            # 请求中没有tts参数时不合成，nlp最终结果即本轮结束
+            tts = req.get('parameter', {}).get('tts')
+            tts_encoding = tts.get('tts', {}).get('encoding', RAW) if tts is not None else None
+            self.turn = StandInTurn(self, self.server.script, self.server.next_sid(), tts_encoding)
+
+        if 'text' in payload:
+            question = base64.b64decode(payload['text']['text']).decode('utf-8')
+            self.turn.on_text(question)
+        elif 'audio' in payload:
+            self.turn.on_audio(payload['audio'].get('status', status))
+
+
+class StandInTurn:
+    """一轮交互：根据收到的请求帧按脚本调度响应"""
+
+    def __init__(self, handler, script, sid, tts_encoding=RAW):
+        self.handler = handler
+        self.script = script
+        self.sid = sid
+        self.tts_encoding = tts_encoding
+        self.frames = 0
+        self.iat_sn = 0
+
+    def response(self, key, block, status=1, parameter=None):
+        msg = {
+            "header": {"code": 0, "message": "success", "sid": self.sid, "status": status},
+            "payload": {key: block},
+        }
+        if parameter:
+            msg["parameter"] = parameter
+        return msg
+
+    def iat_block(self, text, final):
+        """构造iat结果（wpgs动态修正格式，每次替换之前所有分段）"""
+        self.iat_sn += 1
+        result = {
+            "sn": self.iat_sn,
+            "ls": final,
+            "pgs": "rpl" if self.iat_sn > 1 else "apd",
+            "ws": [{"bg": 0, "cw": [{"w": ch}]} for ch in text],
+        }
+        if self.iat_sn > 1:
+            result["rg"] = [1, self.iat_sn - 1]
+        return {"status": 2 if final else 1, "text": b64_json({"text": result})}
+
+    def on_audio(self, status):
+        s = self.script
+        self.frames += 1
+
+        if status == 0:
+            event = {"eventType": "VAD_BOS", "sid": self.sid}
+            self.schedule([(s.event_delay, self.response("event", {"status": 1, "text": b64_json(event)}))])
+
+        if status != 2 and s.iat_every_frames and self.frames % s.iat_every_frames == 0:
+            # 按已收到的帧数逐步揭示识别文本
+            shown = max(1, min(len(s.iat_text) - 1, self.frames // s.iat_every_frames))
+            self.handler.send_json(self.response("iat", self.iat_block(s.iat_text[:shown], False)))
+
+        if status == 2:
+            steps = [(s.iat_final_delay, self.response("iat", self.iat_block(s.iat_text, True)))]
+            self.schedule(steps + self.answer_steps())
+
+    def on_text(self, question):
+        self.schedule(self.answer_steps(question))
+
+    def answer_steps(self, question=None):
+        """iat结束（或文本请求）之后的 cbm_semantic / nlp / tts 响应"""
+        s = self.script
+        steps = []
+
+        semantic = {"rc": 0, "text": question or s.iat_text, "category": s.category,
+                    "answer": {"text": s.answer_text}}
+        steps.append((s.semantic_delay, self.response(
+            "cbm_semantic", {"status": 2, "text": b64_json(semantic)},
+            parameter={"cbm_semantic": {"loc": {"intent": 0}}})))
+
+        chunks = [s.answer_text[i:i + s.nlp_chunk_chars]
+                  for i in range(0, len(s.answer_text), s.nlp_chunk_chars)] or ['']
+        for i, chunk in enumerate(chunks):
+            last = i == len(chunks) - 1
+            steps.append((s.nlp_delay, self.response(
+                "nlp", {"status": 2 if last else 1, "seq": i, "text": b64_text(chunk)},
+                status=2 if last and self.tts_encoding is None else 1)))
+
+        if self.tts_encoding is None:
+            return steps
+
+        # 压缩编码时按相同的分片数切分，分片间隔不变
+        encoding, audio = self.handler.server.tts_audio(self.tts_encoding)
+        chunk = -(-s.tts_chunk_bytes * len(audio) // len(s.tts_audio)) if s.tts_audio else 1
+        pieces = [audio[i:i + chunk] for i in range(0, len(audio), chunk)] or [b'']
+        for i, piece in enumerate(pieces):
+            last = i == len(pieces) - 1
+            block = {"status": 2 if last else 1, "seq": i, "encoding": encoding,
+                     "sample_rate": 16000, "channels": 1, "bit_depth": 16,
+                     "audio": base64.b64encode(piece).decode('ascii')}
+            steps.append((s.first_tts_delay if i == 0 else s.tts_delay,
+                          self.response("tts", block, status=2 if last else 1)))
+
+        return steps
+
+    def schedule(self, steps):
+        """在后台线程中按延迟依次发送响应，不阻塞请求读取"""
+        def run():
+            for delay, msg in steps:
+                if delay:
+                    time.sleep(delay)
+                if self.handler.closed:
+                    return
+                self.handler.send_json(msg)
+
+        threading.Thread(target=run, daemon=True).start()
+
+
+class AIUIStandInServer(socketserver.ThreadingTCPServer):
+    """本地AIUI V3替身服务"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host='127.0.0.1', port=8765, script=None,
+                 appid=FAKE_APPID, api_key=FAKE_API_KEY, api_secret=FAKE_API_SECRET):
+        """初始化替身服务
+
+        Args:
+            host: 监听地址
+            port: 监听端口，0表示自动分配
+            script: StandInScript，None使用默认脚本
+            appid / api_key / api_secret: 客户端必须使用的假应用配置
+        """
+        super().__init__((host, port), AIUIStandInHandler)
+        self.script = script or StandInScript()
+        self.appid = appid
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self._sids = itertools.count(1)
+        self._thread = None
+        self._encoded = {RAW: self.script.tts_audio}
+        self._encoded_lock = threading.Lock()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"ws://{host}:{port}{AIUI_PATH}"
+
+    def next_sid(self):
+        return f"ara{next(self._sids):08x}@standin"
+
+    def tts_audio(self, encoding):
+        """按请求的编码返回脚本TTS音频（编码结果缓存）
+
+        Returns:
+            tuple: (实际编码, 音频数据)，本机没有对应编码器时返回raw
+        """
+        with self._encoded_lock:
+            if encoding not in self._encoded:
+                self._encoded[encoding] = encode_pcm(self.script.tts_audio, encoding)
+
+        audio = self._encoded[encoding]
+        if audio is None:
+            return RAW, self.script.tts_audio
+        return encoding, audio
+
+    def start(self):
+        """在后台线程运行"""
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+    """命令行启动替身服务"""
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8765
+
+    server = AIUIStandInServer(port=port)
+    print("=" * 70)
+    print("AIUI V3 本地替身服务")
+    print("=" * 70)
+    print(f"地址:       {server.url}")
+    print(f"APPID:      {FAKE_APPID}")
+    print(f"API_KEY:    {FAKE_API_KEY}")
+    print(f"API_SECRET: {FAKE_API_SECRET}")
+    print("\n按 Ctrl+C 停止\n")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n停止服务")
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+并发文本请求
+在少量常驻WebSocket连接上并发发送文本问题（status=3 / oneshot），
+每个请求返回一个Future，限制同时在途的请求数；结果可边完成边写入JSON Lines，
+用于大批量说法回归测试和展台文本模式
+
+    python3 aiui_text_pool.py questions.txt -o results.jsonl --connections 4
+默认在进程内启动本地AIUI替身服务，--url 指定真实接口时需同时给出应用配置
+"""
+
+import argparse
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import websocket
+
+from aiui_decoder import AIUIResponseDecoder
+from aiui_protocol import generate_auth_url, build_text_request
+from aiui_standin_server import AIUIStandInServer, FAKE_APPID, FAKE_API_KEY, FAKE_API_SECRET
+from intent_aggregator import IntentAggregator
+from turn_trace import new_stream_id
+
+
+class AIUITextConnection:
+    """一条常驻连接，依次执行文本请求"""
+
+    def __init__(self, url, appid, api_key, api_secret, sn="text-pool", scene="main_box",
+                 vcn="x5_lingxiaoyue_flow", timeout=30):
+        self.url = url
+        self.appid = appid
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self.sn = sn
+        self.scene = scene
+        self.vcn = vcn
+        self.timeout = timeout
+
+        # 不请求TTS，本轮在nlp最终结果后结束；意图结果只在本轮结束后读取，不注册回调
+        self.decoder = AIUIResponseDecoder()
+        self.decoder.subscribe('nlp', self._on_nlp)
+        self.decoder.on_error(self._on_error)
+        self.decoder.on_frame(self._on_frame)
+        self.intents = IntentAggregator()
+        self.intents.attach(self.decoder)
+
+        self.ws = None
+        self._nlp_parts = []
+        self._error = None
+        self._done = False
+
+    def connect(self):
+        self.ws = websocket.create_connection(
+            generate_auth_url(self.url, self.api_key, self.api_secret), timeout=self.timeout)
+
+    def close(self):
+        if self.ws:
+            self.ws.close()
+            self.ws = None
+        self.intents.close()
+
+    def _on_nlp(self, text, block, frame):
+        self._nlp_parts.append(text)
+
+    def _on_error(self, frame):
+        self._error = {'code': frame.code, 'message': frame.header.get('message')}
+        self._done = True
+
+    def _on_frame(self, frame):
+        if frame.status == 2:
+            self._done = True
+
+    def request(self, question):
+        """发送一个文本问题并等待本轮结束
+
+        Returns:
+            dict: 结果（sid、nlp回复、各意图技能结果、耗时）
+        """
+        result = {'question': question}
+        result.update(self._run_turn([build_text_request(
+            self.appid, self.sn, self.scene, self.vcn, new_stream_id(self.sn), question,
+            tts=False)]))
+        return result
+
+    def _run_turn(self, messages):
+        """发送本轮全部请求消息并等待本轮结束
+
+        Args:
+            messages: 请求消息（可以是边生成边发送的迭代器）
+
+        Returns:
+            dict: sid、nlp回复、各意图技能结果、耗时
+        """
+        self._nlp_parts = []
+        self._error = None
+        self._done = False
+        self.intents.reset()
+
+        try:
+            # 建连失败与收发失败一样抛出ConnectionError，由连接池重试
+            if self.ws is None:
+                self.connect()
+
+            start = time.monotonic()
+            for message in messages:
+                self.ws.send(message)
+            while not self._done:
+                message = self.ws.recv()
+                if not message:
+                    raise ConnectionError("连接已关闭")
+                self.decoder.feed(message)
+        except (websocket.WebSocketException, OSError) as e:
+            # 连接异常时丢弃该连接，下一个请求重新建立
+            self.ws = None
+            raise ConnectionError(f"请求失败: {e}") from e
+
+        turn = self.intents.result
+        result = {
+            'sid': turn.sid,
+            'nlp': ''.join(self._nlp_parts),
+            'intents': turn.to_dict()['intents'],
+            'latency_ms': round((time.monotonic() - start) * 1000, 1),
+        }
+        if self._error:
+            result['error'] = self._error
+        return result
+
+
+class AIUITextPool:
+    """连接池：每个工作线程持有一条连接，请求以Future返回"""
+
+    def __init__(self, url, appid, api_key, api_secret, connections=4, max_in_flight=None,
+                 retries=1, connection_class=AIUITextConnection, **kwargs):
+        """初始化
+
+        Args:
+            url: AIUI接口地址
+            appid / api_key / api_secret: 应用配置
+            connections: 连接数（即工作线程数）
+            max_in_flight: 最多同时在途（已提交未完成）的请求数，默认为连接数的2倍；
+                达到上限时 submit 阻塞
+            retries: 连接异常时的重试次数
+            connection_class: 连接类，submit的参数原样传给其request方法
+            **kwargs: 传给连接类的参数（sn、scene、vcn、timeout）
+        """
+        self._connection_class = connection_class
+        self._connect_args = (url, appid, api_key, api_secret)
+        self._kwargs = kwargs
+        self.retries = retries
+
+        self._executor = ThreadPoolExecutor(max_workers=connections,
+                                            thread_name_prefix='aiui-text')
+        self._slots = threading.BoundedSemaphore(max_in_flight or connections * 2)
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._connection_class(*self._connect_args, **self._kwargs)
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def _run(self, *args):
+        conn = self._connection()
+        for attempt in range(self.retries + 1):
+            try:
+                return conn.request(*args)
+            except ConnectionError:
+                if attempt == self.retries:
+                    raise
+
+    def submit(self, *args):
+        """提交一个请求（文本连接为一个问题）
+
+        Returns:
+            concurrent.futures.Future: 结果为连接类 request 方法的返回值
+        """
+        self._slots.acquire()
+        future = self._executor.submit(self._run, *args)
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def run_to_jsonl(self, questions, output):
+        """提交全部问题，结果按完成顺序逐行写入JSON Lines
+
+        Args:
+            questions: 问题列表
+            output: 可写的文本文件对象
+
+        Returns:
+            tuple: (成功数, 失败数)
+        """
+        futures = {}
+        ok = failed = 0
+
+        def drain(done):
+            nonlocal ok, failed
+            for future in done:
+                index, question = futures.pop(future)
+                try:
+                    record = future.result()
+                    ok += 1
+                except Exception as e:
+                    record = {'question': question, 'error': str(e)}
+                    failed += 1
+                record['index'] = index
+                output.write(json.dumps(record, ensure_ascii=False) + '\n')
+            output.flush()
+
+        for index, question in enumerate(questions):
+            futures[self.submit(question)] = (index, question)
+            drain([f for f in list(futures) if f.done()])
+
+        drain(as_completed(list(futures)))
+        return ok, failed
+
+    def close(self):
+        """等待在途请求完成并关闭全部连接"""
+        self._executor.shutdown(wait=True)
+        for conn in self._connections:
+            conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="并发文本请求（结果写入JSON Lines）")
+    parser.add_argument('questions', help="问题文件，每行一个问题")
+    parser.add_argument('-o', '--output', help="结果文件（JSON Lines），默认输出到标准输出")
+    parser.add_argument('--connections', type=int, default=4, help="连接数")
+    parser.add_argument('--max-in-flight', type=int, help="最多同时在途的请求数")
+    parser.add_argument('--url', help="AIUI接口地址，默认在进程内启动本地替身服务")
+    parser.add_argument('--appid', default=FAKE_APPID)
+    parser.add_argument('--api-key', default=FAKE_API_KEY)
+    parser.add_argument('--api-secret', default=FAKE_API_SECRET)
+    parser.add_argument('--scene', default="main_box")
+    args = parser.parse_args()
+
+    with open(args.questions, encoding='utf-8') as f:
+        questions = [line.strip() for line in f if line.strip()]
+
+    server = None
+    url = args.url
+    if url is None:
+        server = AIUIStandInServer(port=0).start()
+        url = server.url
+
+    pool = AIUITextPool(url, args.appid, args.api_key, args.api_secret,
+                        connections=args.connections, max_in_flight=args.max_in_flight,
+                        scene=args.scene)
+    output = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    start = time.monotonic()
+    try:
+        ok, failed = pool.run_to_jsonl(questions, output)
+    finally:
+        pool.close()
+        if output is not sys.stdout:
+            output.close()
+        if server:
+            server.stop()
+
+    elapsed = time.monotonic() - start
+    print(f"✓ 完成 {ok} 条，失败 {failed} 条，耗时 {elapsed:.1f} 秒"
+          f"（{len(questions) / elapsed:.1f} 条/秒）", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,10 @@
 import _thread as thread
-import base64
-import datetime
-import hashlib
-import hmac
 import json
 import traceback
-from urllib.parse import urlparse
 import time
-from datetime import datetime
-from time import mktime
-from urllib.parse import urlencode
-from wsgiref.handlers import format_date_time
 import sys
 import os
+import threading
 
 import websocket
 import pyaudio
@@ -21,6 +13,22 @@ import pyaudio
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', '..', '..', 'xfmic'))
 from rk3328_controller import RK3328Controller
 
+# 添加mic目录到路径以导入AIUI公共模块
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+from aiui_decoder import AIUIResponseDecoder
+from aiui_protocol import generate_auth_url, build_audio_request, build_text_request
+from tts_player import StreamingTTSPlayer
+from barge_in import BargeInMonitor
+from tts_cache import TTSCache, CachedTTSRouter
+from tts_codec import TTSDownlink
+from uplink_encoder import UplinkEncoderWorker, create_encoder
+from uplink_gate import SilenceGate
+from capture_source import create_capture_source
+from turn_trace import TurnTracer, new_stream_id
+from iat_assembler import IATAssembler
+from local_commands import LocalCommandDispatcher, DEFAULT_COMMANDS
+from intent_aggregator import IntentAggregator
+
 ## 修改应用应用配置和文件地址后直接执行即可
 
 # 请求地址
@@ -39,6 +47,21 @@ scene = "main_box"
 vcn = "x2_xiaofeng"  # 通用发音人，更稳定
 # vcn = "x5_lingxiaoyue_flow"  # 流式发音人（可能需要特殊配置）
 
+# 合成音频格式
+# encoding: raw为PCM；lame为mp3，下行带宽约为raw的1/8，需要本机安装mpg123或ffmpeg，否则自动回退raw
+tts_format = {
+    "channels": 1,
+    "bit_depth": 16,
+    "sample_rate": 16000,
+    "encoding": "raw"
+}
+
+# TTS缓存目录，重复的回复直接播放本地音频
+tts_cache_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tts_cache')
+
+# 单轮交互追踪文件（JSON Lines，按大小轮转）
+trace_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'traces', 'turn_trace.jsonl')
+
 # 请求类型用来设置文本请求还是音频请求，text/audio
 data_type = 'audio'  # 使用音频模式
 
@@ -57,66 +80,105 @@ frame_size = 1280
 # 每帧音频发送间隔
 sleep_inetrval = 0.04
 
+# 上行音频编码：raw为PCM（256 kbit/s）；opus-wb约24 kbit/s，需要安装opuslib，否则自动回退raw
+# 可用 python3 uplink_encoder.py 测量本机每帧编码CPU耗时
+uplink_encoding = "raw"
+
+# 采集源：pyaudio为声卡；Linux板上可用 alsa:hw:1,0 直接从ALSA采集（arecord）；
+# 无声卡调试可用 file:录音.wav / tone:440:3 / noise:300:3 / pipe:-
+capture_source = "pyaudio"
+
+# 上行静音抑制：开口前的静音只上传最后320ms，说完后静音800ms即结束上行
+uplink_silence_suppression = False
+
+# 播放TTS时是否用本地VAD检测用户插话并打断播放
+# 扬声器回声较大时可能误触发，需要配合回声消除或调高阈值使用
+barge_in_vad = False
+
+# 本地指令短语表：识别中间结果命中即在本地执行，不等云端回复
+# 只放有本地处理函数的指令（目前只有"停止"），其余交给云端语义
+local_commands = {'stop': DEFAULT_COMMANDS['stop']}
+
 class AIUIV3WsClient(object):
     # 初始化
     def __init__(self, audio_device_index=None):
-        self.handshake = self.assemble_auth_url(url)
+        self.handshake = generate_auth_url(url, api_key, api_secret)
 
         # PyAudio实例
         self.audio = pyaudio.PyAudio()
         self.audio_device = audio_device_index
 
-        # TTS音频缓冲
-        self.tts_buffer = []
+        # 流式TTS播放器：常驻播放线程持有输出流，收到首个分片即开始播放
+        self.player = StreamingTTSPlayer(self.audio, on_finish=self.on_playback_finish)
+        self.player.start()
+
+        # TTS缓存：回复文本命中时直接播放本地音频
+        self.tts_cache = TTSCache(tts_cache_dir)
+        self.tts_router = CachedTTSRouter(self.tts_cache, self.player, vcn, tts_format)
+
+        # TTS下行：压缩编码的分片边收边解码，PCM交给缓存路由
+        self.tts_downlink = TTSDownlink(tts_format, self.tts_router.on_remote_audio)
+        self.nlp_parts = []
+
+        # 识别结果增量拼接，中间结果同时交给本地指令匹配
+        self.iat = IATAssembler()
+        self.local_commands = LocalCommandDispatcher(local_commands)
+        self.local_commands.register('stop', self.on_local_stop)
 
         # 交互状态
         self.is_busy = False
         self.ws_connected = False
-
-    # 生成握手url
-    def assemble_auth_url(self, base_url):
-        host = urlparse(base_url).netloc
-        path = urlparse(base_url).path
-        # 生成RFC1123格式的时间戳
-        now = datetime.now()
-        date = format_date_time(mktime(now.timetuple()))
-
-        # 拼接字符串
-        signature_origin = "host: " + host + "\n"
-        signature_origin += "date: " + date + "\n"
-        signature_origin += "GET " + path + " HTTP/1.1"
-
-        # 进行hmac-sha256进行加密
-        print(signature_origin)
-        signature_sha = hmac.new(api_secret.encode('utf-8'), signature_origin.encode('utf-8'),
-                                 digestmod=hashlib.sha256).digest()
-
-        signature_sha_base64 = base64.b64encode(signature_sha).decode(encoding='utf-8')
-
-        authorization_origin = f'api_key="{api_key}", algorithm="hmac-sha256", headers="host date request-line", signature="{signature_sha_base64}"'
-
-        print('get authorization_origin:', authorization_origin)
-        authorization = base64.b64encode(authorization_origin.encode('utf-8')).decode(encoding='utf-8')
-
-        # 将请求的鉴权参数组合为字典
-        v = {
-            "host": host,
-            "date": date,
-            "authorization": authorization,
-        }
-        # 拼接鉴权参数，生成url
-        url = base_url + '?' + urlencode(v)
-        # 此处打印出建立连接时候的url,参考本demo的时候可取消上方打印的注释，比对相同参数时生成的url与自己代码生成的url是否一致
-        return url
+        self.session_id = None
+
+        # 录音线程状态：capture_stop 请求提前结束录音，capture_done 表示录音循环已退出
+        self.capture_stop = threading.Event()
+        self.capture_done = threading.Event()
+        self.capture_done.set()
+
+        # 单轮交互追踪
+        self.tracer = TurnTracer(trace_file)
+        self.trace = None
+
+        # 响应解码器：按payload键分发，只解码有订阅者的结果
+        self.decoder = AIUIResponseDecoder()
+        self.decoder.on_error(self.on_aiui_error)
+        self.decoder.subscribe('event', self.on_event)
+        self.decoder.subscribe('iat', self.on_iat)
+        self.decoder.subscribe('cbm_tidy', self.on_cbm_tidy)
+        self.decoder.subscribe('cbm_intent_domain', self.on_cbm_intent_domain)
+        self.decoder.subscribe('cbm_semantic', self.on_cbm_semantic)
+        self.decoder.subscribe('nlp', self.on_nlp)
+        self.decoder.subscribe('tts', self.on_tts)
+        self.decoder.on_frame(self.on_frame)
+
+        # 多意图结果按意图序号组装，每个意图的技能结果到达即回调
+        self.intents = IntentAggregator()
+        self.intents.attach(self.decoder)
+        self.intents.on_intent(self.on_intent_ready)
+        self.intents.on_complete(self.on_intents_complete)
+
+        # 播放期间本地VAD打断
+        self.barge_in_monitor = None
+        if barge_in_vad:
+            self.barge_in_monitor = BargeInMonitor(self.audio, self.player, self.start_recording,
+                                                   device_index=self.audio_device)
+            self.barge_in_monitor.start()
 
     def on_open(self, ws):
         # 连接建立成功
         print("✓ AIUI WebSocket已连接")
         self.ws_connected = True
 
-    def start_recording(self):
-        """开始一次录音交互"""
-        if self.is_busy:
+    def start_recording(self, serial_span=None):
+        """开始一次录音交互
+
+        Args:
+            serial_span: 唤醒消息的串口接收区间 (首字节到达时间, 解析完成时间)，用于追踪
+        """
+        if self.player.is_playing:
+            # 播放中被唤醒：打断播放，立即开始新一轮
+            self.barge_in()
+        elif self.is_busy:
             print("⚠️  正在交互中，跳过本次唤醒")
             return
 
@@ -125,7 +187,21 @@ class AIUIV3WsClient(object):
             return
 
         self.is_busy = True
-        self.tts_buffer.clear()
+        self.capture_stop.clear()
+        self.capture_done.clear()
+
+        # 本轮追踪，turn_id同时作为请求的stmid
+        self.trace = self.tracer.new_turn(sn)
+        if serial_span:
+            self.trace.add_span('serial', *serial_span)
+
+        self.player.begin(context=self.trace)
+        self.tts_router.begin()
+        self.tts_downlink.begin()
+        self.nlp_parts = []
+        self.iat.reset()
+        self.local_commands.reset()
+        self.intents.reset()
 
         print("\n开始录音并实时上传（5秒）...")
         print("请说话...")
@@ -133,64 +209,47 @@ class AIUIV3WsClient(object):
         # 启动录音线程
         thread.start_new_thread(self.audio_req, ())
 
+    def barge_in(self):
+        """打断当前TTS播放，丢弃本轮剩余的结果"""
+        print("\n⏹  打断播放")
+        if self.trace:
+            self.trace.attrs['barge_in'] = True
+        self.tts_downlink.cancel()
+        self.player.flush()
+        self.decoder.drop_session(self.session_id)
+        self.is_busy = False
+
+    def on_local_stop(self, command, phrase, text, sid):
+        """本地指令"停止"：不再等待本轮云端回复"""
+        print(f"\n⏹  本地指令: {phrase}")
+        if self.trace:
+            self.trace.mark('local_command')
+        self.tts_downlink.cancel()
+        self.player.flush()
+        self.decoder.drop_session(sid)
+        self.tracer.finish(self.trace, local_command=command)
+
+        # 录音线程可能还在采集和上传：通知其结束，录音循环退出后才允许下一轮
+        self.capture_stop.set()
+        if self.capture_done.is_set():
+            self.is_busy = False
+
     def text_req(self):
         # 文本请求status固定为3，interact_mode固定为oneshot
-        aiui_data = {
-            "header": {
-                "appid": appid,
-                "sn": sn,
-                "stmid": "text-1",
-                "status": 3,
-                "scene": scene,
-                "interact_mode": "oneshot"
-            },
-            "parameter": {
-                "nlp": {
-                    "nlp": {
-                        "compress": "raw",
-                        "format": "json",
-                        "encoding": "utf8"
-                    },
-                    "new_session": True
-                },
-                # 合成参数
-                "tts": {
-                    # 发音人
-                    "vcn": vcn,
-                    "tts": {
-                        "channels": 1,
-                        "bit_depth": 16,
-                        "sample_rate": 16000,
-                        "encoding": "raw"
-                    }
-                }
-            },
-            "payload": {
-                "text": {
-                    "compress": "raw",
-                    "format": "plain",
-                    "text": base64.b64encode(question.encode('utf-8')).decode('utf-8'),
-                    "encoding": "utf8",
-                    "status": 3
-                }
-            }
-        }
-        data = json.dumps(aiui_data)
+        data = build_text_request(appid, sn, scene, vcn, new_stream_id(sn), question,
+                                  tts_format=self.tts_downlink.request_format)
         print('text request data:', data)
         self.ws.send(data)
 
     def audio_req(self):
         """从麦克风实时录音并流式上传"""
+        trace = self.trace
         try:
-            # 打开音频流
-            stream = self.audio.open(
-                format=pyaudio.paInt16,
-                channels=1,
-                rate=16000,
-                input=True,
-                input_device_index=self.audio_device,
-                frames_per_buffer=frame_size
-            )
+            trace.start('capture')
+            # 打开采集源
+            source = create_capture_source(capture_source, audio=self.audio,
+                                           device_index=self.audio_device,
+                                           frame_samples=frame_size).open()
 
             # 录音时长（秒）
             duration = 5
@@ -198,203 +257,207 @@ class AIUIV3WsClient(object):
 
             print(f"录音中...")
 
+            # 编码和发送在编码线程中进行，录音线程只投递PCM帧，stream.read不会被耽误
+            uplink = UplinkEncoderWorker(
+                create_encoder(uplink_encoding),
+                lambda data, status, encoding: self.ws.send(build_audio_request(
+                    appid, sn, scene, vcn, trace.turn_id, status, data,
+                    tts_format=self.tts_downlink.request_format, encoding=encoding)))
+
+            # 静音抑制：由本地VAD决定发送哪些帧及其status
+            gate = SilenceGate() if uplink_silence_suppression else None
+            sent = 0
+
             for i in range(num_chunks):
-                # 从麦克风读取一帧音频
-                audio_chunk = stream.read(frame_size, exception_on_overflow=False)
+                # 从麦克风读取一帧音频（本地指令要求结束时以尾帧收尾）
+                frame = source.read_frame()
+                last = frame is None or i == num_chunks - 1 or self.capture_stop.is_set()
+                audio_chunk = frame.data if frame else b''
 
                 # 确定状态：0=首帧，1=中间帧，2=尾帧
-                if i == 0:
-                    status = 0
-                elif i == num_chunks - 1:
-                    status = 2
+                if gate:
+                    frames = gate.process(audio_chunk, last)
                 else:
-                    status = 1
+                    frames = [(audio_chunk, 0 if i == 0 else 2 if last else 1)]
 
-                # 构造请求并发送
-                req = self.genAudioReq(audio_chunk, status)
-                self.ws.send(req)
+                # 投递给编码线程
+                for frame, status in frames:
+                    uplink.submit(frame, status)
+                    if sent == 0:
+                        trace.start('uplink')
+                        trace.start('recognition')
+                    sent += 1
 
                 # 显示进度
                 progress = int((i + 1) / num_chunks * 30)
                 print(f"\r[{'='*progress}{' '*(30-progress)}] {i+1}/{num_chunks}", end='', flush=True)
 
+                # 说完后的静音已足够长（或采集源结束），提前结束录音
+                if last or (gate and gate.finished):
+                    break
+
                 # 注意：不需要sleep，stream.read()本身会阻塞约40ms
 
+            trace.end('capture')
+            uplink.close()
+            trace.end('uplink')
+            trace.attrs['uplink'] = uplink.stats()
+            if gate:
+                trace.attrs['uplink_gate'] = gate.stats()
+
+            source.close()
+
             print()
-            print("✓ 录音完成，等待识别结果...")
+            if self.capture_stop.is_set():
+                # 本轮已被本地指令结束（追踪已写出），在finally中释放
+                print("⏹  录音已结束（本地指令）")
+                return
 
-            stream.stop_stream()
-            stream.close()
+            if sent == 0:
+                # 一直没有开口，本轮没有上传任何音频
+                print("⚠️  未检测到语音")
+                self.is_busy = False
+                self.tracer.finish(trace, no_speech=True)
+                return
+
+            print("✓ 录音完成，等待识别结果...")
 
         except Exception as e:
             print(f"\n✗ 录音失败: {e}")
             traceback.print_exc()
             self.is_busy = False
+            self.tracer.finish(trace, error='capture')
 
-    def genAudioReq(self, data, status):
-        # 构造pcm音频请求参数
-        aiui_data = {
-            "header": {
-                "appid": appid,
-                "sn": sn,
-                "stmid": "audio-1",
-                "status": status,
-                "scene": scene,
-                "interact_mode": "continuous"
-            },
-            "parameter": {
-                "nlp": {
-                    "nlp": {
-                        "compress": "raw",
-                        "format": "json",
-                        "encoding": "utf8"
-                    },
-                    "new_session": True
-                },
-                # 合成参数
-                "tts": {
-                    # 发音人
-                    "vcn": vcn,
-                    "tts": {
-                        "channels": 1,
-                        "bit_depth": 16,
-                        "sample_rate": 16000,
-                        "encoding": "raw"
-                    }
-                }
-            },
-            "payload": {
-                "audio": {
-                    "encoding": "raw",
-                    "sample_rate": 16000,
-                    "channels": 1,
-                    "bit_depth": 16,
-                    "status": status,
-                    "audio": base64.b64encode(data).decode(),
-                }
-            }
-        }
-        return json.dumps(aiui_data)
+        finally:
+            self.capture_done.set()
+            # 录音期间收到本地"停止"：这里释放，避免与 on_local_stop 交错时漏掉
+            if self.capture_stop.is_set():
+                self.is_busy = False
 
     # 收到websocket消息的处理
     def on_message(self, ws, message):
         try:
-            data = json.loads(message)
-
-            # print('原始结果:', message)  # 调试用，已禁用
-            header = data['header']
-            code = header['code']
-            # 结果解析
-            if code != 0:
-                print('请求错误：', code, json.dumps(data, ensure_ascii=False))
-                ws.close()
-            sid = header.get('sid', "sid")
-            payload = data.get('payload', {})
-            parameter = data.get('parameter', {})
-            if 'event' in payload:
-                # 事件结果
-                event_json = payload['event']
-                event_text_bs64 = event_json['text']
-                event_text = base64.b64decode(event_text_bs64).decode('utf-8')
-                print("事件，", event_text)
-            if 'iat' in payload:
-                # 识别结果
-                iat_json = payload['iat']
-                iat_text_bs64 = iat_json['text']
-                iat_text = base64.b64decode(iat_text_bs64).decode('utf-8')
-                result_text = self.parse_iat_result(iat_text)
-                status_val = iat_json['status']
-
-                if status_val == 2:
-                    print(f"\n✓ [识别完成] {result_text}")
-                else:
-                    print(f"  [实时识别] {result_text}...", end='\r')
-            if 'cbm_tidy' in payload:
-                # 语义规整结果（历史改写），意图拆分
-                cbm_tidy_json = payload['cbm_tidy']
-                cbm_tidy_text_bs64 = cbm_tidy_json['text']
-                cbm_tidy_text = base64.b64decode(cbm_tidy_text_bs64).decode('utf-8')
-                cbm_tidy_json = json.loads(cbm_tidy_text)
-                print("语义规整结果：")
-                intents = cbm_tidy_json['intent']
-                for intent in intents:
-                    print("  intent index：", intent['index'], "，意图语料：", intent['value'])
-            if 'cbm_intent_domain' in payload:
-                # 意图拆分后的落域结果
-                cbm_intent_domain_json = payload['cbm_intent_domain']
-                cbm_intent_domain_text_bs64 = cbm_intent_domain_json['text']
-                cbm_intent_domain_text = base64.b64decode(cbm_intent_domain_text_bs64).decode('utf-8')
-                index = self.get_intent_index(parameter, "cbm_intent_domain")
-                print("intent index：", index, "，落域结果：", cbm_intent_domain_text)
-            if 'cbm_semantic' in payload:
-                # 技能结果
-                cbm_semantic_json = payload['cbm_semantic']
-                cbm_semantic_text_bs64 = cbm_semantic_json['text']
-                cbm_semantic_text = base64.b64decode(cbm_semantic_text_bs64).decode('utf-8')
-                cbm_semantic_json = json.loads(cbm_semantic_text)
-                index = self.get_intent_index(parameter, "cbm_semantic")
-                if cbm_semantic_json['rc'] != 0:
-                    print("intent index：", index, "，技能结果：说法：", cbm_semantic_json['text'], "，", cbm_semantic_text)
-                else:
-                    print("intent index：", index, "，技能结果：说法：", cbm_semantic_json['text'], "，命中技能：", cbm_semantic_json['category'], "，回复：", cbm_semantic_json['answer']['text'])
-            if 'nlp' in payload:
-                # 语义结果，经过大模型润色的最终结果
-                nlp_json = payload['nlp']
-                nlp_text_bs64 = nlp_json['text']
-                nlp_text = base64.b64decode(nlp_text_bs64).decode('utf-8')
-                nlp_status = nlp_json['status']
-
-                if nlp_status == 2:
-                    print(f"\n[语义结果] {nlp_text}")
-                else:
-                    print(f"  [语义流式] {nlp_text}", end='')
-
-            if 'tts' in payload:
-                # TTS音频数据
-                audioData = payload['tts']['audio']
-                if audioData != None:
-                    audioBytes = base64.b64decode(audioData)
-                    self.tts_buffer.append(audioBytes)
-                    print(f"  [TTS] 收到 {len(audioBytes)} 字节")
-
-            if 'status' in header and header['status'] == 2:
-                # 本轮交互结束
-                print("\n✓ 交互完成")
-
-                # 播放TTS音频
-                if self.tts_buffer:
-                    self.play_tts()
-                else:
-                    print("\n⚠️  警告：未收到TTS音频数据")
-                    print("   可能原因：")
-                    print("   1. AIUI应用未启用TTS合成")
-                    print("   2. 极速超拟人链路未配置语音输出")
-                    print("   3. TTS服务未开通或次数不足")
-                    print("   请登录 https://aiui.xfyun.cn/ 检查配置")
-
-                # 重置状态，准备下次唤醒
-                self.is_busy = False
-                print("\n" + "="*70)
-                print("等待下次唤醒...")
-                print("="*70)
+            self.decoder.feed(message)
         except Exception as e:
             traceback.print_exc()
             pass
 
-    def parse_iat_result(self, iat_res):
-        iat_text = ""
-        iat_res_json = json.loads(iat_res)
-        for cw in iat_res_json['text']['ws']:
-            for cw_item in cw["cw"]:
-                iat_text += cw_item['w']
-
-        return iat_text
-
-    def get_intent_index(self, parameter, key):
-        if key in parameter:
-            return parameter[key]['loc']['intent']
+    def on_aiui_error(self, frame):
+        print('请求错误：', frame.code, json.dumps(frame.header, ensure_ascii=False))
+        self.ws.close()
+
+    def on_event(self, event_text, block, frame):
+        # 事件结果
+        print("事件，", event_text)
+
+    def on_iat(self, iat_json, block, frame):
+        # 识别结果，按wpgs增量拼接
+        stable, unstable = self.iat.feed(iat_json, final=block['status'] == 2)
+        # 本轮首帧时self.session_id还未更新，用当前消息的sid
+        self.local_commands.on_update(stable, unstable, block['status'] == 2, sid=frame.sid)
+
+        if block['status'] == 2:
+            print(f"\n✓ [识别完成] {stable}")
+            if self.trace:
+                self.trace.end('recognition')
+                self.trace.start('nlp')
+        else:
+            if self.trace:
+                self.trace.mark('first_iat')
+            print(f"  [实时识别] {stable}{unstable}...", end='\r')
+
+    def on_cbm_tidy(self, cbm_tidy_json, block, frame):
+        # 语义规整结果（历史改写），意图拆分
+        print("语义规整结果：")
+        intents = cbm_tidy_json['intent']
+        for intent in intents:
+            print("  intent index：", intent['index'], "，意图语料：", intent['value'])
+
+    def on_cbm_intent_domain(self, cbm_intent_domain_text, block, frame):
+        # 意图拆分后的落域结果
+        index = frame.intent_index("cbm_intent_domain")
+        print("intent index：", index, "，落域结果：", cbm_intent_domain_text)
+
+    def on_cbm_semantic(self, cbm_semantic_json, block, frame):
+        # 技能结果
+        index = frame.intent_index("cbm_semantic")
+        if cbm_semantic_json['rc'] != 0:
+            print("intent index：", index, "，技能结果：说法：", cbm_semantic_json['text'], "，", json.dumps(cbm_semantic_json, ensure_ascii=False))
+        else:
+            print("intent index：", index, "，技能结果：说法：", cbm_semantic_json['text'], "，命中技能：", cbm_semantic_json['category'], "，回复：", cbm_semantic_json['answer']['text'])
+
+    def on_intent_ready(self, intent, turn):
+        # 单个意图的结构化结果（回调线程中调用），可在此先执行第一个指令
+        if self.trace:
+            self.trace.mark('first_intent')
+        print("intent index：", intent.index, "，结构化结果：", json.dumps(intent.to_dict(), ensure_ascii=False))
+
+    def on_intents_complete(self, turn):
+        # 本轮全部意图结果
+        if len(turn.intents) > 1:
+            print("多意图结果：", json.dumps(turn.to_dict(), ensure_ascii=False))
+
+    def on_nlp(self, nlp_text, block, frame):
+        # 语义结果，经过大模型润色的最终结果
+        if self.trace:
+            self.trace.mark('first_nlp')
+        self.nlp_parts.append(nlp_text)
+        if block['status'] == 2:
+            print(f"\n[语义结果] {nlp_text}")
+            if self.trace:
+                self.trace.end('nlp')
+            self.tts_router.on_answer_text(''.join(self.nlp_parts))
+        else:
+            print(f"  [语义流式] {nlp_text}", end='')
+
+    def on_tts(self, audio_bytes, block, frame):
+        # TTS音频数据，直接送入播放器边收边播（命中缓存时丢弃）
+        if audio_bytes:
+            if self.trace:
+                self.trace.mark('first_tts')
+            self.tts_downlink.feed(audio_bytes, block.get('encoding'))
+
+    def on_frame(self, frame):
+        if frame.sid:
+            self.session_id = frame.sid
+            if self.trace:
+                self.trace.set_sid(frame.sid)
+
+        if frame.status == 2:
+            # 本轮交互结束
+            print("\n✓ 交互完成")
+
+            # 解码进程的剩余输出在后台等待，全部交付后再结束本轮播放
+            self.tts_downlink.end(self.on_tts_done)
+
+            # 重置状态，准备下次唤醒
+            self.is_busy = False
+            print("\n" + "="*70)
+            print("等待下次唤醒...")
+            print("="*70)
+
+    def on_tts_done(self):
+        # 本轮TTS音频全部交付：通知播放器最后一个分片已到达，并缓存本轮合成结果
+        self.tts_router.end()
+        if self.player.bytes_received == 0:
+            print("\n⚠️  警告：未收到TTS音频数据")
+            print("   可能原因：")
+            print("   1. AIUI应用未启用TTS合成")
+            print("   2. 极速超拟人链路未配置语音输出")
+            print("   3. TTS服务未开通或次数不足")
+            print("   请登录 https://aiui.xfyun.cn/ 检查配置")
+
+            # 没有TTS时本轮到此结束，否则在播放结束时写出追踪
+            self.tracer.finish(self.trace)
+
+    def on_playback_finish(self, player, trace):
+        # 一轮TTS播放结束（播放线程中调用）
+        if trace is None:
+            return
 
-        return "-"
+        trace.add_span('playback', player.first_audio_time, player.end_time)
+        trace.attrs['underruns'] = player.underruns
+        self.tracer.finish(trace)
 
     def get_suffix(self, encoding):
         if encoding == 'raw':
@@ -404,32 +467,6 @@ class AIUIV3WsClient(object):
 
         return 'unknow'
 
-    def play_tts(self):
-        """播放TTS音频"""
-        try:
-            audio_data = b''.join(self.tts_buffer)
-
-            if len(audio_data) == 0:
-                return
-
-            print(f"\n播放TTS音频（{len(audio_data)} 字节）...")
-
-            stream = self.audio.open(
-                format=pyaudio.paInt16,
-                channels=1,
-                rate=16000,
-                output=True
-            )
-
-            stream.write(audio_data)
-            stream.stop_stream()
-            stream.close()
-
-            print("✓ 播放完成")
-
-        except Exception as e:
-            print(f"✗ 播放失败: {e}")
-
     def on_error(self, ws, error):
         print("### connection error: ", str(error))
         ws.close()
@@ -531,12 +568,18 @@ if __name__ == "__main__":
                     print(f"{'='*70}")
 
                     # 触发录音
-                    client.start_recording()
+                    client.start_recording(serial_span=(rk3328.last_message_rx_time, time.monotonic()))
 
     except KeyboardInterrupt:
         print("\n\n用户中断，退出系统")
 
     finally:
         rk3328.close()
+        if client.barge_in_monitor:
+            client.barge_in_monitor.stop()
+        client.player.stop()
+        client.tts_cache.close()
+        client.intents.close()
+        client.tracer.close()
         client.audio.terminate()
         print("\n再见！")
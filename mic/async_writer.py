@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+异步音频写盘
+PortAudio回调只把收到的缓冲区（不可变bytes，直接转交所有权，不复制）放入队列，
+写盘线程把它们拼进预分配的批缓冲，按整块大批量写入，并按配置的间隔fsync；
+SD卡写入卡顿时只会让队列变长，不会拖慢音频回调
+"""
+
+import os
+import queue
+import threading
+import time
+
+
+class AsyncAudioWriter:
+    """音频写盘线程"""
+
+    def __init__(self, sink, file=None, batch_bytes=64 * 1024, fsync_interval=5.0):
+        """初始化并启动写盘线程
+
+        Args:
+            sink: 写入函数 sink(data)，在写盘线程中调用，如 wave.Wave_write.writeframesraw
+            file: 底层文件对象，用于flush和fsync，None表示不fsync
+            batch_bytes: 每次写入的字节数（取4096的整数倍）
+            fsync_interval: fsync间隔（秒），0表示只在关闭时fsync；
+                未满一批的数据也在此时写出，崩溃时最多丢失这段时间的音频
+        """
+        self.sink = sink
+        self.file = file
+        self.batch_bytes = max(4096, batch_bytes - batch_bytes % 4096)
+        self.fsync_interval = fsync_interval
+
+        # 预分配的批缓冲
+        self._batch = bytearray(self.batch_bytes)
+        self._batch_view = memoryview(self._batch)
+        self._fill = 0
+
+        self._queue = queue.SimpleQueue()
+        self._closed = False
+
+        # 计数器
+        self.bytes_queued = 0
+        self.bytes_written = 0
+        self.writes = 0
+        self.fsyncs = 0
+        self.max_queue_depth = 0
+        self.write_time = 0.0
+        self.max_write_latency = 0.0
+        self.max_fsync_latency = 0.0
+
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def write(self, data):
+        """投递一块音频（在音频回调中调用，不阻塞）
+
+        Args:
+            data: bytes，投递后调用方不应再修改
+        """
+        if self._closed:
+            return
+        self._queue.put(data)
+        self.bytes_queued += len(data)
+
+        depth = self._queue.qsize()
+        if depth > self.max_queue_depth:
+            self.max_queue_depth = depth
+
+    @property
+    def queue_depth(self):
+        """尚未写入的缓冲区数"""
+        return self._queue.qsize()
+
+    def stats(self):
+        """计数器快照"""
+        return {
+            'queue_depth': self.queue_depth,
+            'max_queue_depth': self.max_queue_depth,
+            'bytes_queued': self.bytes_queued,
+            'bytes_written': self.bytes_written,
+            'writes': self.writes,
+            'fsyncs': self.fsyncs,
+            'mean_write_ms': round(self.write_time / self.writes * 1000, 2) if self.writes else None,
+            'max_write_ms': round(self.max_write_latency * 1000, 2),
+            'max_fsync_ms': round(self.max_fsync_latency * 1000, 2),
+        }
+
+    def close(self):
+        """写出队列中剩余的数据并fsync，结束写盘线程"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        next_sync = time.monotonic() + self.fsync_interval if self.fsync_interval else None
+
+        while True:
+            timeout = None if next_sync is None else max(0.0, next_sync - time.monotonic())
+            try:
+                data = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                data = b''
+
+            if data is None:
+                break
+
+            # 拼入批缓冲，满一批写一次
+            view = memoryview(data)
+            while view:
+                n = min(len(view), self.batch_bytes - self._fill)
+                self._batch_view[self._fill:self._fill + n] = view[:n]
+                self._fill += n
+                view = view[n:]
+                if self._fill == self.batch_bytes:
+                    self._flush_batch()
+
+            if next_sync is not None and time.monotonic() >= next_sync:
+                self._flush_batch()
+                self._fsync()
+                next_sync = time.monotonic() + self.fsync_interval
+
+        self._flush_batch()
+        self._fsync()
+
+    def _flush_batch(self):
+        if not self._fill:
+            return
+
+        t0 = time.monotonic()
+        try:
+            self.sink(self._batch_view[:self._fill])
+        except Exception as e:
+            print(f"\n✗ 写盘失败: {e}")
+        latency = time.monotonic() - t0
+
+        self.bytes_written += self._fill
+        self.writes += 1
+        self.write_time += latency
+        self.max_write_latency = max(self.max_write_latency, latency)
+        self._fill = 0
+
+    def _fsync(self):
+        if self.file is None:
+            return
+
+        t0 = time.monotonic()
+        try:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+        except (OSError, ValueError) as e:
+            print(f"\n✗ fsync失败: {e}")
+            return
+        self.fsyncs += 1
+        self.max_fsync_latency = max(self.max_fsync_latency, time.monotonic() - t0)
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+播放期间的本地语音打断（barge-in）检测
+TTS播放时监听麦克风，检测到用户连续说话即触发打断回调
+"""
+
+import threading
+import time
+
+import numpy as np
+
+
+class EnergyVAD:
+    """基于平均音量的简单VAD"""
+
+    def __init__(self, threshold=500, min_speech_frames=3):
+        """初始化VAD
+
+        Args:
+            threshold: 语音音量阈值（int16平均绝对值），播放时需高于扬声器回声
+            min_speech_frames: 连续多少帧超过阈值才判定为语音，过滤咔哒声等瞬态噪声
+        """
+        self.threshold = threshold
+        self.min_speech_frames = min_speech_frames
+        self.speech_frames = 0
+
+    def reset(self):
+        self.speech_frames = 0
+
+    def process(self, frame):
+        """处理一帧音频
+
+        Args:
+            frame: 16bit PCM音频数据
+
+        Returns:
+            bool: 已连续检测到语音返回True
+        """
+        volume = np.abs(np.frombuffer(frame, dtype=np.int16)).mean()
+
+        if volume > self.threshold:
+            self.speech_frames += 1
+        else:
+            self.speech_frames = 0
+
+        return self.speech_frames >= self.min_speech_frames
+
+
+class BargeInMonitor:
+    """播放期间监听麦克风，用户开口即打断"""
+
+    def __init__(self, audio, player, on_barge_in, device_index=None,
+                 rate=16000, chunk=640, vad=None):
+        """初始化监听器
+
+        Args:
+            audio: PyAudio实例
+            player: StreamingTTSPlayer，只在其播放期间监听
+            on_barge_in: 检测到打断时的回调（在监听线程中调用）
+            device_index: 音频输入设备索引
+            rate: 采样率
+            chunk: 每帧采样点数，默认640（40ms）
+            vad: EnergyVAD实例，None则使用默认参数
+        """
+        self.audio = audio
+        self.player = player
+        self.on_barge_in = on_barge_in
+        self.device_index = device_index
+        self.rate = rate
+        self.chunk = chunk
+        self.vad = vad or EnergyVAD()
+
+        self.is_running = False
+        self._thread = None
+
+    def start(self):
+        """启动监听线程"""
+        if self.is_running:
+            return
+
+        self.is_running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """停止监听线程"""
+        self.is_running = False
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        stream = None
+        try:
+            while self.is_running:
+                if not self.player.is_playing:
+                    # 不在播放时释放输入设备，留给上行录音使用
+                    if stream:
+                        stream.stop_stream()
+                        stream.close()
+                        stream = None
+                    time.sleep(0.05)
+                    continue
+
+                if stream is None:
+                    stream = self.audio.open(
+                        format=self.audio.get_format_from_width(2),
+                        channels=1,
+                        rate=self.rate,
+                        input=True,
+                        input_device_index=self.device_index,
+                        frames_per_buffer=self.chunk
+                    )
+                    self.vad.reset()
+
+                frame = stream.read(self.chunk, exception_on_overflow=False)
+
+                if self.vad.process(frame):
+                    print("\n🗣  检测到用户插话，打断播放")
+                    stream.stop_stream()
+                    stream.close()
+                    stream = None
+                    self.vad.reset()
+                    self.on_barge_in()
+
+                    # 等待播放器丢弃剩余音频，避免重新打开输入设备
+                    self.player.wait(1.0)
+
+        except Exception as e:
+            print(f"✗ 打断监听失败: {e}")
+
+        finally:
+            if stream:
+                stream.stop_stream()
+                stream.close()
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+批量离线转写
+遍历目录下的PCM/WAV录音（StreamRecorder、唤醒录音等），在多条常驻连接上
+并发走一遍AIUI V3链路，不按实时节奏而是尽快上传；每个文件的iat/nlp结果
+逐行写入JSON Lines。已完成的文件记入完成索引，中断后重新运行会跳过
+
+    python3 batch_transcribe.py recordings/ -o results.jsonl --connections 4
+默认在进程内启动本地AIUI替身服务，--url 指定真实接口时需同时给出应用配置
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import as_completed
+
+from aiui_protocol import build_audio_request
+from aiui_standin_server import AIUIStandInServer, FAKE_APPID, FAKE_API_KEY, FAKE_API_SECRET
+from aiui_text_pool import AIUITextConnection, AIUITextPool
+from iat_assembler import IATAssembler
+from pcm_source import MappedAudioSource
+from turn_trace import new_stream_id
+
+
+AUDIO_EXTENSIONS = ('.pcm', '.wav')
+
+SAMPLE_RATE = 16000
+FRAME_SIZE = 1280           # 40ms @ 16kHz 16bit
+FRAME_INTERVAL = 0.04
+
+
+def find_audio_files(root):
+    """递归查找音频文件，返回相对root的路径（排序，保证每次运行顺序一致）"""
+    found = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for name in sorted(filenames):
+            if name.lower().endswith(AUDIO_EXTENSIONS):
+                found.append(os.path.relpath(os.path.join(dirpath, name), root))
+    return found
+
+
+def open_audio(path):
+    """以mmap打开16k 16bit单声道PCM/WAV
+
+    Raises:
+        ValueError: 格式不符
+    """
+    source = MappedAudioSource(path)
+    if (source.sample_rate, source.channels) != (SAMPLE_RATE, 1):
+        source.close()
+        raise ValueError(f"不支持的音频格式: {source.sample_rate} Hz, {source.channels} 声道")
+    return source
+
+
+class AIUIAudioConnection(AIUITextConnection):
+    """一条常驻连接，依次上传整段音频"""
+
+    def __init__(self, *args, speed=0, **kwargs):
+        """初始化
+
+        Args:
+            speed: 上传速度倍数，1.0为实时，0表示不限速
+        """
+        super().__init__(*args, **kwargs)
+        self.speed = speed
+        self.iat = IATAssembler()
+        self.decoder.subscribe('iat', self._on_iat)
+
+    def _on_iat(self, data, block, frame):
+        self.iat.feed(data, final=block.get('status') == 2)
+
+    def request(self, path):
+        """上传一个音频文件并等待本轮结束
+
+        Returns:
+            dict: 结果（iat识别文本、nlp回复、各意图技能结果、耗时）
+        """
+        self.iat.reset()
+        with open_audio(path) as source:
+            result = self._run_turn(self._audio_messages(source))
+        result['iat'] = self.iat.text
+        return result
+
+    def _audio_messages(self, source):
+        """按帧生成音频请求（帧为mmap上的memoryview），限速时按节奏生成"""
+        stmid = new_stream_id(self.sn)
+        frames = list(source.frames(FRAME_SIZE))
+        # 至少需要首帧和尾帧
+        while len(frames) < 2:
+            frames.append(b'')
+        start = time.monotonic()
+
+        for i, chunk in enumerate(frames):
+            status = 0 if i == 0 else 2 if i == len(frames) - 1 else 1
+            yield build_audio_request(self.appid, self.sn, self.scene, self.vcn, stmid, status,
+                                      chunk, tts=False)
+
+            if self.speed:
+                delay = start + (i + 1) * FRAME_INTERVAL / self.speed - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+
+
+def load_done_index(path):
+    """读取完成索引（每行一个已完成文件的相对路径）"""
+    if not os.path.exists(path):
+        return set()
+    with open(path, encoding='utf-8') as f:
+        return {line.rstrip('\n') for line in f if line.strip()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量离线转写（结果写入JSON Lines，可断点续跑）")
+    parser.add_argument('root', help="录音目录（递归查找 .pcm / .wav）")
+    parser.add_argument('-o', '--output', default='transcripts.jsonl', help="结果文件（JSON Lines，追加写入）")
+    parser.add_argument('--done-index', help="完成索引文件，默认为 <output>.done")
+    parser.add_argument('--connections', type=int, default=4, help="连接数")
+    parser.add_argument('--speed', type=float, default=0, help="上传速度倍数，1.0为实时，0为不限速")
+    parser.add_argument('--url', help="AIUI接口地址，默认在进程内启动本地替身服务")
+    parser.add_argument('--appid', default=FAKE_APPID)
+    parser.add_argument('--api-key', default=FAKE_API_KEY)
+    parser.add_argument('--api-secret', default=FAKE_API_SECRET)
+    parser.add_argument('--scene', default="main_box")
+    args = parser.parse_args()
+
+    done_path = args.done_index or args.output + '.done'
+    done = load_done_index(done_path)
+    files = [f for f in find_audio_files(args.root) if f not in done]
+    print(f"共 {len(files) + len(done)} 个文件，已完成 {len(done)}，待转写 {len(files)}",
+          file=sys.stderr)
+    if not files:
+        return
+
+    server = None
+    url = args.url
+    if url is None:
+        server = AIUIStandInServer(port=0).start()
+        url = server.url
+
+    pool = AIUITextPool(url, args.appid, args.api_key, args.api_secret,
+                        connections=args.connections, connection_class=AIUIAudioConnection,
+                        sn="batch", scene=args.scene, speed=args.speed)
+    ok = failed = 0
+    start = time.monotonic()
+
+    with open(args.output, 'a', encoding='utf-8') as output, \
+            open(done_path, 'a', encoding='utf-8') as done_index:
+
+        def record(future, name):
+            nonlocal ok, failed
+            try:
+                result = future.result()
+            except Exception as e:
+                # 失败的文件不记入完成索引，下次运行重试
+                result = {'error': str(e)}
+            result = dict(file=name, **result)
+            output.write(json.dumps(result, ensure_ascii=False) + '\n')
+            output.flush()
+
+            if 'error' in result:
+                failed += 1
+                print(f"✗ {name}: {result['error']}", file=sys.stderr)
+            else:
+                ok += 1
+                done_index.write(name + '\n')
+                done_index.flush()
+                print(f"[{ok + failed}/{len(files)}] {name}: {result['iat']}", file=sys.stderr)
+
+        try:
+            futures = {}
+            for name in files:
+                # 在途请求数达到上限时submit阻塞；文件在工作线程中以mmap打开
+                futures[pool.submit(os.path.join(args.root, name))] = name
+
+                for future in [f for f in futures if f.done()]:
+                    record(future, futures.pop(future))
+
+            for future in as_completed(list(futures)):
+                record(future, futures.pop(future))
+        finally:
+            pool.close()
+            if server:
+                server.stop()
+
+    elapsed = time.monotonic() - start
+    print(f"✓ 完成 {ok} 个，失败 {failed} 个，耗时 {elapsed:.1f} 秒", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+音频"黑匣子"
+固定大小的内存映射环形文件，持续保存最近N分钟的麦克风音频和串口事件。
+文件创建时一次分配好，写入只是往映射内存里拷贝并更新文件头中的游标，
+不分配缓冲、文件不增长；进程崩溃后数据仍在页缓存/文件中，
+用dump把环形区按时间顺序展开成WAV和事件日志
+
+    python3 black_box.py blackbox.bin                       # 查看状态
+    python3 black_box.py blackbox.bin -o crash.wav          # 导出WAV + crash.events.jsonl
+
+文件布局：
+    [0, 4096)            文件头（格式参数 + 音频游标、事件计数、游标对应的墙钟时间）
+    [4096, +音频容量)     音频环形区
+    [.., +槽数×槽大小)    事件环形区（定长槽位）
+"""
+
+import argparse
+import json
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+import wave
+
+
+MAGIC = b'XYBBOX01'
+VERSION = 1
+HEADER_SIZE = 4096
+
+# 格式参数：magic, version, sample_rate, channels, sample_width, audio_capacity, event_slots, event_size, created
+LAYOUT_FMT = '<8sIIHHQIId'
+# 游标：audio_cursor（累计写入字节数）, audio_time（audio_cursor处的墙钟时间）, event_count（累计事件数）
+CURSOR_FMT = '<QdQ'
+CURSOR_OFFSET = 64
+AUDIO_CURSOR_FMT = '<Qd'
+EVENT_COUNT_OFFSET = CURSOR_OFFSET + struct.calcsize(AUDIO_CURSOR_FMT)
+
+# 事件槽：墙钟时间, 当时的audio_cursor, 负载长度, 负载（JSON）
+EVENT_FMT = '<dQH'
+EVENT_HEADER_SIZE = struct.calcsize(EVENT_FMT)
+
+
+class BlackBoxRecorder:
+    """黑匣子写入端（音频在采集回调中写入，事件可在任意线程写入）"""
+
+    def __init__(self, path, minutes=5, sample_rate=16000, channels=1, sample_width=2,
+                 event_slots=1024, event_size=512):
+        """打开或创建黑匣子文件
+
+        已有文件的格式参数一致时接着写（保留崩溃前的内容，并记一条open事件），
+        不一致时重新创建
+
+        Args:
+            path: 文件路径
+            minutes: 保存的音频时长（分钟）
+            sample_rate / channels / sample_width: 音频格式
+            event_slots: 事件槽数，超过后覆盖最早的事件
+            event_size: 每个事件槽的字节数，放不下的事件只记录类型和原长度
+        """
+        self.path = path
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.sample_width = sample_width
+        self.block_align = channels * sample_width
+
+        # 容量取页大小和采样帧大小的公倍数，环绕时不会把一个采样帧拆开（否则多声道错位）
+        unit = mmap.PAGESIZE * self.block_align // math.gcd(mmap.PAGESIZE, self.block_align)
+        capacity = int(minutes * 60 * sample_rate) * self.block_align
+        self.audio_capacity = max(unit, capacity - capacity % unit)
+        self.event_slots = event_slots
+        self.event_size = event_size
+        self.audio_offset = HEADER_SIZE
+        self.event_offset = HEADER_SIZE + self.audio_capacity
+        total = self.event_offset + event_slots * event_size
+
+        layout = (MAGIC, VERSION, sample_rate, channels, sample_width,
+                  self.audio_capacity, event_slots, event_size)
+
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            existing = os.fstat(fd).st_size
+            reuse = False
+            if existing == total:
+                header = os.pread(fd, struct.calcsize(LAYOUT_FMT), 0)
+                reuse = struct.unpack(LAYOUT_FMT, header)[:-1] == layout
+            if not reuse:
+                os.ftruncate(fd, 0)
+                os.ftruncate(fd, total)
+            self._mmap = mmap.mmap(fd, total)
+        finally:
+            os.close(fd)
+
+        self._view = memoryview(self._mmap)
+        self._audio = self._view[self.audio_offset:self.event_offset]
+        self._event_lock = threading.Lock()
+
+        if reuse:
+            self.audio_cursor, _, self.event_count = struct.unpack_from(CURSOR_FMT, self._mmap, CURSOR_OFFSET)
+        else:
+            now = time.time()
+            struct.pack_into(LAYOUT_FMT, self._mmap, 0, *layout, now)
+            struct.pack_into(CURSOR_FMT, self._mmap, CURSOR_OFFSET, 0, now, 0)
+            self.audio_cursor = 0
+            self.event_count = 0
+
+        self.event('open', reused=reuse)
+
+    @property
+    def duration(self):
+        """环形区可保存的音频时长（秒）"""
+        return self.audio_capacity / (self.sample_rate * self.block_align)
+
+    def write(self, data):
+        """写入一块PCM（采集回调中调用：只做内存拷贝，无文件I/O）
+
+        Args:
+            data: bytes-like，按采样点对齐
+        """
+        view = memoryview(data).cast('B')
+        n = len(view)
+        if n > self.audio_capacity:
+            view = view[n - self.audio_capacity:]
+            self.audio_cursor += n - self.audio_capacity
+            n = self.audio_capacity
+
+        pos = self.audio_cursor % self.audio_capacity
+        first = min(n, self.audio_capacity - pos)
+        self._audio[pos:pos + first] = view[:first]
+        if first < n:
+            self._audio[:n - first] = view[first:]
+
+        # 先写数据再推进游标，崩溃时游标之前的数据都是完整的
+        self.audio_cursor += n
+        struct.pack_into(AUDIO_CURSOR_FMT, self._mmap, CURSOR_OFFSET, self.audio_cursor, time.time())
+
+    def event(self, kind, **info):
+        """记录一条事件（如串口消息、唤醒、错误）
+
+        Args:
+            kind: 事件类型
+            **info: 附加信息（需可JSON序列化）
+        """
+        payload = json.dumps({'kind': kind, **info}, ensure_ascii=False).encode('utf-8')
+        if len(payload) > self.event_size - EVENT_HEADER_SIZE:
+            # 截断的JSON无法解析，改为只记录类型和原长度
+            payload = json.dumps({'kind': kind, 'truncated': len(payload)}).encode('utf-8')
+
+        with self._event_lock:
+            slot = self.event_offset + (self.event_count % self.event_slots) * self.event_size
+            struct.pack_into(EVENT_FMT, self._mmap, slot, time.time(), self.audio_cursor, len(payload))
+            self._mmap[slot + EVENT_HEADER_SIZE:slot + EVENT_HEADER_SIZE + len(payload)] = payload
+            self.event_count += 1
+            struct.pack_into('<Q', self._mmap, EVENT_COUNT_OFFSET, self.event_count)
+
+    def sync(self):
+        """把映射写回磁盘（防掉电；进程崩溃不需要），不要在采集回调中调用"""
+        self._mmap.flush()
+
+    def close(self):
+        """同步并关闭映射"""
+        if self._mmap is None:
+            return
+        self.event('close')
+        self.sync()
+        self._audio.release()
+        self._view.release()
+        self._mmap.close()
+        self._mmap = None
+
+
+def read_black_box(path):
+    """按时间顺序读出黑匣子内容（可在写入端运行时读取，读到的是某一时刻的快照）
+
+    Args:
+        path: 黑匣子文件路径
+
+    Returns:
+        dict: {sample_rate, channels, sample_width, audio(bytes), start_time, end_time,
+               events[{wall_time, offset, kind, ...}]}，offset为事件在音频中的时间（秒），
+               早于音频起点的事件为负值
+
+    Raises:
+        ValueError: 不是黑匣子文件
+    """
+    with open(path, 'rb') as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    try:
+        magic, version, sample_rate, channels, sample_width, capacity, slots, size, created = \
+            struct.unpack_from(LAYOUT_FMT, mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"不是黑匣子文件: {path}")
+        cursor, audio_time, event_count = struct.unpack_from(CURSOR_FMT, mm, CURSOR_OFFSET)
+
+        bytes_per_second = sample_rate * channels * sample_width
+        available = min(cursor, capacity)
+        start_cursor = cursor - available
+        pos = start_cursor % capacity
+        first = min(available, capacity - pos)
+        base = HEADER_SIZE
+        audio = mm[base + pos:base + pos + first] + mm[base:base + available - first]
+
+        end_time = audio_time
+        start_time = end_time - available / bytes_per_second
+
+        events = []
+        event_offset = HEADER_SIZE + capacity
+        for i in range(max(0, event_count - slots), event_count):
+            slot = event_offset + (i % slots) * size
+            wall_time, event_cursor, length = struct.unpack_from(EVENT_FMT, mm, slot)
+            payload = mm[slot + EVENT_HEADER_SIZE:slot + EVENT_HEADER_SIZE + length]
+            try:
+                record = json.loads(payload.decode('utf-8'))
+            except ValueError:
+                record = {'kind': 'truncated', 'raw': payload.decode('utf-8', 'replace')}
+            events.append({
+                'wall_time': wall_time,
+                'offset': round((event_cursor - start_cursor) / bytes_per_second, 3),
+                **record,
+            })
+    finally:
+        mm.close()
+
+    return {
+        'sample_rate': sample_rate,
+        'channels': channels,
+        'sample_width': sample_width,
+        'created': created,
+        'audio': audio,
+        'start_time': start_time,
+        'end_time': end_time,
+        'events': events,
+    }
+
+
+def dump_black_box(path, output, events_output=None):
+    """把黑匣子展开成WAV和事件日志（JSON Lines）
+
+    Args:
+        path: 黑匣子文件路径
+        output: WAV输出路径
+        events_output: 事件日志路径，默认为 <output去扩展名>.events.jsonl
+
+    Returns:
+        dict: read_black_box的结果（不含audio）
+    """
+    box = read_black_box(path)
+
+    with wave.open(output, 'wb') as wf:
+        wf.setnchannels(box['channels'])
+        wf.setsampwidth(box['sample_width'])
+        wf.setframerate(box['sample_rate'])
+        wf.writeframes(box.pop('audio'))
+
+    if events_output is None:
+        events_output = os.path.splitext(output)[0] + '.events.jsonl'
+    with open(events_output, 'w', encoding='utf-8') as f:
+        for record in box['events']:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    box['events_output'] = events_output
+    return box
+
+
+def main():
+    parser = argparse.ArgumentParser(description="黑匣子查看与导出")
+    parser.add_argument('path', help="黑匣子文件")
+    parser.add_argument('-o', '--output', help="导出WAV路径，不指定时只显示状态")
+    parser.add_argument('--events', help="事件日志路径，默认为 <output>.events.jsonl")
+    args = parser.parse_args()
+
+    if args.output:
+        box = dump_black_box(args.path, args.output, args.events)
+        print(f"✓ 音频: {args.output}（{box['end_time'] - box['start_time']:.1f} 秒）")
+        print(f"✓ 事件: {box['events_output']}（{len(box['events'])} 条）")
+        return
+
+    box = read_black_box(args.path)
+    duration = box['end_time'] - box['start_time']
+    print(f"格式: {box['sample_rate']} Hz / {box['channels']} 声道 / {box['sample_width'] * 8} bit")
+    print(f"音频: {duration:.1f} 秒，截止 {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(box['end_time']))}")
+    print(f"事件: {len(box['events'])} 条")
+    for record in box['events'][-10:]:
+        info = {k: v for k, v in record.items() if k not in ('wall_time', 'offset', 'kind')}
+        print(f"  {record['offset']:+9.2f}s  {record['kind']}  {info if info else ''}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,580 @@
+#!/usr/bin/env python3
+"""
+采集源
+统一的音频采集接口：PyAudio声卡、ALSA直采（arecord）、PCM/WAV文件、
+生成的正弦音/噪声、Unix管道，
+都按帧返回相同的 AudioFrame（数据 + 按采样点数计算的时间戳）；
+非声卡源可设置速度倍数，用于无声卡环境下的快于实时的整链路测试。
+多声道（如环形6麦+参考声道）交织采集时，AudioFrame.samples()/channel()
+返回按步长访问的numpy视图，不做解交织复制；ChannelFanout让每个订阅者
+各自选择声道或混音
+
+    source = create_capture_source("file:recording.wav", speed=4)
+    with source:
+        for frame in source:
+            ...
+"""
+
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+
+import numpy as np
+
+from pcm_source import MappedAudioSource
+
+
+class AudioFrame:
+    """一帧采集音频"""
+
+    __slots__ = ('data', 'index', 'timestamp', 'arrival', 'channels')
+
+    def __init__(self, data, index, timestamp, arrival, channels=1):
+        # 16bit PCM（bytes或memoryview），多声道时按采样点交织
+        self.data = data
+        # 帧序号（从0开始）
+        self.index = index
+        # 帧起点在采集流中的时间（秒），按已采集的采样点数计算
+        self.timestamp = timestamp
+        # 帧交付时的单调时钟时间
+        self.arrival = arrival
+        # 声道数
+        self.channels = channels
+
+    def __len__(self):
+        return len(self.data)
+
+    def samples(self):
+        """int16视图，形状为 [采样点, 声道]（不复制）"""
+        return np.frombuffer(self.data, dtype='<i2').reshape(-1, self.channels)
+
+    def channel(self, index):
+        """单个声道的一维视图（按步长访问，不复制）"""
+        return self.samples()[:, index]
+
+
+def select_channels(samples, channels=None, downmix=False):
+    """从 [采样点, 声道] 数组中选择声道或混音
+
+    Args:
+        samples: AudioFrame.samples() 或同形状的数组
+        channels: None为全部声道；int为单个声道（一维视图）；
+            slice或连续的序号列表为视图，不连续的列表会复制
+        downmix: 是否把所选声道平均混为单声道（生成新数组）
+
+    Returns:
+        numpy数组，单声道时为一维
+    """
+    if channels is None:
+        selected = samples
+    elif isinstance(channels, (int, slice)):
+        selected = samples[:, channels]
+    else:
+        # 负序号按声道数换算，越界时报错（切片不会报错，只会得到空视图）
+        count = samples.shape[1]
+        channels = [c + count if c < 0 else c for c in channels]
+        if not channels or not all(0 <= c < count for c in channels):
+            raise IndexError(f"声道序号超出范围（共{count}声道）: {channels}")
+        if channels == list(range(channels[0], channels[-1] + 1)):
+            selected = samples[:, channels[0]:channels[-1] + 1]
+        else:
+            selected = samples[:, channels]
+
+    if downmix and selected.ndim == 2:
+        if selected.shape[1] == 1:
+            return selected[:, 0]
+        return selected.mean(axis=1).astype('<i2')
+    return selected
+
+
+def to_pcm(samples):
+    """数组转为连续的16bit PCM（已连续时不复制）
+
+    Returns:
+        memoryview（字节）
+    """
+    return memoryview(np.ascontiguousarray(samples, dtype='<i2')).cast('B')
+
+
+class ChannelFanout:
+    """多声道帧分发：每个订阅者按自己的声道选择/混音拿到数据"""
+
+    def __init__(self, channels):
+        """初始化
+
+        Args:
+            channels: 采集的声道数
+        """
+        self.channels = channels
+        self._subscribers = []
+
+    def subscribe(self, handler, channels=None, downmix=False):
+        """订阅
+
+        Args:
+            handler: 处理函数 handler(frame, samples)，samples见 select_channels
+            channels: 声道选择，同 select_channels
+            downmix: 是否混为单声道
+
+        Raises:
+            ValueError: 声道序号超出范围
+        """
+        if isinstance(channels, int):
+            indices = [channels]
+        elif isinstance(channels, slice):
+            indices = list(range(self.channels))[channels]
+        else:
+            indices = list(channels) if channels is not None else []
+        if any(not -self.channels <= i < self.channels for i in indices):
+            raise ValueError(f"声道序号超出范围（共 {self.channels} 声道）: {channels}")
+
+        self._subscribers.append((handler, channels, downmix))
+        return handler
+
+    def unsubscribe(self, handler):
+        self._subscribers = [s for s in self._subscribers if s[0] is not handler]
+
+    def feed(self, frame):
+        """把一帧分发给所有订阅者"""
+        samples = frame.samples()
+        for handler, channels, downmix in self._subscribers:
+            handler(frame, select_channels(samples, channels, downmix))
+
+    def run(self, source, max_frames=None):
+        """从采集源读取并分发，直到源结束或达到max_frames
+
+        Returns:
+            int: 分发的帧数
+        """
+        count = 0
+        for frame in source:
+            self.feed(frame)
+            count += 1
+            if max_frames is not None and count >= max_frames:
+                break
+        return count
+
+
+class CaptureSource:
+    """采集源基类：子类实现 _open / _read / _close"""
+
+    # 是否由硬件时钟决定节奏（声卡源不受speed影响）
+    realtime = False
+
+    def __init__(self, rate=16000, channels=1, sample_width=2, frame_samples=640, speed=1.0):
+        """初始化
+
+        Args:
+            rate: 采样率
+            channels: 声道数
+            sample_width: 采样字节数
+            frame_samples: 每帧采样点数，默认640（16k下40ms）
+            speed: 非声卡源的交付速度倍数，1.0为实时，0表示不限速
+        """
+        self.rate = rate
+        self.channels = channels
+        self.sample_width = sample_width
+        self.frame_samples = frame_samples
+        self.speed = speed
+
+        self._index = 0
+        self._samples = 0
+        self._start = None
+
+    @property
+    def frame_bytes(self):
+        return self.frame_samples * self.channels * self.sample_width
+
+    @property
+    def frame_duration(self):
+        """每帧时长（秒）"""
+        return self.frame_samples / self.rate
+
+    def open(self):
+        self._index = 0
+        self._samples = 0
+        self._open()
+        self._start = time.monotonic()
+        return self
+
+    def close(self):
+        self._close()
+
+    def read_frame(self, into=None):
+        """读取一帧
+
+        Args:
+            into: 可写缓冲（bytearray/memoryview），指定时直接读入其中，
+                帧数据为它的前若干字节（长度不超过frame_bytes）
+
+        Returns:
+            AudioFrame，源结束时返回None
+        """
+        if into is None:
+            data = self._read()
+        else:
+            view = memoryview(into)[:self.frame_bytes]
+            data = view[:self._read_into(view)]
+        if not data:
+            return None
+
+        if not self.realtime and self.speed:
+            # 按采样点数换算的交付时间，不累积sleep误差
+            due = self._start + (self._samples + len(data) // (self.channels * self.sample_width)) \
+                / self.rate / self.speed
+            delay = due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+        frame = AudioFrame(data, self._index, self._samples / self.rate, time.monotonic(), self.channels)
+        self._index += 1
+        self._samples += len(data) // (self.channels * self.sample_width)
+        return frame
+
+    def __iter__(self):
+        while True:
+            frame = self.read_frame()
+            if frame is None:
+                return
+            yield frame
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _open(self):
+        pass
+
+    def _read(self):
+        raise NotImplementedError
+
+    def _read_into(self, view):
+        """读入调用方的缓冲，返回字节数（默认经_read复制一次，子类可直接读入）"""
+        data = self._read()
+        view[:len(data)] = data
+        return len(data)
+
+    def _close(self):
+        pass
+
+
+class PyAudioSource(CaptureSource):
+    """声卡采集（PyAudio阻塞读取）"""
+
+    realtime = True
+
+    def __init__(self, audio=None, device_index=None, **kwargs):
+        """初始化
+
+        Args:
+            audio: PyAudio实例，None则自行创建（关闭时释放）
+            device_index: 音频输入设备索引
+        """
+        super().__init__(**kwargs)
+        self.audio = audio
+        self.device_index = device_index
+        self._own_audio = audio is None
+        self._stream = None
+
+    def _open(self):
+        if self.audio is None:
+            import pyaudio
+            self.audio = pyaudio.PyAudio()
+
+        self._stream = self.audio.open(
+            format=self.audio.get_format_from_width(self.sample_width),
+            channels=self.channels,
+            rate=self.rate,
+            input=True,
+            input_device_index=self.device_index,
+            frames_per_buffer=self.frame_samples
+        )
+
+    def _read(self):
+        return self._stream.read(self.frame_samples, exception_on_overflow=False)
+
+    def _close(self):
+        if self._stream:
+            self._stream.stop_stream()
+            self._stream.close()
+            self._stream = None
+        if self._own_audio and self.audio:
+            self.audio.terminate()
+            self.audio = None
+
+
+class FileSource(CaptureSource):
+    """PCM/WAV文件回放（mmap，帧为memoryview）"""
+
+    def __init__(self, path, loop=False, **kwargs):
+        """初始化
+
+        Args:
+            path: .pcm 或 .wav 文件，WAV的采样率/声道以文件头为准
+            loop: 到结尾后是否从头循环
+        """
+        super().__init__(**kwargs)
+        self.path = path
+        self.loop = loop
+        self._source = None
+
+    def _open(self):
+        self._source = MappedAudioSource(self.path, self.rate, self.channels, self.sample_width)
+        self.rate = self._source.sample_rate
+        self.channels = self._source.channels
+
+    def _read(self):
+        data = self._source.read(self.frame_bytes)
+        if not data and self.loop and self._source.nbytes:
+            self._source.seek(0)
+            data = self._source.read(self.frame_bytes)
+        return data
+
+    def _close(self):
+        if self._source:
+            self._source.close()
+            self._source = None
+
+
+class ToneSource(CaptureSource):
+    """生成的正弦音或白噪声"""
+
+    def __init__(self, freq=440.0, amplitude=3000, noise=0, duration=None, seed=None, **kwargs):
+        """初始化
+
+        Args:
+            freq: 正弦音频率（Hz），0表示不加正弦音
+            amplitude: 正弦音幅度
+            noise: 白噪声幅度（标准差），0表示不加噪声
+            duration: 总时长（秒），None表示无限
+            seed: 噪声随机种子，便于复现
+        """
+        super().__init__(**kwargs)
+        self.freq = freq
+        self.amplitude = amplitude
+        self.noise = noise
+        self.duration = duration
+        self.seed = seed
+        self._rng = None
+
+    def _open(self):
+        self._rng = np.random.default_rng(self.seed)
+
+    def _read(self):
+        total = None if self.duration is None else int(self.duration * self.rate)
+        n = self.frame_samples if total is None else min(self.frame_samples, total - self._samples)
+        if n <= 0:
+            return b''
+
+        t = (self._samples + np.arange(n)) / self.rate
+        signal = self.amplitude * np.sin(2 * np.pi * self.freq * t) if self.freq else np.zeros(n)
+        if self.noise:
+            signal = signal + self._rng.normal(0, self.noise, n)
+
+        samples = np.clip(signal, -32768, 32767).astype('<i2')
+        return np.repeat(samples, self.channels).tobytes()
+
+
+class PipeSource(CaptureSource):
+    """从Unix管道/FIFO读取裸PCM（如 arecord -t raw ... | 或 mkfifo）"""
+
+    def __init__(self, path='-', **kwargs):
+        """初始化
+
+        Args:
+            path: FIFO路径，'-' 表示标准输入
+        """
+        super().__init__(**kwargs)
+        self.path = path
+        self._file = None
+
+    def _open(self):
+        if self.path == '-':
+            self._file = os.fdopen(os.dup(sys.stdin.fileno()), 'rb', buffering=0)
+        else:
+            self._file = open(self.path, 'rb', buffering=0)
+
+    def _read(self):
+        buf = bytearray(self.frame_bytes)
+        return bytes(buf[:self._read_into(memoryview(buf))])
+
+    def _read_into(self, view):
+        # 凑满一帧再交付，管道写端关闭时返回剩余数据
+        got = 0
+        while got < len(view):
+            n = self._file.readinto(view[got:])
+            if not n:
+                break
+            got += n
+        return got
+
+    def _close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+
+class AlsaSource(PipeSource):
+    """ALSA直采：arecord输出裸PCM到管道，readinto直接读入预分配的帧缓冲
+
+    不经过PortAudio的回调线程和缓冲，按显式指定的周期大小采集；
+    read_frame()返回的帧数据是缓冲池中的memoryview，在之后第buffers次读取时被覆盖，
+    需要更久保留时复制，或用 read_frame(into=...) 读入自己的缓冲
+    """
+
+    realtime = True
+
+    def __init__(self, device='default', period_frames=None, buffer_periods=4, buffers=32, **kwargs):
+        """初始化
+
+        Args:
+            device: ALSA设备名，如 hw:1,0 / plughw:1,0 / default
+            period_frames: ALSA周期大小（采样点），默认与frame_samples相同
+            buffer_periods: ALSA缓冲区包含的周期数
+            buffers: 帧缓冲池大小
+        """
+        super().__init__(**kwargs)
+        self.device = device
+        self.period_frames = period_frames or self.frame_samples
+        self.buffer_periods = buffer_periods
+
+        self._pool = [bytearray(self.frame_bytes) for _ in range(buffers)]
+        self._views = [memoryview(buf) for buf in self._pool]
+        self._next = 0
+        self._process = None
+        self._setup = threading.Event()
+
+        # arecord -v 报告的实际参数
+        self.hw_params = {}
+        self.first_frame_latency = None
+
+    @property
+    def achieved_period(self):
+        """实际周期大小（采样点），arecord未报告时为None"""
+        return self.hw_params.get('period_size')
+
+    @property
+    def latency(self):
+        """采集延迟上限（秒）：实际缓冲区大小对应的时长"""
+        size = self.hw_params.get('buffer_size')
+        return size / self.hw_params.get('rate', self.rate) if size else None
+
+    def _open(self):
+        formats = {1: 'S8', 2: 'S16_LE', 3: 'S24_3LE', 4: 'S32_LE'}
+        argv = ['arecord', '-D', self.device, '-t', 'raw', '-v',
+                '-f', formats[self.sample_width], '-r', str(self.rate), '-c', str(self.channels),
+                f'--period-size={self.period_frames}',
+                f'--buffer-size={self.period_frames * self.buffer_periods}']
+        try:
+            self._process = subprocess.Popen(argv, stdin=subprocess.DEVNULL,
+                                             stdout=subprocess.PIPE, stderr=subprocess.PIPE, bufsize=0)
+        except FileNotFoundError:
+            raise RuntimeError("未找到arecord（alsa-utils），无法使用ALSA直采")
+
+        self._file = self._process.stdout
+        self._opened_at = time.monotonic()
+        self.hw_params = {}
+        self.first_frame_latency = None
+        self._setup.clear()
+        threading.Thread(target=self._read_stderr, daemon=True).start()
+
+    def _read_stderr(self):
+        """解析 arecord -v 输出的硬件参数（并持续读空stderr，避免管道写满阻塞arecord）"""
+        for raw in self._process.stderr:
+            line = raw.decode('utf-8', 'replace').strip()
+            match = re.match(r'(period_size|buffer_size|rate|period_time|buffer_time)\s*:\s*(\d+)', line)
+            if match and match.group(1) not in self.hw_params:
+                self.hw_params[match.group(1)] = int(match.group(2))
+            if 'period_size' in self.hw_params and 'buffer_size' in self.hw_params:
+                self._setup.set()
+        self._setup.set()
+
+    def _read(self):
+        view = self._views[self._next]
+        self._next = (self._next + 1) % len(self._views)
+        return view[:self._read_into(view)]
+
+    def _read_into(self, view):
+        got = super()._read_into(view)
+        if self.first_frame_latency is None and got:
+            self.first_frame_latency = time.monotonic() - self._opened_at
+            self._setup.wait(0.2)
+            self._report()
+        elif not got and self._process.poll() not in (None, 0):
+            print(f"✗ arecord已退出（返回码 {self._process.returncode}）")
+        return got
+
+    def _report(self):
+        period = self.achieved_period
+        if period is None:
+            print(f"ALSA采集: {self.device}（arecord未报告硬件参数）")
+            return
+        rate = self.hw_params.get('rate', self.rate)
+        buffer_size = self.hw_params.get('buffer_size', 0)
+        print(f"ALSA采集: {self.device} | 周期 {period} ({period / rate * 1000:.1f}ms，请求 {self.period_frames})"
+              f" | 缓冲 {buffer_size} ({buffer_size / rate * 1000:.1f}ms)"
+              f" | 首帧 {self.first_frame_latency * 1000:.0f}ms")
+
+    def _close(self):
+        if self._process:
+            self._process.terminate()
+            try:
+                self._process.wait(timeout=2)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+                self._process.wait()
+            self._process.stdout.close()
+            self._process.stderr.close()
+            self._process = None
+        self._file = None
+
+
+def create_capture_source(spec, **kwargs):
+    """按描述字符串创建采集源
+
+    Args:
+        spec: 采集源描述
+            pyaudio[:设备索引]     声卡
+            alsa[:ALSA设备]        ALSA直采（arecord），如 alsa:hw:1,0，默认default
+            file:路径              PCM/WAV文件
+            tone[:频率[:秒]]       正弦音
+            noise[:幅度[:秒]]      白噪声
+            pipe[:路径]            管道/FIFO，默认标准输入
+        **kwargs: 传给采集源的参数（rate、frame_samples、speed、audio等）
+
+    Returns:
+        CaptureSource
+    """
+    kind, _, arg = spec.partition(':')
+    args = arg.split(':') if arg else []
+
+    if kind == 'pyaudio':
+        if args:
+            kwargs['device_index'] = int(args[0])
+        return PyAudioSource(**kwargs)
+
+    # 文件/生成/管道源不需要PyAudio实例
+    kwargs.pop('audio', None)
+    kwargs.pop('device_index', None)
+
+    if kind == 'alsa':
+        return AlsaSource(arg or 'default', **kwargs)
+    if kind == 'file':
+        return FileSource(arg, **kwargs)
+    if kind == 'tone':
+        freq = float(args[0]) if args else 440.0
+        duration = float(args[1]) if len(args) > 1 else 3.0
+        return ToneSource(freq=freq, duration=duration, **kwargs)
+    if kind == 'noise':
+        level = float(args[0]) if args else 300.0
+        duration = float(args[1]) if len(args) > 1 else 3.0
+        return ToneSource(freq=0, noise=level, duration=duration, **kwargs)
+    if kind == 'pipe':
+        return PipeSource(arg or '-', **kwargs)
+
+    raise ValueError(f"未知的采集源: {spec}")
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+IAT识别结果增量拼接
+按每个中间结果的 sn / pgs / rg 对分段列表做追加或替换（wpgs动态修正），
+不再对每个中间结果从头重建整句文本；
+向下游提供 (稳定文本, 未稳定文本) 的回调和迭代器。
+rpl 的 rg 范围可以覆盖之前任意一个分段，中间结果无法判断哪些分段不会再被替换，
+因此只有最终结果（ls）才作为稳定文本，稳定文本只增不减
+"""
+
+import bisect
+import queue
+import threading
+
+
+class IATAssembler:
+    """增量识别结果拼接器"""
+
+    def __init__(self):
+        # 分段列表 [(位置, sn, text)]，按位置递增；位置为该分段在句中的顺序，
+        # 替换结果继承被替换分段中最靠前的位置，rg按sn匹配
+        self._segments = []
+        self._text = ''
+        self._final = False
+        self._callbacks = []
+        self._queues = []
+        self._lock = threading.Lock()
+
+    @property
+    def text(self):
+        """当前完整文本"""
+        return self._text
+
+    @property
+    def is_final(self):
+        return self._final
+
+    def reset(self):
+        """开始新一轮识别"""
+        with self._lock:
+            self._segments = []
+            self._text = ''
+            self._final = False
+
+    def subscribe(self, callback):
+        """注册更新回调 callback(stable_text, unstable_text, final)"""
+        self._callbacks.append(callback)
+
+    def feed(self, iat_json, final=False):
+        """处理一个iat结果
+
+        Args:
+            iat_json: 解码后的iat结果，形如 {"text": {"sn": 1, "pgs": "apd", "rg": [..], "ws": [..]}}
+            final: 是否为最终结果（payload中iat的status为2）
+
+        Returns:
+            tuple: (稳定文本, 未稳定文本)，最终结果之前稳定文本为空，全部文本都是未稳定文本
+        """
+        result = iat_json.get('text', {})
+        sn = result.get('sn', max((seg[1] for seg in self._segments), default=0) + 1)
+        # 每个词取第一个候选
+        text = ''.join(ws['cw'][0]['w'] for ws in result.get('ws', []) if ws.get('cw'))
+        final = final or bool(result.get('ls'))
+
+        with self._lock:
+            segments = self._segments
+            position = sn
+            if result.get('pgs') == 'rpl' and result.get('rg'):
+                # 删除sn在rg范围内的分段，替换结果放在被替换分段的位置
+                start, end = result['rg']
+                replaced = [seg for seg in segments if start <= seg[1] <= end]
+                if replaced:
+                    position = min(seg[0] for seg in replaced)
+                    segments[:] = [seg for seg in segments if not start <= seg[1] <= end]
+            bisect.insort(segments, (position, sn, text))
+
+            # 之后的rpl可能替换任意分段，只有最终结果才能确定不再变化
+            self._text = ''.join(seg[2] for seg in segments)
+            self._final = final
+
+            if final:
+                stable, unstable = self._text, ''
+            else:
+                stable, unstable = '', self._text
+
+        for callback in self._callbacks:
+            callback(stable, unstable, final)
+        for q in list(self._queues):
+            q.put((stable, unstable, final))
+
+        return stable, unstable
+
+    def iter_updates(self, timeout=None):
+        """迭代后续的识别更新，直到最终结果
+
+        Args:
+            timeout: 等待单次更新的超时（秒），超时结束迭代
+
+        Yields:
+            tuple: (稳定文本, 未稳定文本)
+        """
+        q = queue.Queue()
+        self._queues.append(q)
+        try:
+            while True:
+                try:
+                    stable, unstable, final = q.get(timeout=timeout)
+                except queue.Empty:
+                    return
+                yield stable, unstable
+                if final:
+                    return
+        finally:
+            self._queues.remove(q)
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+多意图结果聚合
+一句话可能被 cbm_tidy 拆分为多个意图，每个意图的落域（cbm_intent_domain）
+和技能结果（cbm_semantic）按 parameter.<key>.loc.intent 分别返回；
+这里按意图序号增量组装成结构化结果，每个意图的技能结果一到就回调，
+不必等整轮结束，机器人可以先执行串联指令中的第一个
+"""
+
+import json
+import queue
+import threading
+
+
+class IntentResult:
+    """单个意图的结果"""
+
+    __slots__ = ('index', 'text', 'domain', 'semantic')
+
+    def __init__(self, index):
+        self.index = index
+        # cbm_tidy 拆分出的意图语料
+        self.text = None
+        # cbm_intent_domain 落域结果
+        self.domain = None
+        # cbm_semantic 技能结果
+        self.semantic = None
+
+    @property
+    def rc(self):
+        return self.semantic.get('rc') if self.semantic else None
+
+    @property
+    def category(self):
+        return self.semantic.get('category') if self.semantic else None
+
+    @property
+    def answer(self):
+        """技能回复文本，未命中技能时为None"""
+        if not self.semantic or self.semantic.get('rc') != 0:
+            return None
+        return self.semantic.get('answer', {}).get('text')
+
+    def to_dict(self):
+        return {
+            'index': self.index,
+            'text': self.text,
+            'domain': self.domain,
+            'rc': self.rc,
+            'category': self.category,
+            'answer': self.answer,
+        }
+
+
+class TurnResult:
+    """一轮交互的全部意图结果"""
+
+    __slots__ = ('sid', 'intents', 'complete')
+
+    def __init__(self, sid=None):
+        self.sid = sid
+        # 意图序号 → IntentResult
+        self.intents = {}
+        self.complete = False
+
+    def intent(self, index):
+        result = self.intents.get(index)
+        if result is None:
+            result = self.intents[index] = IntentResult(index)
+        return result
+
+    def ordered(self):
+        """按意图序号排列的结果列表"""
+        return [self.intents[i] for i in sorted(self.intents)]
+
+    def to_dict(self):
+        return {
+            'sid': self.sid,
+            'intents': [intent.to_dict() for intent in self.ordered()],
+        }
+
+
+class IntentAggregator:
+    """按意图序号增量组装结构化结果，并异步回调"""
+
+    def __init__(self):
+        self.result = TurnResult()
+        self._intent_handlers = []
+        self._complete_handlers = []
+
+        # 回调在独立线程中按到达顺序执行，不阻塞WebSocket接收线程；
+        # 线程在注册第一个回调时启动，只读取result的调用方（如文本请求池）不占线程
+        self._callbacks = queue.Queue()
+        self._thread = None
+
+    def attach(self, decoder):
+        """订阅AIUIResponseDecoder中的意图相关结果"""
+        decoder.subscribe('cbm_tidy', self._on_tidy)
+        decoder.subscribe('cbm_intent_domain', self._on_domain)
+        decoder.subscribe('cbm_semantic', self._on_semantic)
+        decoder.on_frame(self._on_frame)
+
+    def on_intent(self, handler):
+        """注册意图回调 handler(intent_result, turn_result)，某个意图的技能结果到达时调用"""
+        self._start()
+        self._intent_handlers.append(handler)
+
+    def on_complete(self, handler):
+        """注册整轮回调 handler(turn_result)，本轮最后一条消息到达时调用"""
+        self._start()
+        self._complete_handlers.append(handler)
+
+    def reset(self):
+        """开始新一轮交互"""
+        self.result = TurnResult()
+
+    def close(self):
+        """等待已排队的回调执行完并停止回调线程"""
+        if self._thread is None:
+            return
+        self._callbacks.put(None)
+        self._thread.join()
+        self._thread = None
+
+    def _start(self):
+        """启动回调线程"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def _turn(self, frame):
+        """取本轮结果；收到新会话的消息时自动开始新的一轮"""
+        if frame.sid and frame.sid != self.result.sid:
+            if self.result.sid is not None:
+                self.result = TurnResult()
+            self.result.sid = frame.sid
+        return self.result
+
+    @staticmethod
+    def _index(frame, key):
+        index = frame.intent_index(key)
+        return 0 if index == "-" else index
+
+    def _on_tidy(self, tidy, block, frame):
+        turn = self._turn(frame)
+        for item in tidy.get('intent', []):
+            turn.intent(item.get('index', 0)).text = item.get('value')
+
+    def _on_domain(self, domain, block, frame):
+        turn = self._turn(frame)
+        try:
+            domain = json.loads(domain)
+        except ValueError:
+            pass
+        turn.intent(self._index(frame, 'cbm_intent_domain')).domain = domain
+
+    def _on_semantic(self, semantic, block, frame):
+        turn = self._turn(frame)
+        intent = turn.intent(self._index(frame, 'cbm_semantic'))
+        intent.semantic = semantic
+        if intent.text is None:
+            intent.text = semantic.get('text')
+
+        for handler in self._intent_handlers:
+            self._callbacks.put((handler, (intent, turn)))
+
+    def _on_frame(self, frame):
+        if frame.status != 2:
+            return
+
+        turn = self._turn(frame)
+        turn.complete = True
+        for handler in self._complete_handlers:
+            self._callbacks.put((handler, (turn,)))
+
+    def _run(self):
+        while True:
+            item = self._callbacks.get()
+            if item is None:
+                break
+
+            handler, args = item
+            try:
+                handler(*args)
+            except Exception as e:
+                print(f"✗ 意图回调失败: {e}")
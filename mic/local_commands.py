@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+本地指令快速响应
+在每个IAT中间结果上用Aho-Corasick自动机匹配指令短语表，
+稳定文本一旦命中立即触发本地处理函数，不必等待云端语义和TTS；
+云端NLP照常在后台进行。短语前有否定词（"不要停止"）时不触发
+"""
+
+from collections import deque
+
+
+# 默认指令短语表：指令名 → 触发短语
+DEFAULT_COMMANDS = {
+    'stop': ['停止', '停下', '别说了', '闭嘴', '安静'],
+    'volume_up': ['大声点', '声音大一点', '音量调大', '调大音量'],
+    'volume_down': ['小声点', '声音小一点', '音量调小', '调小音量'],
+    'turn_to_me': ['看着我', '转过来', '转向我'],
+}
+
+# 否定词：出现在命中短语之前同一分句的若干字以内时不触发
+NEGATION_CHARS = '不别没勿莫'
+NEGATION_WINDOW = 3
+CLAUSE_BREAKS = '，。！？；、,.!?; '
+
+
+class PhraseMatcher:
+    """多短语匹配自动机（Aho-Corasick），一次扫描即可找出全部命中短语"""
+
+    def __init__(self, commands):
+        """编译短语表
+
+        Args:
+            commands: 指令名 → 触发短语列表
+        """
+        # 每个状态：字符 → 下一状态；状态0为根
+        self._goto = [{}]
+        self._fail = [0]
+        # 每个状态结束的 (短语, 指令名)，已合并失败链上的输出
+        self._output = [[]]
+
+        for command, phrases in commands.items():
+            for phrase in phrases:
+                self._add(phrase, command)
+
+        self._build_fail_links()
+
+    def _add(self, phrase, command):
+        state = 0
+        for ch in phrase:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = nxt
+        self._output[state].append((phrase, command))
+
+    def _build_fail_links(self):
+        """按层次遍历计算失败指针（第一层状态的失败指针为根）"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                self._output[nxt] = self._output[nxt] + self._output[self._fail[nxt]]
+
+    def step(self, state, ch):
+        """从state读入一个字符，返回新状态"""
+        while state and ch not in self._goto[state]:
+            state = self._fail[state]
+        return self._goto[state].get(ch, 0)
+
+    def outputs(self, state):
+        """state处结束的 (短语, 指令名) 列表"""
+        return self._output[state]
+
+    def search(self, text, state=0):
+        """扫描一段文本
+
+        Args:
+            text: 待匹配文本
+            state: 起始状态（用于接着上一段文本继续扫描）
+
+        Returns:
+            tuple: ([(结束位置, 短语, 指令名)], 扫描结束时的状态)
+        """
+        matches = []
+        for i, ch in enumerate(text):
+            state = self.step(state, ch)
+            for phrase, command in self._output[state]:
+                matches.append((i + 1, phrase, command))
+        return matches, state
+
+
+def negated(text, start):
+    """text中从start开始的短语前面（同一分句内）是否有否定词"""
+    window = ''
+    for ch in reversed(text[max(0, start - NEGATION_WINDOW):start]):
+        if ch in CLAUSE_BREAKS:
+            break
+        window += ch
+    return any(ch in NEGATION_CHARS for ch in window)
+
+
+class LocalCommandDispatcher:
+    """根据增量识别结果触发本地指令处理函数
+
+    在每个识别结果上调用 on_update，并带上该结果所属的会话ID：
+        dispatcher = LocalCommandDispatcher({'stop': DEFAULT_COMMANDS['stop']})
+        dispatcher.register('stop', handler)
+        stable, unstable = assembler.feed(iat_json, final)
+        dispatcher.on_update(stable, unstable, final, sid=frame.sid)
+    """
+
+    def __init__(self, commands=None, confirm_partials=2):
+        """初始化
+
+        Args:
+            commands: 指令名 → 触发短语列表，默认 DEFAULT_COMMANDS；
+                只应包含注册了处理函数的指令
+            confirm_partials: 未稳定文本中的命中需要在连续多少个中间结果里出现才触发，
+                稳定文本中的命中立即触发
+        """
+        self.matcher = PhraseMatcher(commands or DEFAULT_COMMANDS)
+        self.confirm_partials = confirm_partials
+        self._handlers = {}
+        self.reset()
+
+    def register(self, command, handler):
+        """注册指令处理函数 handler(command, phrase, text, sid)
+
+        处理函数在调用 on_update 的线程（通常是WebSocket接收线程）中执行，应尽快返回
+        """
+        self._handlers.setdefault(command, []).append(handler)
+
+    def reset(self):
+        """开始新一轮识别（每轮每个指令最多触发一次）"""
+        self._fired = set()
+        # 稳定文本已扫描的部分及扫描结束时的自动机状态
+        self._scanned = ''
+        self._state = 0
+        # 未稳定文本中的命中 → 连续出现次数
+        self._pending = {}
+
+    def on_update(self, stable, unstable, final=False, sid=None):
+        """处理一次识别更新
+
+        Args:
+            stable: 稳定文本
+            unstable: 未稳定文本
+            final: 是否为最终结果
+            sid: 该识别结果所属的会话ID，原样传给处理函数
+
+        Returns:
+            list: 本次触发的指令名
+        """
+        # 稳定文本只在尾部增长，只扫描新增部分；不是延续时从头重扫
+        offset = len(self._scanned)
+        if stable.startswith(self._scanned):
+            matches, self._state = self.matcher.search(stable[offset:], self._state)
+        else:
+            offset = 0
+            matches, self._state = self.matcher.search(stable)
+        self._scanned = stable
+
+        fired = []
+        for end, phrase, command in matches:
+            if not negated(stable, offset + end - len(phrase)):
+                self._fire(command, phrase, stable, sid, fired)
+
+        # 未稳定文本从稳定文本末尾的状态继续扫描，跨越两段的短语也能命中
+        text = stable + unstable
+        matches, _ = self.matcher.search(unstable, self._state)
+        pending = {}
+        for end, phrase, command in matches:
+            if negated(text, len(stable) + end - len(phrase)):
+                continue
+            count = self._pending.get((phrase, command), 0) + 1
+            pending[(phrase, command)] = count
+            if final or count >= self.confirm_partials:
+                self._fire(command, phrase, text, sid, fired)
+        self._pending = pending
+
+        return fired
+
+    def _fire(self, command, phrase, text, sid, fired):
+        if command in self._fired:
+            return
+        self._fired.add(command)
+        fired.append(command)
+
+        for handler in self._handlers.get(command, []):
+            try:
+                handler(command, phrase, text, sid)
+            except Exception as e:
+                print(f"✗ 本地指令处理失败: {command}, {e}")
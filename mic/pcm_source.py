@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+内存映射的PCM/WAV音频源
+文件用mmap映射，WAV头只解析一次；按帧返回memoryview、按区间返回numpy视图，
+都不复制数据，回放长录音时既不占用等量内存也没有逐帧拷贝；支持按时间定位
+"""
+
+import mmap
+import os
+import struct
+
+import numpy as np
+
+
+class MappedAudioSource:
+    """mmap音频源（16bit PCM，.pcm裸数据或.wav）"""
+
+    def __init__(self, path, sample_rate=16000, channels=1, sample_width=2):
+        """打开音频文件
+
+        Args:
+            path: .pcm 或 .wav 文件路径
+            sample_rate / channels / sample_width: 裸PCM的格式，WAV以文件头为准
+
+        Raises:
+            ValueError: 不是有效的WAV或不是16bit PCM
+        """
+        self.path = path
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.sample_width = sample_width
+
+        self._file = open(path, 'rb')
+        size = os.fstat(self._file.fileno()).st_size
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+        buffer = memoryview(self._mmap) if self._mmap else memoryview(b'')
+
+        offset, length = 0, size
+        try:
+            if buffer[:4] == b'RIFF' and buffer[8:12] == b'WAVE':
+                offset, length = self._parse_wav(buffer)
+            if self.sample_width != 2:
+                raise ValueError(f"只支持16bit PCM: {path}")
+        except ValueError:
+            buffer.release()
+            self.close()
+            raise
+
+        # 只保留整帧（所有声道一个采样点）
+        length -= length % self.block_align
+        self._view = buffer[offset:offset + length]
+        self._pos = 0
+
+    def _parse_wav(self, buffer):
+        """遍历RIFF块，返回data块的 (偏移, 长度)"""
+        pos = 12
+        fmt_found = False
+        while pos + 8 <= len(buffer):
+            chunk_id = bytes(buffer[pos:pos + 4])
+            chunk_size, = struct.unpack_from('<I', buffer, pos + 4)
+            body = pos + 8
+
+            if chunk_id == b'fmt ':
+                audio_format, self.channels, self.sample_rate = struct.unpack_from('<HHI', buffer, body)
+                bits, = struct.unpack_from('<H', buffer, body + 14)
+                self.sample_width = bits // 8
+                if audio_format not in (1, 0xFFFE):
+                    raise ValueError(f"不是PCM格式的WAV: {self.path}")
+                fmt_found = True
+            elif chunk_id == b'data':
+                if not fmt_found:
+                    raise ValueError(f"WAV缺少fmt块: {self.path}")
+                # 未正常关闭的录音data长度可能为0或0xFFFFFFFF，以文件实际大小为准
+                available = len(buffer) - body
+                if chunk_size == 0 or chunk_size > available:
+                    chunk_size = available
+                return body, chunk_size
+
+            pos = body + chunk_size + (chunk_size & 1)
+
+        raise ValueError(f"WAV缺少data块: {self.path}")
+
+    @property
+    def block_align(self):
+        """一个采样点（所有声道）的字节数"""
+        return self.channels * self.sample_width
+
+    @property
+    def bytes_per_second(self):
+        return self.sample_rate * self.block_align
+
+    @property
+    def nbytes(self):
+        return len(self._view)
+
+    @property
+    def num_samples(self):
+        return len(self._view) // self.block_align
+
+    @property
+    def duration(self):
+        """总时长（秒）"""
+        return self.num_samples / self.sample_rate
+
+    def tell(self):
+        """当前读取位置（秒）"""
+        return self._pos / self.bytes_per_second
+
+    def seek(self, seconds):
+        """定位到指定时间（秒），按采样点对齐"""
+        pos = int(seconds * self.sample_rate) * self.block_align
+        self._pos = min(max(pos, 0), len(self._view))
+
+    def read(self, nbytes):
+        """从当前位置读取，返回memoryview（不复制），到结尾时可能不足nbytes"""
+        view = self._view[self._pos:self._pos + nbytes]
+        self._pos += len(view)
+        return view
+
+    def frames(self, frame_bytes=1280):
+        """从当前位置按帧迭代，每帧为memoryview（最后一帧可能不足frame_bytes）"""
+        while self._pos < len(self._view):
+            yield self.read(frame_bytes)
+
+    def array(self, start=0.0, duration=None):
+        """返回时间区间的numpy视图（int16，形状为 [采样点, 声道]，不复制）
+
+        Args:
+            start: 起始时间（秒）
+            duration: 时长（秒），None表示到结尾
+        """
+        first = int(start * self.sample_rate)
+        last = self.num_samples if duration is None else \
+            min(self.num_samples, first + int(duration * self.sample_rate))
+        data = np.frombuffer(self._view, dtype='<i2').reshape(-1, self.channels)
+        return data[first:last]
+
+    def close(self):
+        """关闭映射；仍持有返回的memoryview/numpy视图时映射在视图释放后才会解除"""
+        view, self._view = getattr(self, '_view', None), None
+        try:
+            if view is not None:
+                view.release()
+            if self._mmap:
+                self._mmap.close()
+        except BufferError:
+            pass
+        self._mmap = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
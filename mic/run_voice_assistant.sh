@@ -32,11 +32,21 @@ echo ""
 read -p "是否指定音频输入设备？[y/N] " -n 1 -r
 echo
 
+# 设备列表走注册表缓存（声卡没有变化时不初始化PortAudio）
+AUDIO_DEVICES="$(cd "$(dirname "$0")" && pwd)/../xfmic/audio_devices.py"
+
 if [[ $REPLY =~ ^[Yy]$ ]]; then
     echo "可用的音频设备："
-    python3 -c "import pyaudio; p = pyaudio.PyAudio(); [print(f'  [{i}] {p.get_device_info_by_index(i)[\"name\"]}') for i in range(p.get_device_count()) if p.get_device_info_by_index(i)['maxInputChannels'] > 0]"
+    python3 "$AUDIO_DEVICES"
     echo ""
-    read -p "请输入设备索引: " AUDIO_INDEX
+    # 匹配到的设备名输出到stderr，显示出来供确认（可用 RK3328_USB_ID 指定USB id）
+    RK3328_INDEX=$(python3 "$AUDIO_DEVICES" --rk3328)
+    if [ -n "$RK3328_INDEX" ]; then
+        read -p "请输入设备索引（留空使用上面匹配到的RK3328 [$RK3328_INDEX]）: " AUDIO_INDEX
+        AUDIO_INDEX=${AUDIO_INDEX:-$RK3328_INDEX}
+    else
+        read -p "请输入设备索引: " AUDIO_INDEX
+    fi
 
     cd aiuiv3-demo-master/websocket/python
     python3 aiui_v3_demo.py "$SERIAL_PORT" "$AUDIO_INDEX"
@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+"""
+分段滚动录音
+长时间录音按时长或大小切成多个WAV分段，并在同目录写一个JSON Lines索引
+（分段 → 起始时间、采样点偏移，以及唤醒等标记）。每次写入后即更新当前分段的
+WAV头，进程崩溃时已写入的数据仍是有效WAV，最多丢失写盘线程尚未写出的部分。
+按时间窗口提取时只打开覆盖该窗口的分段
+
+    python3 segment_recorder.py audio_stream_20250101_120000/              # 列出分段和标记
+    python3 segment_recorder.py audio_stream_20250101_120000/ --from 3600 --to 3630 -o clip.wav
+"""
+
+import argparse
+import json
+import os
+import struct
+import threading
+import time
+import wave
+from datetime import datetime
+
+from pcm_source import MappedAudioSource
+
+
+INDEX_FILE = 'index.jsonl'
+WAV_HEADER_SIZE = 44
+
+
+def _wav_header(sample_rate, channels, sample_width, data_bytes=0):
+    """44字节的PCM WAV头"""
+    block_align = channels * sample_width
+    return struct.pack('<4sI4s4sIHHIIHH4sI',
+                       b'RIFF', 36 + data_bytes, b'WAVE',
+                       b'fmt ', 16, 1, channels, sample_rate,
+                       sample_rate * block_align, block_align, sample_width * 8,
+                       b'data', data_bytes)
+
+
+class SegmentedWavWriter:
+    """分段WAV写入器（在写盘线程中调用write，标记可在任意线程添加）"""
+
+    def __init__(self, directory, sample_rate=16000, channels=1, sample_width=2,
+                 segment_seconds=600, segment_bytes=None, start_time=None, prefix='seg'):
+        """创建录音目录并打开索引
+
+        Args:
+            directory: 录音目录，不存在时创建；已有索引时追加（新的一段录音流）
+            sample_rate / channels / sample_width: 音频格式
+            segment_seconds: 每个分段的时长（秒），None表示不按时长切分
+            segment_bytes: 每个分段的最大字节数（含WAV头），None表示不按大小切分
+            start_time: 第一个采样点的墙钟时间（time.time()），默认为当前时间；
+                各分段的起始时间按采样点数从这里推算
+            prefix: 分段文件名前缀
+        """
+        if not segment_seconds and not segment_bytes:
+            raise ValueError("segment_seconds 和 segment_bytes 至少指定一个")
+
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.sample_width = sample_width
+        self.block_align = channels * sample_width
+        self.prefix = prefix
+        self.start_time = time.time() if start_time is None else start_time
+
+        limits = []
+        if segment_seconds:
+            limits.append(int(segment_seconds * sample_rate))
+        if segment_bytes:
+            limits.append(max(1, (segment_bytes - WAV_HEADER_SIZE) // self.block_align))
+        self.segment_samples = min(limits)
+
+        os.makedirs(directory, exist_ok=True)
+        self._index = open(os.path.join(directory, INDEX_FILE), 'a', encoding='utf-8')
+        self._lock = threading.Lock()
+        self._append_index({
+            'type': 'stream',
+            'start_time': self.start_time,
+            'sample_rate': sample_rate,
+            'channels': channels,
+            'sample_width': sample_width,
+        })
+
+        self._file = None
+        self._segment_name = None
+        self._segment_bytes = 0
+        self._pending = b''
+
+        self.samples_written = 0
+        self.bytes_written = 0
+        self.segments = 0
+
+    def _append_index(self, record):
+        with self._lock:
+            self._index.write(json.dumps(record, ensure_ascii=False) + '\n')
+            self._index.flush()
+
+    def _open_segment(self):
+        start_time = self.start_time + self.samples_written / self.sample_rate
+        stamp = datetime.fromtimestamp(start_time).strftime('%Y%m%d_%H%M%S')
+        self._segment_name = f"{self.prefix}_{stamp}_{self.segments:05d}.wav"
+        self._file = open(os.path.join(self.directory, self._segment_name), 'wb', buffering=0)
+        self._file.write(_wav_header(self.sample_rate, self.channels, self.sample_width))
+        self._segment_bytes = 0
+        self.segments += 1
+
+        self._append_index({
+            'type': 'segment',
+            'file': self._segment_name,
+            'start_time': round(start_time, 6),
+            'sample_offset': self.samples_written,
+        })
+
+    def _close_segment(self):
+        if self._file is None:
+            return
+
+        self._update_header()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        self._file = None
+
+        self._append_index({
+            'type': 'close',
+            'file': self._segment_name,
+            'samples': self._segment_bytes // self.block_align,
+        })
+
+    def _update_header(self):
+        """更新RIFF和data块长度（不移动文件位置）"""
+        fd = self._file.fileno()
+        os.pwrite(fd, struct.pack('<I', 36 + self._segment_bytes), 4)
+        os.pwrite(fd, struct.pack('<I', self._segment_bytes), 40)
+
+    def write(self, data):
+        """写入PCM数据，到达分段上限时切换到新分段
+
+        Args:
+            data: bytes-like，按采样点对齐的PCM数据（不足一个采样点的尾部留到下次）
+        """
+        view = memoryview(data).cast('B')
+        if self._pending:
+            view = memoryview(self._pending + bytes(view))
+            self._pending = b''
+
+        tail = len(view) % self.block_align
+        if tail:
+            self._pending = bytes(view[len(view) - tail:])
+            view = view[:len(view) - tail]
+
+        while view:
+            if self._file is None:
+                self._open_segment()
+
+            room = self.segment_samples * self.block_align - self._segment_bytes
+            chunk = view[:room]
+            self._file.write(chunk)
+            self._segment_bytes += len(chunk)
+            self.bytes_written += len(chunk)
+            self.samples_written += len(chunk) // self.block_align
+            view = view[len(chunk):]
+
+            if self._segment_bytes >= self.segment_samples * self.block_align:
+                self._close_segment()
+            else:
+                self._update_header()
+
+    def mark(self, label, sample_offset=None, wall_time=None, **info):
+        """添加标记（如唤醒事件）
+
+        Args:
+            label: 标记名称，如 wakeup
+            sample_offset: 标记对应的采样点偏移（本段录音流内），
+                默认为已写入的采样点数；采集回调中的计数更准确
+            wall_time: 标记的墙钟时间，默认为当前时间
+            **info: 附加信息（需可JSON序列化），如 angle、beam
+        """
+        if sample_offset is None:
+            sample_offset = self.samples_written
+
+        record = {
+            'type': 'marker',
+            'label': label,
+            'sample_offset': sample_offset,
+            'time': round(self.start_time + sample_offset / self.sample_rate, 6),
+            'wall_time': round(time.time() if wall_time is None else wall_time, 6),
+        }
+        if info:
+            record['info'] = info
+        self._append_index(record)
+
+    def flush(self):
+        """与AsyncAudioWriter配合：fsync前调用（分段文件无缓冲，索引已逐行刷新）"""
+
+    def fileno(self):
+        """当前分段的文件描述符（供AsyncAudioWriter定期fsync），两个分段之间返回索引文件"""
+        if self._file is None:
+            return self._index.fileno()
+        return self._file.fileno()
+
+    def close(self):
+        """关闭当前分段和索引"""
+        if self._pending:
+            print(f"⚠ 丢弃不足一个采样点的尾部数据 {len(self._pending)} 字节")
+            self._pending = b''
+
+        self._close_segment()
+        os.fsync(self._index.fileno())
+        self._index.close()
+
+
+class SegmentIndex:
+    """读取分段录音目录的索引，按时间窗口提取音频"""
+
+    def __init__(self, directory):
+        """加载索引
+
+        Args:
+            directory: SegmentedWavWriter写入的录音目录
+
+        Raises:
+            FileNotFoundError: 目录中没有索引文件
+        """
+        self.directory = directory
+        self.segments = []
+        self.markers = []
+        self.sample_rate = 16000
+        self.channels = 1
+        self.sample_width = 2
+
+        by_name = {}
+        with open(os.path.join(directory, INDEX_FILE), encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # 崩溃时最后一行可能不完整
+                    continue
+
+                kind = record.get('type')
+                if kind == 'stream':
+                    self.sample_rate = record['sample_rate']
+                    self.channels = record['channels']
+                    self.sample_width = record['sample_width']
+                elif kind == 'segment':
+                    segment = {
+                        'file': record['file'],
+                        'start_time': record['start_time'],
+                        'sample_offset': record['sample_offset'],
+                        'sample_rate': self.sample_rate,
+                        'samples': None,
+                    }
+                    self.segments.append(segment)
+                    by_name[record['file']] = segment
+                elif kind == 'close' and record.get('file') in by_name:
+                    by_name[record['file']]['samples'] = record['samples']
+                elif kind == 'marker':
+                    self.markers.append(record)
+
+        # 未正常关闭的分段以文件实际长度为准
+        block_align = self.channels * self.sample_width
+        for segment in self.segments:
+            if segment['samples'] is None:
+                path = os.path.join(directory, segment['file'])
+                size = os.path.getsize(path) if os.path.exists(path) else WAV_HEADER_SIZE
+                segment['samples'] = max(0, size - WAV_HEADER_SIZE) // block_align
+            segment['end_time'] = segment['start_time'] + segment['samples'] / segment['sample_rate']
+
+    @property
+    def start_time(self):
+        return self.segments[0]['start_time'] if self.segments else None
+
+    @property
+    def end_time(self):
+        return self.segments[-1]['end_time'] if self.segments else None
+
+    def find(self, t0, t1):
+        """返回与时间窗口 [t0, t1) 重叠的分段（墙钟时间）"""
+        return [s for s in self.segments if s['end_time'] > t0 and s['start_time'] < t1]
+
+    def markers_between(self, t0, t1):
+        """返回时间窗口 [t0, t1) 内的标记"""
+        return [m for m in self.markers if t0 <= m['time'] < t1]
+
+    def extract(self, t0, t1):
+        """提取时间窗口 [t0, t1) 的PCM数据，只打开覆盖窗口的分段
+
+        Args:
+            t0 / t1: 墙钟时间（time.time()），相对时间可加上 start_time
+
+        Returns:
+            bytes: PCM数据；窗口跨越两段录音流之间的空隙时，空隙部分不补静音
+        """
+        parts = []
+        for segment in self.find(t0, t1):
+            start = max(0.0, t0 - segment['start_time'])
+            duration = min(t1, segment['end_time']) - segment['start_time'] - start
+            with MappedAudioSource(os.path.join(self.directory, segment['file'])) as source:
+                source.seek(start)
+                nbytes = int(duration * source.sample_rate) * source.block_align
+                parts.append(bytes(source.read(nbytes)))
+        return b''.join(parts)
+
+    def extract_wav(self, t0, t1, output):
+        """提取时间窗口并保存为WAV
+
+        Returns:
+            int: 写入的字节数
+        """
+        data = self.extract(t0, t1)
+        with wave.open(output, 'wb') as wf:
+            wf.setnchannels(self.channels)
+            wf.setsampwidth(self.sample_width)
+            wf.setframerate(self.sample_rate)
+            wf.writeframes(data)
+        return len(data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="分段录音索引查看与按时间窗口提取")
+    parser.add_argument('directory', help="分段录音目录")
+    parser.add_argument('--from', dest='t0', type=float, help="窗口起点（秒，相对录音开始）")
+    parser.add_argument('--to', dest='t1', type=float, help="窗口终点（秒，相对录音开始）")
+    parser.add_argument('--epoch', action='store_true', help="--from/--to 为Unix时间戳")
+    parser.add_argument('-o', '--output', default='clip.wav', help="提取结果WAV文件")
+    args = parser.parse_args()
+
+    index = SegmentIndex(args.directory)
+    if not index.segments:
+        print("索引中没有分段")
+        return
+
+    base = 0 if args.epoch else index.start_time
+
+    if args.t0 is None and args.t1 is None:
+        print(f"分段: {len(index.segments)} 个，"
+              f"共 {index.end_time - index.start_time:.1f} 秒（不含录音流间的空隙）")
+        for s in index.segments:
+            print(f"  {s['file']}  +{s['start_time'] - index.start_time:.1f}s  "
+                  f"{s['samples'] / s['sample_rate']:.1f}s  偏移 {s['sample_offset']}")
+        if index.markers:
+            print(f"标记: {len(index.markers)} 个")
+            for m in index.markers:
+                print(f"  +{m['time'] - index.start_time:.2f}s  {m['label']}  {m.get('info', '')}")
+        return
+
+    t0 = base + (args.t0 or 0)
+    t1 = index.end_time if args.t1 is None else base + args.t1
+    nbytes = index.extract_wav(t0, t1, args.output)
+    print(f"✓ 已提取 {nbytes} 字节（{len(index.find(t0, t1))} 个分段）→ {args.output}")
+    for m in index.markers_between(t0, t1):
+        print(f"  +{m['time'] - t0:.2f}s  {m['label']}  {m.get('info', '')}")
+
+
+if __name__ == '__main__':
+    main()
@@ -11,42 +11,118 @@ import sys
 import os
 from datetime import datetime
 import time
+import json
+import threading
+
+from async_writer import AsyncAudioWriter
+from segment_recorder import SegmentedWavWriter
+from black_box import BlackBoxRecorder
+
+# 添加xfmic目录到路径以导入RK3328控制器和采集测量
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'xfmic'))
+from audio_devices import get_pyaudio, get_registry
+from capture_metrics import CaptureMetrics
+
+
+# 串口唤醒信息中记入黑匣子的字段
+IVW_FIELDS = ('angle', 'beam', 'keyword', 'score', 'physical')
+
+
+def compact_serial_message(msg):
+    """串口消息的精简记录：消息类型、事件类型和唤醒信息的关键字段
+
+    黑匣子事件槽大小固定，完整的aiui_event消息（info为JSON字符串）放不下
+
+    Args:
+        msg: RK3328Controller.read_device_message 返回的消息
+
+    Returns:
+        dict: {type, eventType, arg1, arg2, angle, beam, keyword, ...}（只含存在的字段）
+    """
+    record = {'type': msg.get('type')}
+    content = msg.get('content')
+    if not isinstance(content, dict):
+        return record
+
+    for key in ('eventType', 'arg1', 'arg2'):
+        if key in content:
+            record[key] = content[key]
+
+    info = content.get('info')
+    if isinstance(info, str):
+        try:
+            info = json.loads(info)
+        except ValueError:
+            info = None
+    ivw = info.get('ivw') if isinstance(info, dict) else None
+    if isinstance(ivw, dict):
+        for key in IVW_FIELDS:
+            if key in ivw:
+                record[key] = ivw[key]
+    return record
 
 
 class StreamRecorder:
     """实时音频流录制器"""
 
-    def __init__(self, device_index=None):
+    def __init__(self, device_index=None, channels=1, fsync_interval=5.0,
+                 segment_seconds=None, segment_mb=None, serial_port=None,
+                 black_box=None, black_box_minutes=5):
         """初始化录制器
 
         Args:
             device_index: 音频输入设备索引，None表示使用默认设备
+            channels: 声道数，阵列原始数据（如环形6麦+参考声道）按交织格式整体录制
+            fsync_interval: 写盘线程fsync间隔（秒），0表示只在停止时fsync
+            segment_seconds: 分段时长（秒），与segment_mb都为None时录制单个WAV
+            segment_mb: 分段最大大小（MB）
+            serial_port: RK3328串口，指定时把唤醒事件记为分段索引中的标记（黑匣子模式下记录所有串口消息）
+            black_box: 黑匣子文件路径，指定时只把最近的音频写入固定大小的环形文件，不录制WAV
+            black_box_minutes: 黑匣子保存的音频时长（分钟）
         """
         self.device_index = device_index
-        self.audio = pyaudio.PyAudio()
+        self.fsync_interval = fsync_interval
+        self.segment_seconds = segment_seconds
+        self.segment_mb = segment_mb
+        self.serial_port = serial_port
+        self.black_box_path = black_box
+        self.black_box_minutes = black_box_minutes
 
         # RK3328音频参数
         self.sample_rate = 16000    # 16kHz
-        self.channels = 1           # 单声道
+        self.channels = channels    # 默认单声道
         self.format = pyaudio.paInt16  # 16位PCM
         self.chunk_size = 1024      # 每次读取的帧数
 
         self.stream = None
+        self.metrics = CaptureMetrics('stream_recorder', self.sample_rate, self.chunk_size)
         self.wf = None
+        self.file = None
+        self.segments = None
+        self.black_box = None
+        self.writer = None
+        self.frame_count = 0
         self.is_recording = False
 
+    @property
+    def audio(self):
+        """进程内共享的PyAudio实例（首次使用时才初始化PortAudio，列设备不需要）"""
+        return get_pyaudio()
+
     def list_devices(self):
         """列出所有可用的音频输入设备"""
         print("\n可用的音频输入设备：")
         print("-" * 70)
 
-        for i in range(self.audio.get_device_count()):
-            info = self.audio.get_device_info_by_index(i)
-            if info['maxInputChannels'] > 0:
-                print(f"[{i}] {info['name']}")
-                print(f"    采样率: {int(info['defaultSampleRate'])} Hz")
-                print(f"    输入通道: {info['maxInputChannels']}")
-                print()
+        # 设备列表来自注册表缓存，声卡没有变化时不重新扫描
+        registry = get_registry()
+        rk3328 = registry.find_rk3328()
+        for info in registry.input_devices():
+            mark = "  ← RK3328" if info['index'] == rk3328 else ""
+            print(f"[{info['index']}] {info['name']}{mark}")
+            print(f"    采样率: {int(info['default_sample_rate'])} Hz")
+            print(f"    输入通道: {info['max_input_channels']}")
+            print()
 
         print("-" * 70)
 
@@ -56,10 +132,12 @@ class StreamRecorder:
         Args:
             output_file: 输出文件路径，None则自动生成文件名
         """
-        # 生成输出文件名
+        segmented = bool(self.segment_seconds or self.segment_mb) and not self.black_box_path
+
+        # 生成输出文件名（分段模式下为目录名）
         if output_file is None:
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            output_file = f"audio_stream_{timestamp}.wav"
+            output_file = f"audio_stream_{timestamp}" + ("" if segmented else ".wav")
 
         # 确保文件路径在xfmic目录下
         if not os.path.isabs(output_file):
@@ -73,16 +151,43 @@ class StreamRecorder:
         print(f"格式: 16-bit PCM")
 
         if self.device_index is not None:
-            device_info = self.audio.get_device_info_by_index(self.device_index)
-            print(f"输入设备: [{self.device_index}] {device_info['name']}")
+            device_info = get_registry().get(self.device_index)
+            if device_info:
+                print(f"输入设备: [{self.device_index}] {device_info['name']}")
 
         print("\n按 Ctrl+C 停止录制\n")
 
-        # 打开WAV文件
-        self.wf = wave.open(output_file, 'wb')
-        self.wf.setnchannels(self.channels)
-        self.wf.setsampwidth(self.audio.get_sample_size(self.format))
-        self.wf.setframerate(self.sample_rate)
+        # 打开WAV文件（或分段目录），写盘交给独立线程，回调中不做文件I/O；
+        # 黑匣子模式下回调直接写入内存映射的环形文件
+        if self.black_box_path:
+            output_file = self.black_box_path
+            self.black_box = BlackBoxRecorder(
+                output_file,
+                minutes=self.black_box_minutes,
+                sample_rate=self.sample_rate,
+                channels=self.channels,
+                sample_width=self.audio.get_sample_size(self.format)
+            )
+            print(f"黑匣子: 保存最近 {self.black_box.duration / 60:.1f} 分钟 → {output_file}")
+        elif segmented:
+            self.segments = SegmentedWavWriter(
+                output_file,
+                sample_rate=self.sample_rate,
+                channels=self.channels,
+                sample_width=self.audio.get_sample_size(self.format),
+                segment_seconds=self.segment_seconds,
+                segment_bytes=int(self.segment_mb * 1024 * 1024) if self.segment_mb else None
+            )
+            self.writer = AsyncAudioWriter(self.segments.write, self.segments,
+                                           fsync_interval=self.fsync_interval)
+        else:
+            self.file = open(output_file, 'wb')
+            self.wf = wave.open(self.file, 'wb')
+            self.wf.setnchannels(self.channels)
+            self.wf.setsampwidth(self.audio.get_sample_size(self.format))
+            self.wf.setframerate(self.sample_rate)
+            self.writer = AsyncAudioWriter(self.wf.writeframesraw, self.file,
+                                           fsync_interval=self.fsync_interval)
 
         # 打开音频流
         self.stream = self.audio.open(
@@ -92,8 +197,9 @@ class StreamRecorder:
             input=True,
             input_device_index=self.device_index,
             frames_per_buffer=self.chunk_size,
-            stream_callback=self._audio_callback
+            stream_callback=self.metrics.wrap(self._audio_callback)
         )
+        self.metrics.reset()
 
         self.is_recording = True
         self.frame_count = 0
@@ -102,58 +208,140 @@ class StreamRecorder:
         # 开始录制
         self.stream.start_stream()
 
+        if self.serial_port and (self.segments or self.black_box):
+            threading.Thread(target=self._watch_serial, daemon=True).start()
+
         try:
             # 持续显示录制状态
             while self.is_recording and self.stream.is_active():
                 elapsed = time.time() - self.start_time
                 size_mb = (self.frame_count * self.channels * 2) / (1024 * 1024)
 
-                print(f"\r录制中... 时长: {int(elapsed)}秒 | 数据量: {size_mb:.2f} MB | 帧数: {self.frame_count}", end='', flush=True)
+                queue_info = f" | 写盘队列: {self.writer.queue_depth}" if self.writer else ""
+                print(f"\r录制中... 时长: {int(elapsed)}秒 | 数据量: {size_mb:.2f} MB | 帧数: {self.frame_count}"
+                      f"{queue_info} | 溢出: {self.metrics.overflows}", end='', flush=True)
                 time.sleep(0.1)
 
         except KeyboardInterrupt:
             print("\n\n收到停止信号，正在保存文件...")
 
-        self.stop_recording()
+        writer_stats = self.stop_recording()
 
         # 显示录制统计
         total_time = time.time() - self.start_time
-        file_size = os.path.getsize(output_file) / (1024 * 1024)
+        if segmented:
+            file_size = sum(os.path.getsize(os.path.join(output_file, name))
+                            for name in os.listdir(output_file)) / (1024 * 1024)
+        else:
+            file_size = os.path.getsize(output_file) / (1024 * 1024)
 
         print(f"\n录制完成！")
         print(f"  总时长: {int(total_time)} 秒")
         print(f"  文件大小: {file_size:.2f} MB")
         print(f"  保存位置: {output_file}")
+        if segmented:
+            print(f"  分段: {self._segment_count} 个（索引: segment_recorder.py {output_file}）")
+        print(f"  采集: {self.metrics.summary()}")
+        if writer_stats:
+            print(f"  写盘: {writer_stats['writes']} 次 | 平均 {writer_stats['mean_write_ms']} ms"
+                  f" | 最长 {writer_stats['max_write_ms']} ms | fsync最长 {writer_stats['max_fsync_ms']} ms"
+                  f" | 最大队列深度 {writer_stats['max_queue_depth']}")
 
     def _audio_callback(self, in_data, frame_count, time_info, status):
-        """音频流回调函数"""
-        if status:
-            print(f"\n警告: {status}")
-
-        # 写入数据到文件
-        if self.wf:
-            self.wf.writeframes(in_data)
+        """音频流回调函数（status由CaptureMetrics计数，在状态行显示）"""
+        # 交给写盘线程（in_data不再被PortAudio复用，直接转交所有权）
+        if self.writer:
+            self.writer.write(in_data)
+            self.frame_count += frame_count
+        elif self.black_box:
+            self.black_box.write(in_data)
             self.frame_count += frame_count
 
         return (in_data, pyaudio.paContinue)
 
+    def mark(self, label, **info):
+        """在分段索引（或黑匣子事件）中添加标记，位置取当前已采集的采样点数
+
+        Args:
+            label: 标记名称，如 wakeup
+            **info: 附加信息
+        """
+        if self.segments:
+            self.segments.mark(label, sample_offset=self.frame_count, **info)
+        elif self.black_box:
+            self.black_box.event(label, **info)
+
+    def _watch_serial(self):
+        """读取RK3328串口消息，把唤醒事件记为标记，黑匣子模式下同时记录所有消息"""
+        from rk3328_controller import RK3328Controller
+
+        rk3328 = RK3328Controller(self.serial_port)
+        if not rk3328.connect():
+            print(f"\n✗ 串口连接失败，不记录串口事件: {self.serial_port}")
+            return
+
+        try:
+            while self.is_recording:
+                msg = rk3328.read_device_message(timeout=0.5)
+                if not msg:
+                    continue
+
+                record = compact_serial_message(msg)
+                if self.black_box:
+                    self.black_box.event('serial', **record)
+
+                if record['type'] == 'aiui_event' and record.get('eventType') == 4:
+                    self.mark('wakeup', angle=record.get('angle', 0), beam=record.get('beam', 0))
+        finally:
+            rk3328.close()
+
     def stop_recording(self):
-        """停止录制"""
+        """停止录制
+
+        Returns:
+            dict: 写盘线程计数器，未在录制时返回None
+        """
         self.is_recording = False
+        writer_stats = None
 
         if self.stream:
             self.stream.stop_stream()
             self.stream.close()
             self.stream = None
 
+        # 先写完队列再补写WAV头
+        if self.writer:
+            self.writer.close()
+            writer_stats = self.writer.stats()
+            self.writer = None
+
+        if self.black_box:
+            self.black_box.close()
+            self.black_box = None
+
+        if self.segments:
+            self._segment_count = self.segments.segments
+            self.segments.close()
+            self.segments = None
+
         if self.wf:
             self.wf.close()
             self.wf = None
 
+        if self.file:
+            self.file.close()
+            self.file = None
+
+        return writer_stats
+
+    def metrics_snapshot(self):
+        """采集回调测量结果，见 CaptureMetrics.snapshot()"""
+        return self.metrics.snapshot()
+
     def close(self):
         """关闭录制器，释放资源"""
         self.stop_recording()
-        self.audio.terminate()
+        self.metrics.close()
 
 
 def main():
@@ -164,6 +352,31 @@ def main():
 
     recorder = StreamRecorder()
 
+    # 分段录制选项（其余为位置参数）
+    args = []
+    argv = iter(sys.argv[1:])
+    try:
+        for arg in argv:
+            if arg == '--segment':
+                recorder.segment_seconds = float(next(argv))
+            elif arg == '--segment-mb':
+                recorder.segment_mb = float(next(argv))
+            elif arg == '--serial':
+                recorder.serial_port = next(argv)
+            elif arg == '--black-box':
+                recorder.black_box_path = next(argv)
+            elif arg == '--minutes':
+                recorder.black_box_minutes = float(next(argv))
+            elif arg == '--channels':
+                recorder.channels = int(next(argv))
+            else:
+                args.append(arg)
+    except (StopIteration, ValueError):
+        print("错误: --segment / --segment-mb / --minutes / --channels 需要数字，--serial / --black-box 需要路径")
+        recorder.close()
+        return
+    sys.argv[1:] = args
+
     # 显示帮助信息
     if len(sys.argv) > 1 and sys.argv[1] in ['-h', '--help']:
         print("\n用法:")
@@ -173,6 +386,13 @@ def main():
         print(f"  {sys.argv[0]} 1                  # 使用设备1")
         print(f"  {sys.argv[0]} 1 my_audio.wav    # 使用设备1并指定文件名")
         print(f"  {sys.argv[0]} --list             # 列出所有设备")
+        print("\n分段录制（长时间运行）:")
+        print(f"  {sys.argv[0]} 1 --segment 600                  # 每10分钟一个分段，输出为目录")
+        print(f"  {sys.argv[0]} 1 --segment-mb 64 --serial /dev/ttyUSB0   # 按大小分段并记录唤醒标记")
+        print("\n多声道原始阵列数据（离线调参）:")
+        print(f"  {sys.argv[0]} 1 --channels 8 raw_array.wav")
+        print("\n黑匣子（只保留最近N分钟音频和串口事件，用 black_box.py 导出）:")
+        print(f"  {sys.argv[0]} 1 --black-box blackbox.bin --minutes 5 --serial /dev/ttyUSB0")
         print()
         recorder.close()
         return
@@ -200,11 +420,16 @@ def main():
     if len(sys.argv) > 2:
         output_file = sys.argv[2]
 
-    # 如果没有指定设备，列出可用设备供选择
+    # 如果没有指定设备，列出可用设备供选择（找到RK3328声卡时默认用它）
     if device_index is None:
         recorder.list_devices()
 
-        choice = input("请选择音频输入设备索引（留空使用默认设备）: ").strip()
+        # 名称匹配可能认错设备，提示中给出设备名由用户确认
+        registry = get_registry()
+        rk3328 = registry.find_rk3328()
+        default_text = (f"RK3328 [{rk3328}] {registry.get(rk3328)['name']}"
+                        if rk3328 is not None else "默认设备")
+        choice = input(f"请选择音频输入设备索引（留空使用{default_text}）: ").strip()
 
         if choice:
             try:
@@ -212,6 +437,8 @@ def main():
                 recorder.device_index = device_index
             except ValueError:
                 print("无效的设备索引，使用默认设备")
+        else:
+            recorder.device_index = rk3328
 
     try:
         # 开始录制
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+测试黑匣子环形区：多声道音频环绕后按时间顺序读出，声道不错位
+"""
+
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from black_box import BlackBoxRecorder, read_black_box
+
+
+def test_multichannel_wraparound():
+    """6声道写满环形区若干次后，读出的每个采样帧仍是 [0 1 2 3 4 5]"""
+    channels = 6
+    fd, path = tempfile.mkstemp(suffix='.bin')
+    os.close(fd)
+    try:
+        box = BlackBoxRecorder(path, minutes=0.1, channels=channels)
+        assert box.audio_capacity % box.block_align == 0
+
+        # 每个采样帧为 [0..5]，每块帧数不整除环形区大小
+        frame = np.arange(channels, dtype='<i2')
+        block = np.tile(frame, 1000).tobytes()
+        for _ in range(box.audio_capacity // len(block) * 3 + 7):
+            box.write(block)
+        box.close()
+
+        audio = np.frombuffer(read_black_box(path)['audio'], dtype='<i2').reshape(-1, channels)
+        assert len(audio) == box.audio_capacity // box.block_align
+        assert (audio == frame).all()
+    finally:
+        os.remove(path)
+
+
+def test_event_roundtrip():
+    """事件按顺序读回，放不下的事件只记录类型和原长度"""
+    fd, path = tempfile.mkstemp(suffix='.bin')
+    os.close(fd)
+    try:
+        box = BlackBoxRecorder(path, minutes=0.1)
+        box.event('wakeup', angle=90)
+        box.event('serial', raw='x' * 1000)
+        box.close()
+
+        events = read_black_box(path)['events']
+        assert [e['kind'] for e in events] == ['open', 'wakeup', 'serial', 'close']
+        assert events[1]['angle'] == 90
+        assert events[2]['truncated'] > 1000
+    finally:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith('test_') and callable(func):
+            func()
+            print(f"✓ {name}")
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+测试IAT增量拼接：wpgs动态修正（rpl）下稳定文本只增不减
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from iat_assembler import IATAssembler
+
+
+def iat_result(sn, text, pgs='apd', rg=None, ls=False):
+    """构造一个wpgs中间结果"""
+    result = {'sn': sn, 'pgs': pgs, 'ls': ls,
+              'ws': [{'cw': [{'w': ch}]} for ch in text]}
+    if rg:
+        result['rg'] = rg
+    return {'text': result}
+
+
+# 第3、5个结果替换之前的分段，最后一个结果为最终结果
+WPGS_SEQUENCE = [
+    iat_result(1, '今天'),
+    iat_result(2, '天起'),
+    iat_result(3, '今天天气怎么', 'rpl', [1, 2]),
+    iat_result(4, '羊'),
+    iat_result(5, '今天天气怎么样', 'rpl', [3, 4]),
+    iat_result(6, '？', ls=True),
+]
+
+
+def test_stable_never_shrinks():
+    """稳定文本在整个序列中只增不减，未稳定文本反映最新修正"""
+    assembler = IATAssembler()
+    updates = []
+    assembler.subscribe(lambda stable, unstable, final: updates.append((stable, unstable, final)))
+
+    previous = ''
+    for result in WPGS_SEQUENCE:
+        stable, unstable = assembler.feed(result)
+        assert stable.startswith(previous), f"稳定文本被回退: {previous!r} -> {stable!r}"
+        previous = stable
+
+    assert updates[2] == ('', '今天天气怎么', False)
+    assert updates[4] == ('', '今天天气怎么样', False)
+    assert updates[-1] == ('今天天气怎么样？', '', True)
+    assert assembler.text == '今天天气怎么样？'
+    assert assembler.is_final
+
+
+def test_replace_keeps_later_segments():
+    """替换结果放在被替换分段的位置，rg之后的分段保留"""
+    assembler = IATAssembler()
+    assembler.feed(iat_result(1, '打开'))
+    assembler.feed(iat_result(2, '灯'))
+    assembler.feed(iat_result(3, '关上', 'rpl', [1, 1]))
+    assert assembler.text == '关上灯'
+
+
+def test_replace_replacement():
+    """替换结果再次被替换时仍在原位置"""
+    assembler = IATAssembler()
+    assembler.feed(iat_result(1, '打开'))
+    assembler.feed(iat_result(2, '灯'))
+    assembler.feed(iat_result(3, '关上', 'rpl', [1, 1]))
+    assembler.feed(iat_result(4, '关掉', 'rpl', [3, 3]))
+    assert assembler.text == '关掉灯'
+    assembler.feed(iat_result(5, '吧'))
+    assembler.feed(iat_result(6, '台灯', 'rpl', [2, 2]))
+    assert assembler.text == '关掉台灯吧'
+
+
+def test_final_status():
+    """payload中iat的status为2时即使没有ls也视为最终结果"""
+    assembler = IATAssembler()
+    assembler.feed(iat_result(1, '你好'))
+    assert assembler.feed(iat_result(2, '呀'), final=True) == ('你好呀', '')
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith('test_') and callable(func):
+            func()
+            print(f"✓ {name}")
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+测试上行Opus编码的分包：超过60ms的帧拆成多个包，短帧补齐到合法帧长
+（用假的opuslib编码器检查帧长，不需要安装libopus）
+"""
+
+import os
+import struct
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import uplink_encoder
+from uplink_encoder import OpusWBEncoder
+
+
+class FakeOpusEncoder:
+    """记录每次编码的帧长，非法帧长时像libopus一样报错"""
+
+    def __init__(self, sample_rate, channels, application):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.frames = []
+
+    def encode(self, pcm, frame_size):
+        valid = [int(self.sample_rate * ms / 1000) for ms in OpusWBEncoder.FRAME_DURATIONS_MS]
+        if frame_size not in valid or len(pcm) != frame_size * 2 * self.channels:
+            raise ValueError(f"invalid frame size {frame_size}")
+        self.frames.append(frame_size)
+        return b'\x01' * (frame_size // 40)
+
+
+class FakeOpuslib:
+    APPLICATION_VOIP = 2048
+    Encoder = FakeOpusEncoder
+
+
+def make_encoder():
+    uplink_encoder.opuslib = FakeOpuslib
+    return OpusWBEncoder(16000, 1)
+
+
+def split_packets(data):
+    """按2字节长度前缀拆包"""
+    packets = []
+    offset = 0
+    while offset < len(data):
+        length, = struct.unpack_from('>H', data, offset)
+        packets.append(data[offset + 2:offset + 2 + length])
+        offset += 2 + length
+    assert offset == len(data)
+    return packets
+
+
+def test_80ms_frame():
+    """80ms帧（1280采样点）编码为两个40ms包"""
+    encoder = make_encoder()
+    data = encoder.encode(bytes(1280 * 2))
+    assert encoder._encoder.frames == [640, 640]
+    assert len(split_packets(data)) == 2
+
+
+def test_short_last_frame():
+    """不足40ms的尾帧补齐到合法帧长，空帧编码为空数据"""
+    encoder = make_encoder()
+    assert len(split_packets(encoder.encode(bytes(100 * 2)))) == 1
+    assert encoder._encoder.frames == [160]
+    assert encoder.encode(b'') == b''
+
+
+def test_uneven_frame():
+    """100ms帧拆成40ms + 40ms + 补齐的20ms"""
+    encoder = make_encoder()
+    encoder.encode(bytes(1600 * 2))
+    assert encoder._encoder.frames == [640, 640, 320]
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith('test_') and callable(func):
+            func()
+            print(f"✓ {name}")
@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+TTS合成结果本地缓存
+按（回复文本, 发音人, 音频格式）缓存合成好的PCM：
+内存LRU按字节数限额，磁盘保存原始PCM文件并维护索引；
+磁盘写入在后台线程中进行，不占用WebSocket接收线程
+"""
+
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTSCache:
+    """内存LRU + 磁盘的TTS缓存"""
+
+    INDEX_FILE = 'index.json'
+
+    def __init__(self, cache_dir, memory_budget=8 * 1024 * 1024, disk_budget=256 * 1024 * 1024):
+        """初始化缓存
+
+        Args:
+            cache_dir: 磁盘缓存目录
+            memory_budget: 内存LRU字节数上限
+            disk_budget: 磁盘缓存字节数上限，超出时按最久未使用淘汰
+        """
+        self.cache_dir = cache_dir
+        self.memory_budget = memory_budget
+        self.disk_budget = disk_budget
+
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+        # 磁盘写入队列和后台线程（首次写入时启动）
+        self._disk_queue = queue.Queue()
+        self._disk_thread = None
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self._index = self._load_index()
+
+    @staticmethod
+    def make_key(text, vcn, audio_format):
+        """生成缓存键
+
+        Args:
+            text: 回复文本
+            vcn: 发音人
+            audio_format: 音频格式，如 {"sample_rate": 16000, "channels": 1, "bit_depth": 16, "encoding": "raw"}
+
+        Returns:
+            str: 缓存键（sha1）
+        """
+        raw = json.dumps([text, vcn, audio_format], ensure_ascii=False, sort_keys=True)
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+    def get(self, text, vcn, audio_format):
+        """查询缓存（磁盘命中时读文件不持锁，不阻塞后台写入）
+
+        Returns:
+            bytes: 缓存的音频，未命中返回None
+        """
+        key = self.make_key(text, vcn, audio_format)
+
+        with self._lock:
+            audio = self._memory.get(key)
+            if audio is not None:
+                self._memory.move_to_end(key)
+                self._touch(key)
+                self.hits += 1
+                return audio
+
+            if key not in self._index:
+                self.misses += 1
+                return None
+
+        try:
+            with open(self._path(key), 'rb') as f:
+                audio = f.read()
+        except OSError:
+            # 文件丢失（或刚被淘汰），删除索引项
+            with self._lock:
+                self._index.pop(key, None)
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self._remember(key, audio)
+            self._touch(key)
+            self.hits += 1
+        return audio
+
+    def put(self, text, vcn, audio_format, audio):
+        """写入缓存（立即放入内存LRU，磁盘文件和索引由后台线程写入）
+
+        Args:
+            text: 回复文本
+            vcn: 发音人
+            audio_format: 音频格式
+            audio: 完整的PCM音频
+        """
+        if not text or not audio:
+            return
+
+        key = self.make_key(text, vcn, audio_format)
+
+        with self._lock:
+            self._remember(key, audio)
+
+        self._submit(self._store, key, {
+            'text': text,
+            'vcn': vcn,
+            'format': audio_format,
+            'size': len(audio),
+        }, audio)
+
+    def save(self):
+        """在后台保存索引（更新最近使用时间）"""
+        self._submit(self._save_index)
+
+    def flush(self):
+        """等待已提交的磁盘写入完成"""
+        if self._disk_thread is not None:
+            self._disk_queue.join()
+
+    def close(self):
+        """退出前调用，保证缓存文件和索引已写入"""
+        self.flush()
+
+    def _submit(self, func, *args):
+        with self._lock:
+            if self._disk_thread is None:
+                self._disk_thread = threading.Thread(target=self._disk_worker, daemon=True)
+                self._disk_thread.start()
+        self._disk_queue.put((func, args))
+
+    def _disk_worker(self):
+        """后台线程：依次执行磁盘写入"""
+        while True:
+            func, args = self._disk_queue.get()
+            try:
+                func(*args)
+            except OSError as e:
+                print(f"⚠ TTS缓存写入失败: {e}")
+            finally:
+                self._disk_queue.task_done()
+
+    def _store(self, key, entry, audio):
+        """写入音频文件并更新索引（后台线程）"""
+        with self._lock:
+            exists = key in self._index
+
+        if not exists:
+            tmp_path = self._path(key) + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(audio)
+            os.replace(tmp_path, self._path(key))
+
+        with self._lock:
+            self._index.setdefault(key, entry)
+            self._touch(key)
+            self._evict_disk()
+
+        self._save_index()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + '.pcm')
+
+    def _touch(self, key):
+        entry = self._index.get(key)
+        if entry is not None:
+            entry['last_used'] = time.time()
+
+    def _remember(self, key, audio):
+        """放入内存LRU，超出限额时淘汰最久未使用的项"""
+        if len(audio) > self.memory_budget:
+            return
+
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_bytes -= len(old)
+
+        self._memory[key] = audio
+        self._memory_bytes += len(audio)
+
+        while self._memory_bytes > self.memory_budget:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    def _evict_disk(self):
+        """磁盘超出限额时按最久未使用淘汰"""
+        total = sum(entry['size'] for entry in self._index.values())
+        if total <= self.disk_budget:
+            return
+
+        for key in sorted(self._index, key=lambda k: self._index[k].get('last_used', 0)):
+            if total <= self.disk_budget:
+                break
+            total -= self._index.pop(key)['size']
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def _load_index(self):
+        try:
+            with open(os.path.join(self.cache_dir, self.INDEX_FILE), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_index(self):
+        """写出索引（后台线程；只在持锁时序列化，文件写入不持锁）"""
+        with self._lock:
+            data = json.dumps(self._index, ensure_ascii=False)
+
+        path = os.path.join(self.cache_dir, self.INDEX_FILE)
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            f.write(data)
+        os.replace(path + '.tmp', path)
+
+
+class CachedTTSRouter:
+    """一轮交互中在本地缓存和云端TTS之间选择音频来源
+
+    缓存键是云端实际合成的文本（nlp最终结果），技能结果中的回复文本与合成音频不一定一致，不作为键。
+    合成文本确定时若云端音频还没开始，命中缓存即播放本地音频并丢弃云端音频；
+    否则播放云端音频，本轮结束后以合成文本为键写入缓存
+    """
+
+    def __init__(self, cache, player, vcn, audio_format):
+        """初始化
+
+        Args:
+            cache: TTSCache，None表示不缓存（只播放云端音频）
+            player: StreamingTTSPlayer
+            vcn: 发音人
+            audio_format: TTS音频格式
+        """
+        self.cache = cache
+        self.player = player
+        self.vcn = vcn
+        self.audio_format = audio_format
+
+        self.begin()
+
+    def begin(self):
+        """开始新一轮"""
+        self.answer_text = None
+        self.from_cache = False
+        self._remote_chunks = []
+
+    def on_answer_text(self, text):
+        """合成文本已确定（nlp最终结果）
+
+        Args:
+            text: 云端TTS合成所用的完整文本
+        """
+        if not text or self.from_cache:
+            return
+
+        self.answer_text = text
+
+        # 云端音频已经开始播放，不再切换，本轮结束后写入缓存
+        if self._remote_chunks or self.cache is None:
+            return
+
+        audio = self.cache.get(text, self.vcn, self.audio_format)
+        if audio is None:
+            return
+
+        print(f"  [TTS缓存] 命中，直接播放本地音频（{len(audio)} 字节）")
+        self.from_cache = True
+        self.player.feed(audio)
+        self.player.end()
+
+    def on_remote_audio(self, chunk):
+        """收到云端TTS分片"""
+        if self.from_cache:
+            return
+
+        self._remote_chunks.append(chunk)
+        self.player.feed(chunk)
+
+    def end(self):
+        """本轮结束：通知播放器，并把云端音频写入缓存"""
+        if self.from_cache:
+            self.cache.save()
+            return
+
+        self.player.end()
+
+        if self.cache is not None and self.answer_text and self._remote_chunks:
+            self.cache.put(self.answer_text, self.vcn, self.audio_format,
+                           b''.join(self._remote_chunks))
+        self._remote_chunks = []
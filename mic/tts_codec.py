@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+压缩TTS下行
+请求AIUI以压缩编码（lame即mp3）返回合成音频，收到的分片边收边交给外部解码进程
+（mpg123或ffmpeg），解码出的PCM按到达顺序送入播放器；
+本机没有可用解码器或解码失败时回退到raw PCM
+"""
+
+import os
+import shutil
+import subprocess
+import threading
+
+
+RAW = 'raw'
+
+# 编码 → 候选解码命令（按顺序取第一个可用的），{rate}/{channels}为输出PCM参数
+DECODER_COMMANDS = {
+    'lame': [
+        ['mpg123', '-q', '-s', '-r', '{rate}', '--mono', '-'],
+        ['ffmpeg', '-hide_banner', '-loglevel', 'error', '-fflags', 'nobuffer',
+         '-probesize', '32', '-analyzeduration', '0', '-f', 'mp3', '-i', 'pipe:0',
+         '-f', 's16le', '-ac', '{channels}', '-ar', '{rate}', 'pipe:1'],
+    ],
+}
+
+# 编码 → 候选编码命令（替身服务和基准测试生成压缩音频用）
+ENCODER_COMMANDS = {
+    'lame': [
+        ['lame', '--quiet', '-r', '-s', '{khz}', '--bitwidth', '16', '--signed',
+         '--little-endian', '-m', 'm', '-b', '32', '-', '-'],
+        ['ffmpeg', '-hide_banner', '-loglevel', 'error', '-f', 's16le', '-ac', '{channels}',
+         '-ar', '{rate}', '-i', 'pipe:0', '-f', 'mp3', '-b:a', '32k', 'pipe:1'],
+    ],
+}
+
+
+def _find_command(table, encoding, **params):
+    for argv in table.get(encoding, []):
+        if shutil.which(argv[0]):
+            return [arg.format(**params) for arg in argv]
+    return None
+
+
+def find_decoder(encoding, sample_rate=16000, channels=1):
+    """查找可用的解码命令
+
+    Returns:
+        list: 命令行参数，没有可用解码器时返回None
+    """
+    return _find_command(DECODER_COMMANDS, encoding, rate=sample_rate, channels=channels)
+
+
+def encode_pcm(pcm, encoding, sample_rate=16000, channels=1):
+    """把16bit PCM整段编码为压缩音频
+
+    Returns:
+        bytes: 压缩音频，没有可用编码器时返回None
+    """
+    argv = _find_command(ENCODER_COMMANDS, encoding, rate=sample_rate, channels=channels,
+                         khz=sample_rate / 1000)
+    if argv is None:
+        return None
+
+    return subprocess.run(argv, input=pcm, stdout=subprocess.PIPE,
+                          stderr=subprocess.DEVNULL, check=True).stdout
+
+
+def negotiate_tts_format(tts_format):
+    """根据本机解码能力确定实际请求的TTS格式
+
+    Args:
+        tts_format: 期望的TTS格式（含encoding）
+
+    Returns:
+        dict: 可以解码的TTS格式，不支持时encoding回退为raw
+    """
+    encoding = tts_format.get('encoding', RAW)
+    if encoding == RAW:
+        return tts_format
+
+    if find_decoder(encoding, tts_format.get('sample_rate', 16000), tts_format.get('channels', 1)):
+        return tts_format
+
+    print(f"⚠️  未找到 {encoding} 解码器（mpg123/ffmpeg），TTS回退为raw")
+    return dict(tts_format, encoding=RAW)
+
+
+class StreamingDecoder:
+    """外部解码进程：写入压缩数据，读取线程把解码出的PCM交给回调"""
+
+    def __init__(self, argv, on_pcm, read_size=1280):
+        """初始化
+
+        Args:
+            argv: 解码命令
+            on_pcm: PCM回调 on_pcm(bytes)，在读取线程中调用
+            read_size: 每次读取的最大字节数
+        """
+        self.on_pcm = on_pcm
+        self.read_size = read_size
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.failed = False
+
+        # close() 之后读取线程不再交付PCM（取消标志与交付在同一把锁下检查）
+        self.cancelled = False
+        self._deliver_lock = threading.Lock()
+
+        self._proc = subprocess.Popen(argv, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                      stderr=subprocess.DEVNULL, bufsize=0)
+        self._reader = threading.Thread(target=self._read_loop, daemon=True)
+        self._reader.start()
+
+    def feed(self, data):
+        """写入一段压缩数据（分片边界可以落在帧中间）"""
+        if self.failed:
+            return
+        try:
+            self._proc.stdin.write(data)
+            self.bytes_in += len(data)
+        except (BrokenPipeError, OSError) as e:
+            self.failed = True
+            print(f"✗ TTS解码进程异常: {e}")
+
+    def end(self, timeout=2.0):
+        """输入结束，等待剩余PCM全部交付"""
+        try:
+            self._proc.stdin.close()
+        except OSError:
+            pass
+
+        self._reader.join(timeout)
+        try:
+            self._proc.wait(timeout)
+        except subprocess.TimeoutExpired:
+            self.close()
+
+    def close(self):
+        """立即终止解码进程，丢弃未交付的数据（返回后不会再调用on_pcm）"""
+        with self._deliver_lock:
+            self.cancelled = True
+        if self._proc.poll() is None:
+            self._proc.kill()
+            self._proc.wait()
+
+    def _read_loop(self):
+        fd = self._proc.stdout.fileno()
+        try:
+            while True:
+                # os.read 有数据即返回，不等凑满read_size
+                data = os.read(fd, self.read_size)
+                if not data:
+                    break
+                with self._deliver_lock:
+                    if self.cancelled:
+                        break
+                    self.bytes_out += len(data)
+                    self.on_pcm(data)
+        except OSError:
+            pass
+        finally:
+            self._proc.stdout.close()
+
+
+class TTSDownlink:
+    """TTS下行：按协商的编码解码收到的音频分片，PCM交给sink"""
+
+    def __init__(self, tts_format, sink):
+        """初始化
+
+        Args:
+            tts_format: 期望的TTS格式，实际请求格式见 request_format
+            sink: PCM接收函数 sink(bytes)，如 CachedTTSRouter.on_remote_audio
+        """
+        self._format = negotiate_tts_format(tts_format)
+        self.sink = sink
+        self._decoder = None
+        # 已输入结束、正在后台等待解码完成的解码器
+        self._finishing = []
+        self._lock = threading.Lock()
+
+        # 本轮统计：下行压缩字节数（base64解码后）/ 解码出的PCM字节数 / 编码不符被丢弃的字节数
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.bytes_skipped = 0
+
+    @property
+    def encoding(self):
+        return self._format.get('encoding', RAW)
+
+    @property
+    def request_format(self):
+        """请求参数中使用的TTS格式"""
+        return self._format
+
+    def begin(self):
+        """开始新一轮，丢弃上一轮未解码完的数据"""
+        self.cancel()
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.bytes_skipped = 0
+
+    def cancel(self):
+        """丢弃本轮尚未解码完的数据（打断播放时调用），返回后不会再有PCM交给sink"""
+        with self._lock:
+            decoders = self._finishing + ([self._decoder] if self._decoder else [])
+            self._decoder = None
+            self._finishing = []
+        for decoder in decoders:
+            decoder.close()
+
+    def feed(self, audio, encoding=None):
+        """处理一个TTS分片
+
+        Args:
+            audio: 分片音频数据
+            encoding: 分片自带的编码字段，raw时直接透传
+        """
+        self.bytes_in += len(audio)
+        encoding = encoding or self.encoding
+        if encoding == RAW:
+            self.bytes_out += len(audio)
+            self.sink(audio)
+            return
+
+        # 与协商的编码不一致（如本地已回退raw，服务端仍返回压缩音频）：没有对应的解码进程，丢弃
+        if encoding != self.encoding:
+            if self.bytes_skipped == 0:
+                print(f"⚠️  TTS分片编码 {encoding} 与请求的 {self.encoding} 不一致，丢弃")
+            self.bytes_skipped += len(audio)
+            return
+
+        if self._decoder is None:
+            argv = find_decoder(self.encoding, self._format.get('sample_rate', 16000),
+                                self._format.get('channels', 1))
+            self._decoder = StreamingDecoder(argv, self._on_pcm)
+
+        self._decoder.feed(audio)
+        if self._decoder.failed:
+            # 解码失败后后续轮次改为请求raw
+            self._format = dict(self._format, encoding=RAW)
+
+    def end(self, on_done=None):
+        """本轮最后一个分片已到达
+
+        解码进程的剩余输出在后台线程中等待，不阻塞WebSocket接收线程
+
+        Args:
+            on_done: 本轮PCM全部交给sink后调用（没有解码进程时立即在当前线程调用）；
+                本轮在此之前被 cancel / begin 丢弃时不调用
+        """
+        with self._lock:
+            decoder, self._decoder = self._decoder, None
+            if decoder:
+                self._finishing.append(decoder)
+
+        if decoder is None:
+            if on_done:
+                on_done()
+            return
+
+        threading.Thread(target=self._finish, args=(decoder, on_done), daemon=True).start()
+
+    def _finish(self, decoder, on_done):
+        decoder.end()
+        with self._lock:
+            if decoder not in self._finishing:
+                return
+            self._finishing.remove(decoder)
+            # 持锁调用，保证不会与下一轮的 begin 交错
+            if on_done:
+                on_done()
+
+    def _on_pcm(self, pcm):
+        self.bytes_out += len(pcm)
+        self.sink(pcm)
@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+流式TTS播放器
+收到第一个TTS分片即开始播放，后续分片边收边播，
+通过抖动缓冲吸收网络抖动，并统计首音延迟和欠载次数
+
+输出流由常驻播放线程持有，接收线程只通过命令队列投递数据和控制命令，
+不会被stream.write阻塞
+"""
+
+import queue
+import threading
+import time
+
+
+# 播放线程命令
+CMD_BEGIN = 'begin'
+CMD_ENQUEUE = 'enqueue'
+CMD_END = 'end'
+CMD_FLUSH = 'flush'
+CMD_PAUSE = 'pause'
+CMD_RESUME = 'resume'
+CMD_STOP = 'stop'
+
+
+class NullAudioOutput:
+    """无声卡时代替PyAudio的输出设备：按实时速度消耗音频但不发声（基准测试/CI用）"""
+
+    def get_format_from_width(self, width):
+        return width
+
+    def open(self, format=2, channels=1, rate=16000, **kwargs):
+        return _NullOutputStream(rate * channels * format)
+
+    def terminate(self):
+        pass
+
+
+class _NullOutputStream:
+
+    def __init__(self, bytes_per_second):
+        self.bytes_per_second = bytes_per_second
+
+    def write(self, data):
+        time.sleep(len(data) / self.bytes_per_second)
+
+    def stop_stream(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class StreamingTTSPlayer:
+    """流式TTS播放器（常驻播放线程 + 命令队列）"""
+
+    def __init__(self, audio, rate=16000, channels=1, sample_width=2,
+                 prebuffer_ms=120, period_ms=40, output_device_index=None, on_finish=None):
+        """初始化播放器
+
+        Args:
+            audio: PyAudio实例（或NullAudioOutput）
+            rate: 采样率，默认16000 Hz
+            channels: 声道数，默认1
+            sample_width: 采样字节数，默认2（16bit）
+            prebuffer_ms: 开始播放/欠载恢复前需要缓冲的时长（毫秒）
+            period_ms: 每次写入输出流的时长（毫秒），也是flush/stop的最长响应时间
+            output_device_index: 音频输出设备索引，None表示默认设备
+            on_finish: 每轮播放结束（含被flush打断）时的回调 on_finish(player, context)，
+                在播放线程中调用，context为begin()传入的对象
+        """
+        self.audio = audio
+        self.rate = rate
+        self.channels = channels
+        self.sample_width = sample_width
+        self.output_device_index = output_device_index
+        self.on_finish = on_finish
+
+        bytes_per_ms = rate * channels * sample_width // 1000
+        self.period_bytes = bytes_per_ms * period_ms
+        self.prebuffer_bytes = bytes_per_ms * prebuffer_ms
+
+        self._commands = queue.Queue()
+        self._thread = None
+        self._idle = threading.Event()
+        self._idle.set()
+
+        # 播放线程异常退出（如输出设备打开失败）时的错误，之后begin/feed不再生效
+        self.error = None
+
+        # 以下状态只在播放线程中读写
+        self._buffer = bytearray()
+        self._ended = False
+        self._paused = False
+        self._rebuffering = False
+        self._active = False
+        self._context = None
+
+        # 接收侧统计（调用线程更新）
+        self.first_chunk_time = None
+        self.bytes_received = 0
+
+        self._reset_stats(time.monotonic())
+
+    def _reset_stats(self, begin_time):
+        """重置播放侧统计（播放线程更新）"""
+        self.begin_time = begin_time
+        self.first_audio_time = None
+        self.end_time = None
+        self.underruns = 0
+        self.bytes_played = 0
+
+    @property
+    def time_to_first_audio(self):
+        """从begin()到第一次写入输出流的时间（秒），未开始播放返回None"""
+        if self.first_audio_time is None:
+            return None
+        return self.first_audio_time - self.begin_time
+
+    @property
+    def is_playing(self):
+        """是否有已收到的音频正在播放或等待播放"""
+        return not self._idle.is_set()
+
+    def start(self):
+        """启动常驻播放线程，输出流在该线程内打开并一直保持"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+
+        self.error = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def begin(self, context=None):
+        """开始新一轮播放（清空缓冲并重置统计）
+
+        Args:
+            context: 本轮的上下文对象，播放结束时原样传给on_finish
+        """
+        self.first_chunk_time = None
+        self.bytes_received = 0
+        if self.error is not None:
+            return
+        self._commands.put((CMD_BEGIN, (time.monotonic(), context)))
+
+    def feed(self, chunk):
+        """投递一个TTS音频分片，立即返回
+
+        Args:
+            chunk: PCM音频数据
+        """
+        # 播放线程已退出：丢弃音频，is_playing保持False，wait()不会阻塞
+        if self.error is not None:
+            return
+
+        if self.first_chunk_time is None:
+            self.first_chunk_time = time.monotonic()
+        self.bytes_received += len(chunk)
+        self._idle.clear()
+        self._commands.put((CMD_ENQUEUE, chunk))
+
+        # 播放线程在上面的检查之后才退出时，撤销刚才的clear
+        if self.error is not None:
+            self._idle.set()
+
+    def end(self):
+        """标记本轮最后一个分片已到达"""
+        self._commands.put((CMD_END, None))
+
+    def flush(self):
+        """丢弃尚未播放的音频并结束本轮播放"""
+        self._commands.put((CMD_FLUSH, None))
+
+    def pause(self):
+        """暂停播放（缓冲保留）"""
+        self._commands.put((CMD_PAUSE, None))
+
+    def resume(self):
+        """恢复播放"""
+        self._commands.put((CMD_RESUME, None))
+
+    def stop(self):
+        """停止播放线程并关闭输出流"""
+        if self._thread is None:
+            return
+
+        self._commands.put((CMD_STOP, None))
+        self._thread.join()
+        self._thread = None
+
+    def wait(self, timeout=None):
+        """等待本轮播放结束
+
+        Returns:
+            bool: 播放已结束返回True
+        """
+        return self._idle.wait(timeout)
+
+    def _handle_command(self, cmd, arg):
+        """处理一条命令
+
+        Returns:
+            bool: 返回False表示退出播放线程
+        """
+        if cmd == CMD_ENQUEUE:
+            self._buffer.extend(arg)
+            self._active = True
+            self._idle.clear()
+        elif cmd == CMD_BEGIN:
+            # 上一轮尚未播完时先结束上一轮
+            if self._active:
+                self._finish()
+            self._buffer.clear()
+            self._ended = False
+            self._rebuffering = False
+            self._reset_stats(arg[0])
+            self._context = arg[1]
+        elif cmd == CMD_END:
+            self._ended = True
+        elif cmd == CMD_FLUSH:
+            self._buffer.clear()
+            self._ended = True
+        elif cmd == CMD_PAUSE:
+            self._paused = True
+        elif cmd == CMD_RESUME:
+            self._paused = False
+        elif cmd == CMD_STOP:
+            return False
+
+        if self._ended and not self._buffer and self._active:
+            self._finish()
+
+        return True
+
+    def _drain_commands(self):
+        """处理已到达的全部命令，不阻塞
+
+        Returns:
+            bool: 返回False表示退出播放线程
+        """
+        while True:
+            try:
+                cmd, arg = self._commands.get_nowait()
+            except queue.Empty:
+                return True
+            if not self._handle_command(cmd, arg):
+                return False
+
+    def _ready(self):
+        """缓冲是否足够写出一个周期"""
+        if self._paused or not self._buffer:
+            return False
+
+        if self._ended:
+            return True
+
+        if self.first_audio_time is None or self._rebuffering:
+            return len(self._buffer) >= self.prebuffer_bytes
+
+        return len(self._buffer) >= self.period_bytes
+
+    def _finish(self):
+        """本轮播放结束"""
+        if self.bytes_played:
+            self.end_time = time.monotonic()
+            print(f"✓ 播放完成（{self.bytes_played} 字节，欠载 {self.underruns} 次）")
+
+        self._ended = False
+        self._active = False
+
+        if self.on_finish:
+            try:
+                self.on_finish(self, self._context)
+            except Exception as e:
+                print(f"✗ 播放结束回调失败: {e}")
+
+        self._idle.set()
+
+    def _run(self):
+        """播放线程：处理命令，从抖动缓冲读取数据写入输出流"""
+        stream = None
+        try:
+            stream = self.audio.open(
+                format=self.audio.get_format_from_width(self.sample_width),
+                channels=self.channels,
+                rate=self.rate,
+                output=True,
+                output_device_index=self.output_device_index,
+                frames_per_buffer=self.period_bytes // (self.channels * self.sample_width)
+            )
+
+            while True:
+                # 缓冲不够时阻塞等待命令；够写时只处理已到达的命令
+                try:
+                    cmd, arg = self._commands.get(block=not self._ready())
+                    if not self._handle_command(cmd, arg):
+                        break
+                    continue
+                except queue.Empty:
+                    pass
+
+                data = bytes(self._buffer[:self.period_bytes])
+                del self._buffer[:self.period_bytes]
+
+                if self.first_audio_time is None:
+                    self.first_audio_time = time.monotonic()
+                    print(f"\n▶ 开始播放TTS（首音延迟 {self.time_to_first_audio * 1000:.0f} ms）")
+                self._rebuffering = False
+
+                stream.write(data)
+                self.bytes_played += len(data)
+
+                # 先处理写入期间到达的命令（新分片、结束等），再判断是否欠载
+                if not self._drain_commands():
+                    break
+
+                if not self._active or self.first_audio_time is None:
+                    # 本轮已在命令中结束，或新一轮尚未开始播放
+                    continue
+                if self._ended:
+                    if not self._buffer:
+                        self._finish()
+                elif len(self._buffer) < self.period_bytes and not self._paused:
+                    # 播放中缓冲耗尽记为欠载，重新预缓冲
+                    self.underruns += 1
+                    self._rebuffering = True
+
+        except Exception as e:
+            print(f"✗ 播放失败: {e}")
+            self.error = e
+
+        finally:
+            self._idle.set()
+            if stream:
+                stream.stop_stream()
+                stream.close()
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+端到端单轮交互延迟基准测试
+模拟一次唤醒，驱动 voice_interaction 客户端走完整的交互流程（录音、上行、解码、TTS下行、播放），
+用采集源（默认为录制好的PCM文件）代替麦克风、NullAudioOutput代替声卡输出，
+从每轮的追踪记录中取出各阶段的单调时钟时间戳：
+    唤醒 → 首帧上行 → 首个iat中间结果 → iat最终结果 → 首个nlp → 首个tts字节 → 开始播放 → 播放结束
+重复N轮后输出各阶段的p50/p90/p99（JSON），便于在CI中发现延迟回退
+
+默认在进程内启动本地AIUI替身服务，无需声卡、串口和真实凭据（需要安装客户端依赖PyAudio、pyserial）：
+    python3 turn_benchmark.py --runs 20 --speed 4 -o bench.json
+
+对比raw与压缩TTS下行的带宽和延迟（每种编码各跑N轮）：
+    python3 turn_benchmark.py --runs 20 --speed 4 --tts-encoding raw lame
+
+上行也可以换成生成的音频或管道：--source tone:440:3 / --source noise:300:3 / --source pipe:-
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import queue
+import sys
+import tempfile
+import time
+
+import voice_interaction
+from voice_interaction import VoiceInteractionSystem
+from aiui_protocol import DEFAULT_TTS_FORMAT
+from aiui_standin_server import AIUIStandInServer, FAKE_APPID, FAKE_API_KEY, FAKE_API_SECRET
+from tts_player import NullAudioOutput
+from turn_trace import TurnTracer
+
+
+DEFAULT_PCM = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           'aiuiv3-demo-master', 'resource', 'weather.pcm')
+
+# 时间点（按一轮交互中出现的顺序）
+MARKS = [
+    'wakeup',
+    'first_uplink_frame',
+    'first_iat_partial',
+    'iat_final',
+    'first_nlp',
+    'first_tts_byte',
+    'playback_start',
+    'playback_end',
+]
+
+
+def percentile(values, p):
+    """线性插值百分位数"""
+    values = sorted(values)
+    if not values:
+        return None
+    k = (len(values) - 1) * p / 100
+    lo = int(k)
+    hi = min(lo + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+
+def summarize(samples):
+    """统计一组毫秒值"""
+    if not samples:
+        return None
+    return {
+        'p50': round(percentile(samples, 50), 1),
+        'p90': round(percentile(samples, 90), 1),
+        'p99': round(percentile(samples, 99), 1),
+        'max': round(max(samples), 1),
+        'count': len(samples),
+    }
+
+
+class BenchmarkTracer(TurnTracer):
+    """照常写出追踪文件，同时把结束的一轮交给基准测试"""
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.finished = queue.SimpleQueue()
+
+    def finish(self, trace, **attrs):
+        if trace is None or trace.finished:
+            return
+        super().finish(trace, **attrs)
+        self.finished.put(trace)
+
+
+def trace_marks(trace):
+    """从一轮追踪中取出各时间点
+
+    Returns:
+        dict: 各时间点相对唤醒（本轮开始）的毫秒数
+    """
+    uplink = trace.spans.get('uplink', [None, None])
+    recognition = trace.spans.get('recognition', [None, None])
+    playback = trace.spans.get('playback', [None, None])
+    points = {
+        'wakeup': trace.t0,
+        'first_uplink_frame': uplink[0],
+        'first_iat_partial': trace.marks.get('first_iat'),
+        'iat_final': recognition[1],
+        'first_nlp': trace.marks.get('first_nlp'),
+        'first_tts_byte': trace.marks.get('first_tts'),
+        'playback_start': playback[0],
+        'playback_end': playback[1],
+    }
+    return {name: (t - trace.t0) * 1000 for name, t in points.items() if t is not None}
+
+
+class TurnBenchmark:
+    """用voice_interaction的客户端在一条常驻连接上反复执行单轮交互"""
+
+    def __init__(self, url, appid, api_key, api_secret, source, speed=1.0,
+                 timeout=30, tts_format=None, trace_file=None):
+        """初始化
+
+        Args:
+            url: AIUI接口地址
+            appid / api_key / api_secret: 应用配置
+            source: 上行采集源描述（见 create_capture_source，16k 16bit单声道）
+            speed: 采集和上行速度倍数，1.0为实时，0为不限速
+            timeout: 单轮超时（秒）
+            tts_format: TTS格式，None使用DEFAULT_TTS_FORMAT
+            trace_file: 追踪文件路径
+        """
+        # 客户端配置是模块常量，按替身服务的说明改写后再创建客户端；
+        # 关闭TTS缓存，每轮都走云端下行
+        voice_interaction.AIUI_URL = url
+        voice_interaction.AIUI_APPID = appid
+        voice_interaction.AIUI_API_KEY = api_key
+        voice_interaction.AIUI_API_SECRET = api_secret
+        voice_interaction.TTS_AUDIO_FORMAT = tts_format or DEFAULT_TTS_FORMAT
+        voice_interaction.TTS_CACHE_DIR = None
+
+        self.timeout = timeout
+        self.tracer = BenchmarkTracer(trace_file)
+        self.system = VoiceInteractionSystem(None, audio=NullAudioOutput(), capture_source=source,
+                                             tracer=self.tracer, speed=speed)
+
+    def connect(self):
+        if not self.system.init_aiui_websocket():
+            raise ConnectionError("AIUI连接失败")
+
+    def close(self):
+        self.system.cleanup()
+
+    def run_turn(self, index):
+        """执行一轮交互（模拟一次唤醒）
+
+        Returns:
+            dict: 各时间点相对唤醒的毫秒数，以及本轮的下行字节数和欠载次数
+        """
+        self.system.process_voice_interaction()
+        trace = self.system.trace
+
+        # 本轮在播放结束（或没有TTS时在交互完成）时结束
+        deadline = time.monotonic() + self.timeout
+        finished = None
+        while finished is not trace:
+            try:
+                finished = self.tracer.finished.get(timeout=max(0, deadline - time.monotonic()))
+            except queue.Empty:
+                raise TimeoutError(f"第 {index} 轮超时") from None
+
+        for reason in ('error', 'no_speech', 'local_command'):
+            if trace.attrs.get(reason):
+                raise RuntimeError(f"第 {index} 轮未完成: {reason}={trace.attrs[reason]}")
+
+        result = trace_marks(trace)
+        result['_underruns'] = trace.attrs.get('underruns', 0)
+        result['_downlink_bytes'] = trace.attrs.get('downlink_bytes', 0)
+        result['_tts_bytes'] = self.system.tts_downlink.bytes_in
+        return result
+
+
+def build_report(results, args, tts_encoding):
+    """汇总各轮结果"""
+    report = {
+        'runs': len(results),
+        'source': args.source,
+        'speed': args.speed,
+        'target': args.url or 'standin',
+        'tts_encoding': tts_encoding,
+        'marks_ms': {},
+        'stages_ms': {},
+        'underruns': sum(r.pop('_underruns', 0) for r in results),
+        # 每轮下行字节数：WebSocket消息 / TTS音频（base64解码后）
+        'downlink_bytes': summarize([r.pop('_downlink_bytes') for r in results]),
+        'tts_bytes': summarize([r.pop('_tts_bytes') for r in results]),
+    }
+
+    for name in MARKS[1:]:
+        report['marks_ms'][name] = summarize([r[name] for r in results if name in r])
+
+    # 相邻时间点之间的阶段耗时
+    for prev, name in zip(MARKS, MARKS[1:]):
+        samples = [r[name] - r[prev] for r in results if name in r and prev in r]
+        report['stages_ms'][f"{prev}->{name}"] = summarize(samples)
+
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="端到端单轮交互延迟基准测试")
+    parser.add_argument('--runs', type=int, default=10, help="测试轮数")
+    parser.add_argument('--audio', default=DEFAULT_PCM, help="上行PCM/WAV文件（16k 16bit单声道）")
+    parser.add_argument('--speed', type=float, default=1.0, help="上行速度倍数，1.0为实时，0为不限速")
+    parser.add_argument('--source', help="上行采集源（file:路径 / tone:频率:秒 / noise:幅度:秒 / pipe:路径），"
+                                         "默认为 file:<--audio>")
+    parser.add_argument('--url', help="AIUI接口地址，默认在进程内启动本地替身服务")
+    parser.add_argument('--appid', default=FAKE_APPID)
+    parser.add_argument('--api-key', default=FAKE_API_KEY)
+    parser.add_argument('--api-secret', default=FAKE_API_SECRET)
+    parser.add_argument('--tts-encoding', nargs='+', default=['raw'],
+                        help="TTS下行编码（raw / lame），给出多个时依次测试并对比")
+    parser.add_argument('--trace', help="每轮的追踪记录（JSON Lines），默认写到临时目录")
+    parser.add_argument('-o', '--output', help="JSON结果输出文件，默认打印到标准输出")
+    args = parser.parse_args()
+
+    if args.source is None:
+        args.source = f"file:{args.audio}"
+
+    server = None
+    url = args.url
+    if url is None:
+        server = AIUIStandInServer(port=0).start()
+        url = server.url
+
+    reports = {}
+    # 客户端的运行日志输出到标准错误，标准输出只留给结果
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(sys.stderr):
+        trace_file = args.trace or os.path.join(tmp, 'turn_trace.jsonl')
+        try:
+            for encoding in args.tts_encoding:
+                tts_format = dict(DEFAULT_TTS_FORMAT, encoding=encoding)
+                bench = TurnBenchmark(url, args.appid, args.api_key, args.api_secret, args.source,
+                                      speed=args.speed, tts_format=tts_format, trace_file=trace_file)
+                downlink = bench.system.tts_downlink
+                results = []
+                try:
+                    bench.connect()
+                    for i in range(args.runs):
+                        result = bench.run_turn(i)
+                        results.append(result)
+                        print(f"[{downlink.encoding} {i + 1}/{args.runs}] 播放开始 "
+                              f"{result.get('playback_start', float('nan')):.0f} ms，"
+                              f"下行 {result['_downlink_bytes']} 字节")
+                finally:
+                    bench.close()
+                reports[encoding] = build_report(results, args, downlink.encoding)
+        finally:
+            if server:
+                server.stop()
+
+    if len(reports) == 1:
+        report = next(iter(reports.values()))
+    else:
+        report = {'encodings': reports}
+    report = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(report)
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+单轮交互追踪
+为每轮交互生成唯一的流ID（stmid），关联服务端返回的sid，
+记录串口、录音、上行、识别、语义、播放各阶段的耗时，
+以JSON Lines格式写入按大小轮转的追踪文件，便于在现场日志中查找慢会话
+
+写文件在后台线程完成，调用方只做一次入队
+"""
+
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import time
+import uuid
+from datetime import datetime
+
+
+def new_stream_id(prefix):
+    """生成唯一的流ID
+
+    Args:
+        prefix: 前缀，如设备序列号
+
+    Returns:
+        str: 形如 rk3328-18f3a2b4c5d-1a2b3c4d 的ID（毫秒时间戳 + 随机后缀）
+    """
+    return f"{prefix}-{int(time.time() * 1000):x}-{uuid.uuid4().hex[:8]}"
+
+
+class TurnTrace:
+    """一轮交互的追踪记录"""
+
+    def __init__(self, turn_id):
+        """初始化
+
+        Args:
+            turn_id: 本轮唯一ID（同时作为请求的stmid）
+        """
+        self.turn_id = turn_id
+        self.sids = []
+        self.wall_start = time.time()
+        self.t0 = time.monotonic()
+        self.spans = {}
+        self.marks = {}
+        self.attrs = {}
+        self.finished = False
+
+    @property
+    def sid(self):
+        return self.sids[-1] if self.sids else None
+
+    def set_sid(self, sid):
+        """关联服务端会话ID"""
+        if sid and sid not in self.sids:
+            self.sids.append(sid)
+
+    def start(self, name, t=None):
+        """开始一个阶段（同名阶段只记录第一次开始）"""
+        span = self.spans.setdefault(name, [None, None])
+        if span[0] is None:
+            span[0] = t if t is not None else time.monotonic()
+
+    def end(self, name, t=None):
+        """结束一个阶段"""
+        span = self.spans.setdefault(name, [None, None])
+        span[1] = t if t is not None else time.monotonic()
+
+    def add_span(self, name, start, end):
+        """直接记录一个阶段（单调时钟时间）"""
+        if start is not None:
+            self.spans[name] = [start, end]
+
+    def mark(self, name, t=None):
+        """记录一个时间点（同名只记录第一次）"""
+        if name not in self.marks:
+            self.marks[name] = t if t is not None else time.monotonic()
+
+    def to_dict(self):
+        def rel(t):
+            return None if t is None else round((t - self.t0) * 1000, 1)
+
+        spans = {}
+        for name, (start, end) in self.spans.items():
+            spans[name] = {
+                'start_ms': rel(start),
+                'dur_ms': None if start is None or end is None else round((end - start) * 1000, 1),
+            }
+
+        record = {
+            'turn_id': self.turn_id,
+            'sid': self.sid,
+            'start': datetime.fromtimestamp(self.wall_start).isoformat(timespec='milliseconds'),
+            'spans': spans,
+            'marks': {name: rel(t) for name, t in self.marks.items()},
+        }
+        if len(self.sids) > 1:
+            record['sids'] = self.sids
+        record.update(self.attrs)
+        return record
+
+
+class TurnTracer:
+    """把完成的TurnTrace写入轮转的JSONL文件"""
+
+    def __init__(self, path, max_bytes=10 * 1024 * 1024, backup_count=5):
+        """初始化
+
+        Args:
+            path: 追踪文件路径
+            max_bytes: 单个文件大小上限，超过后轮转
+            backup_count: 保留的历史文件个数
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        handler = logging.handlers.RotatingFileHandler(
+            path, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8')
+        handler.setFormatter(logging.Formatter('%(message)s'))
+
+        # 调用线程只入队，写文件由监听线程完成
+        self._queue = queue.SimpleQueue()
+        self._listener = logging.handlers.QueueListener(self._queue, handler)
+        self._listener.start()
+
+        self._logger = logging.getLogger(f"turn_trace.{id(self)}")
+        self._logger.propagate = False
+        self._logger.setLevel(logging.INFO)
+        self._logger.addHandler(logging.handlers.QueueHandler(self._queue))
+
+    def new_turn(self, prefix):
+        """开始新一轮追踪
+
+        Args:
+            prefix: 流ID前缀
+        """
+        return TurnTrace(new_stream_id(prefix))
+
+    def finish(self, trace, **attrs):
+        """结束一轮追踪并写出（重复调用只写一次）
+
+        Args:
+            trace: TurnTrace
+            **attrs: 附加字段，如 cancelled=True
+        """
+        if trace is None or trace.finished:
+            return
+
+        trace.finished = True
+        trace.attrs.update(attrs)
+        self._logger.info(json.dumps(trace.to_dict(), ensure_ascii=False))
+
+    def close(self):
+        """写完队列中的记录并关闭文件"""
+        self._listener.stop()
+        for handler in self._listener.handlers:
+            handler.close()
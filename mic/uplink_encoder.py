@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+上行音频编码
+可插拔的逐帧编码器（raw / opus-wb），在独立线程中编码并发送，
+采集线程只投递PCM帧，不会被编码阻塞；请求中的 payload.audio.encoding 由编码器决定
+
+测量本机每帧编码CPU耗时和码率：
+    python3 uplink_encoder.py --encoding opus-wb --audio aiuiv3-demo-master/resource/weather.pcm
+"""
+
+import argparse
+import os
+import queue
+import struct
+import threading
+import time
+
+try:
+    import opuslib
+except ImportError:
+    opuslib = None
+
+
+RAW = 'raw'
+
+
+class RawEncoder:
+    """不编码，直接上传16bit PCM"""
+
+    encoding = RAW
+
+    def __init__(self, sample_rate=16000, channels=1):
+        self.sample_rate = sample_rate
+        self.channels = channels
+
+    def encode(self, pcm):
+        return pcm
+
+
+class OpusWBEncoder:
+    """16k宽带Opus编码（需要 pip3 install opuslib 和系统libopus）
+
+    PCM帧按40ms切成Opus包（超过一包的帧编码为多个包），每个包前加2字节大端长度，
+    便于服务端按包切分；不足一包的剩余部分（如尾帧）用静音补齐到Opus合法帧长，
+    空帧编码为空数据
+    """
+
+    encoding = 'opus-wb'
+
+    # Opus合法帧长（毫秒）
+    FRAME_DURATIONS_MS = (2.5, 5, 10, 20, 40, 60)
+    # 每个包的最大时长（毫秒）
+    PACKET_MS = 40
+
+    def __init__(self, sample_rate=16000, channels=1, bitrate=24000, complexity=5):
+        """初始化
+
+        Args:
+            sample_rate: 采样率
+            channels: 声道数
+            bitrate: 目标码率（bit/s）
+            complexity: 编码复杂度0-10，越低越省CPU
+        """
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self._encoder = opuslib.Encoder(sample_rate, channels, opuslib.APPLICATION_VOIP)
+        self._encoder.bitrate = bitrate
+        self._encoder.complexity = complexity
+
+    def encode(self, pcm):
+        pcm = memoryview(pcm).cast('B')
+        block_align = 2 * self.channels
+        packet_bytes = self.sample_rate * self.PACKET_MS // 1000 * block_align
+        usable = len(pcm) - len(pcm) % block_align
+
+        out = []
+        for offset in range(0, usable, packet_bytes):
+            out.append(self._encode_packet(pcm[offset:min(offset + packet_bytes, usable)]))
+        return b''.join(out)
+
+    def _encode_packet(self, pcm):
+        """编码不超过一包的PCM，不是合法帧长时用静音补齐"""
+        samples = len(pcm) // (2 * self.channels)
+        frame_samples = self._frame_samples(samples)
+        data = bytes(pcm)
+        if frame_samples != samples:
+            data += bytes((frame_samples - samples) * 2 * self.channels)
+
+        packet = self._encoder.encode(data, frame_samples)
+        return struct.pack('>H', len(packet)) + packet
+
+    def _frame_samples(self, samples):
+        """不小于samples的最短Opus合法帧长（采样点数）"""
+        for ms in self.FRAME_DURATIONS_MS:
+            frame_samples = int(self.sample_rate * ms / 1000)
+            if frame_samples >= samples:
+                return frame_samples
+        raise ValueError(f"帧长 {samples} 采样点超过Opus最大帧长60ms")
+
+
+# AIUI编码名 → (编码器类, 是否可用)
+ENCODERS = {
+    RAW: (RawEncoder, True),
+    'opus-wb': (OpusWBEncoder, opuslib is not None),
+}
+
+
+def create_encoder(encoding, sample_rate=16000, channels=1, **kwargs):
+    """按名称创建编码器，不可用时回退到raw
+
+    Args:
+        encoding: AIUI音频编码名，如 raw、opus-wb
+        **kwargs: 传给编码器的参数（如bitrate）
+
+    Returns:
+        编码器实例
+    """
+    cls, available = ENCODERS.get(encoding, (None, False))
+    if cls is None or not available:
+        print(f"⚠️  上行编码 {encoding} 不可用，回退为raw")
+        return RawEncoder(sample_rate, channels)
+
+    if cls is RawEncoder:
+        return cls(sample_rate, channels)
+    return cls(sample_rate, channels, **kwargs)
+
+
+class UplinkEncoderWorker:
+    """上行编码线程：采集线程投递PCM帧，在本线程中编码并发送"""
+
+    def __init__(self, encoder, send):
+        """初始化
+
+        Args:
+            encoder: 编码器（RawEncoder / OpusWBEncoder）
+            send: 发送函数 send(data, status, encoding)，在编码线程中按帧顺序调用
+        """
+        self.encoder = encoder
+        self.send = send
+
+        # 统计
+        self.frames = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.cpu_time = 0.0
+        self.max_cpu_time = 0.0
+        self.error = None
+
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    @property
+    def encoding(self):
+        return self.encoder.encoding
+
+    @property
+    def queue_depth(self):
+        """尚未编码的帧数"""
+        return self._queue.qsize()
+
+    def submit(self, pcm, status):
+        """投递一帧PCM，立即返回
+
+        Args:
+            pcm: 16bit PCM帧
+            status: 帧状态 (0=首帧, 1=中间帧, 2=尾帧)
+        """
+        self._queue.put((pcm, status))
+
+    def close(self, timeout=None):
+        """等待已投递的帧全部发送完并结束线程"""
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def stats(self):
+        """编码统计"""
+        frames = self.frames or 1
+        return {
+            'encoding': self.encoding,
+            'frames': self.frames,
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out,
+            'ratio': round(self.bytes_out / self.bytes_in, 3) if self.bytes_in else None,
+            'cpu_us_per_frame': round(self.cpu_time / frames * 1e6, 1),
+            'max_cpu_us': round(self.max_cpu_time * 1e6, 1),
+            'error': repr(self.error) if self.error else None,
+        }
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+
+            pcm, status = item
+            try:
+                # 只统计本线程的CPU时间，不受采集线程和网络等待影响
+                t0 = time.thread_time()
+                data = self.encoder.encode(pcm)
+                cpu = time.thread_time() - t0
+
+                self.frames += 1
+                self.bytes_in += len(pcm)
+                self.bytes_out += len(data)
+                self.cpu_time += cpu
+                self.max_cpu_time = max(self.max_cpu_time, cpu)
+            except Exception as e:
+                self.error = e
+                print(f"✗ 上行编码失败（status={status}）: {e}")
+                # 尾帧编码失败也要发送（空数据），否则服务端一直等待本轮音频结束
+                if status != 2:
+                    continue
+                data = b''
+
+            try:
+                self.send(data, status, self.encoder.encoding)
+            except Exception as e:
+                self.error = e
+                print(f"✗ 上行发送失败: {e}")
+
+
+def main():
+    """离线测量编码CPU耗时和压缩率"""
+    default_pcm = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                               'aiuiv3-demo-master', 'resource', 'weather.pcm')
+
+    parser = argparse.ArgumentParser(description="上行音频编码CPU耗时测量")
+    parser.add_argument('--encoding', default='opus-wb', help="编码（raw / opus-wb）")
+    parser.add_argument('--audio', default=default_pcm, help="PCM文件（16k 16bit单声道）")
+    parser.add_argument('--frame-bytes', type=int, default=1280, help="每帧字节数（40ms为1280）")
+    parser.add_argument('--bitrate', type=int, default=24000, help="目标码率（bit/s）")
+    parser.add_argument('--complexity', type=int, default=5, help="编码复杂度0-10")
+    args = parser.parse_args()
+
+    with open(args.audio, 'rb') as f:
+        audio = f.read()
+
+    kwargs = {}
+    if args.encoding != RAW:
+        kwargs = {'bitrate': args.bitrate, 'complexity': args.complexity}
+    worker = UplinkEncoderWorker(create_encoder(args.encoding, **kwargs), lambda *a: None)
+
+    n = len(audio) // args.frame_bytes
+    for i in range(n):
+        status = 0 if i == 0 else 2 if i == n - 1 else 1
+        worker.submit(audio[i * args.frame_bytes:(i + 1) * args.frame_bytes], status)
+    worker.close()
+
+    stats = worker.stats()
+    frame_ms = args.frame_bytes / 32
+    print(f"编码:         {stats['encoding']}")
+    print(f"帧数:         {stats['frames']}（每帧 {frame_ms:.0f} ms）")
+    print(f"每帧CPU:      平均 {stats['cpu_us_per_frame']} us，最大 {stats['max_cpu_us']} us"
+          f"（占实时 {stats['cpu_us_per_frame'] / (frame_ms * 10):.2f}%）")
+    print(f"上行码率:     {stats['bytes_out'] * 8 / (stats['frames'] * frame_ms):.1f} kbit/s"
+          f"（base64后 {stats['bytes_out'] * 8 * 4 / 3 / (stats['frames'] * frame_ms):.1f} kbit/s）")
+    print(f"压缩比:       {stats['ratio']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+上行静音抑制
+唤醒后用户开口前的静音只保留最后一小段（保护间隔）再随语音一起上传，
+说完后连续静音超过拖尾时长即发送尾帧结束上行；
+首帧/中间帧/尾帧的status仍按协议顺序为 0 → 1 … → 2
+"""
+
+from collections import deque
+
+from barge_in import EnergyVAD
+
+
+class SilenceGate:
+    """按本地VAD决定哪些上行帧需要发送"""
+
+    def __init__(self, vad=None, guard_frames=8, hangover_frames=20):
+        """初始化
+
+        Args:
+            vad: EnergyVAD实例，None则使用适合上行的低阈值
+            guard_frames: 语音起点之前保留的帧数（40ms帧，默认320ms），避免切掉字头
+            hangover_frames: 语音之后连续多少帧静音即结束上行（默认800ms）
+        """
+        self.vad = vad or EnergyVAD(threshold=300, min_speech_frames=3)
+        self.guard_frames = max(guard_frames, self.vad.min_speech_frames)
+        self.hangover_frames = hangover_frames
+        self.reset()
+
+    def reset(self):
+        """开始新一轮上行"""
+        self.vad.reset()
+        self._held = deque(maxlen=self.guard_frames)
+        self._sent = 0
+        self._silence = 0
+        self.finished = False
+
+        # 统计
+        self.frames_in = 0
+        self.frames_skipped = 0
+
+    @property
+    def started(self):
+        """是否已检测到语音并开始上行"""
+        return self._sent > 0
+
+    @property
+    def frames_sent(self):
+        return self._sent
+
+    def process(self, frame, last=False):
+        """处理一帧采集音频
+
+        Args:
+            frame: 16bit PCM帧
+            last: 是否为本轮最后一帧采集数据
+
+        Returns:
+            list: 需要发送的 [(帧, status)]，可能为空
+        """
+        if self.finished:
+            return []
+
+        self.frames_in += 1
+        speech = self.vad.process(frame)
+
+        if not self.started:
+            if len(self._held) == self._held.maxlen:
+                self.frames_skipped += 1
+            self._held.append(frame)
+            if not speech:
+                # 开口前采集结束：什么也不发送
+                if last:
+                    self.frames_skipped += len(self._held)
+                    self._held.clear()
+                    self.finished = True
+                return []
+
+            # 语音起点：连同保护间隔内的帧一起发送
+            frames = list(self._held)
+            self._held.clear()
+            return self._emit(frames, last)
+
+        if speech:
+            self._silence = 0
+        else:
+            self._silence += 1
+
+        return self._emit([frame], last or self._silence >= self.hangover_frames)
+
+    def _emit(self, frames, end):
+        out = []
+        for i, frame in enumerate(frames):
+            if self._sent == 0:
+                status = 0
+            elif end and i == len(frames) - 1:
+                status = 2
+            else:
+                status = 1
+            out.append((frame, status))
+            self._sent += 1
+
+        if end:
+            self.finished = True
+            if out[-1][1] != 2:
+                # 只有一帧语音就结束时补发一个空尾帧
+                out.append((b'', 2))
+        return out
+
+    def stats(self):
+        return {
+            'frames_in': self.frames_in,
+            'frames_sent': self._sent,
+            'frames_skipped': self.frames_skipped,
+        }
@@ -9,23 +9,33 @@ import os
 import time
 import wave
 import json
-import base64
-import hashlib
-import hmac
 from datetime import datetime
-from time import mktime
-from urllib.parse import urlencode, urlparse
-from wsgiref.handlers import format_date_time
 import _thread as thread
+import threading
 import traceback
 
 import websocket
 import pyaudio
+import numpy as np
 
 # 添加xfmic目录到路径以导入RK3328控制器
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'xfmic'))
 from rk3328_controller import RK3328Controller
 
+from aiui_decoder import AIUIResponseDecoder
+from aiui_protocol import generate_auth_url, build_audio_request
+from tts_player import StreamingTTSPlayer
+from barge_in import BargeInMonitor
+from tts_cache import TTSCache, CachedTTSRouter
+from tts_codec import TTSDownlink
+from uplink_encoder import UplinkEncoderWorker, create_encoder
+from uplink_gate import SilenceGate
+from capture_source import create_capture_source, select_channels, to_pcm
+from turn_trace import TurnTracer
+from iat_assembler import IATAssembler
+from local_commands import LocalCommandDispatcher, DEFAULT_COMMANDS
+from intent_aggregator import IntentAggregator
+
 
 # ============= AIUI 配置 =============
 # 请在 https://console.xfyun.cn/app/myapp 创建应用获取以下参数
@@ -46,6 +56,22 @@ SCENE = "main_box"
 # 可选：x5_lingxiaoyue_flow, x5_lingxiaoyue, x5_yefang 等
 VCN = "x5_lingxiaoyue_flow"
 
+# TTS合成音频格式
+# encoding: raw为PCM；lame为mp3，下行带宽约为raw的1/8，需要本机安装mpg123或ffmpeg，否则自动回退raw
+TTS_AUDIO_FORMAT = {
+    "channels": 1,
+    "bit_depth": 16,
+    "sample_rate": 16000,
+    "encoding": "raw"
+}
+
+# TTS缓存目录，重复的回复直接播放本地音频；None表示不缓存
+TTS_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tts_cache')
+TTS_CACHE_MEMORY_BYTES = 8 * 1024 * 1024
+
+# 单轮交互追踪文件（JSON Lines，按大小轮转）
+TRACE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'traces', 'turn_trace.jsonl')
+
 # 音频参数（RK3328输出格式）
 SAMPLE_RATE = 16000
 CHANNELS = 1
@@ -53,25 +79,62 @@ SAMPLE_WIDTH = 2  # 16-bit = 2 bytes
 CHUNK_SIZE = 1280  # 每40ms发送1280字节（16000*2/1000*40）
 FRAME_INTERVAL = 0.04  # 40ms
 
+# 上行音频编码：raw为PCM（256 kbit/s）；opus-wb约24 kbit/s，需要安装opuslib，否则自动回退raw
+# 可用 python3 uplink_encoder.py 测量本机每帧编码CPU耗时
+UPLINK_ENCODING = "raw"
+
+# 上行静音抑制：开口前的静音只上传最后320ms，说完后静音800ms即发送尾帧
+UPLINK_SILENCE_SUPPRESSION = False
+
+# 采集源：pyaudio为声卡；Linux板上可用 alsa:hw:1,0 直接从ALSA采集（arecord，周期更小、无逐帧分配）；
+# 无声卡调试可用 file:录音.wav / tone:440:3 / noise:300:3 / pipe:-
+CAPTURE_SOURCE = "pyaudio"
+
+# 采集声道数：固件输出原始阵列/参考声道时设为实际声道数（如环形6麦+2路参考为8），
+# 上行取 UPLINK_CHANNEL 声道（None表示把所有声道混为单声道）
+CAPTURE_CHANNELS = 1
+UPLINK_CHANNEL = 0
+
+# 多声道原始录音保存目录（离线调参用），None表示不保存
+RAW_CAPTURE_DIR = None
+
+# 上行帧状态名称
+FRAME_STATUS_NAMES = {0: "首帧", 1: "中间帧", 2: "尾帧"}
+
+# 播放TTS时是否用本地VAD检测用户插话并打断播放
+# 扬声器回声较大时可能误触发，需要配合回声消除或调高阈值使用
+BARGE_IN_VAD = False
+
+# 本地指令短语表：识别中间结果命中即在本地执行，不等云端回复
+# 只放有本地处理函数的指令（目前只有"停止"），其余交给云端语义
+LOCAL_COMMANDS = {'stop': DEFAULT_COMMANDS['stop']}
+
 
 class VoiceInteractionSystem:
     """语音交互系统主类"""
 
-    def __init__(self, serial_port, audio_device_index=None):
+    def __init__(self, serial_port, audio_device_index=None, audio=None, capture_source=None,
+                 tracer=None, speed=1.0):
         """初始化语音交互系统
 
         Args:
             serial_port: RK3328串口设备路径
             audio_device_index: 音频输入设备索引
+            audio: PyAudio实例（或NullAudioOutput等同接口的输出设备），None时新建PyAudio
+            capture_source: 采集源描述（见 create_capture_source），None使用CAPTURE_SOURCE
+            tracer: TurnTracer，None时写入TRACE_FILE
+            speed: 非声卡采集源和上行发送的速度倍数，1.0为实时，0为不限速（基准测试用）
         """
         self.serial_port = serial_port
         self.audio_device_index = audio_device_index
+        self.capture_source = capture_source or CAPTURE_SOURCE
+        self.speed = speed
 
         # RK3328控制器
         self.rk3328 = None
 
         # PyAudio
-        self.audio = pyaudio.PyAudio()
+        self.audio = audio if audio is not None else pyaudio.PyAudio()
         self.audio_stream = None
 
         # WebSocket连接
@@ -83,8 +146,49 @@ class VoiceInteractionSystem:
         self.is_listening = False
         self.session_id = None
 
-        # TTS音频缓冲
-        self.tts_audio_buffer = []
+        # 单轮交互追踪
+        self.tracer = tracer or TurnTracer(TRACE_FILE)
+        self.trace = None
+
+        # 流式TTS播放器：常驻播放线程持有输出流，收到首个分片即开始播放
+        self.tts_player = StreamingTTSPlayer(self.audio, on_finish=self._on_playback_finish)
+        self.tts_player.start()
+
+        # TTS缓存：回复文本命中时直接播放本地音频
+        self.tts_cache = TTSCache(TTS_CACHE_DIR, memory_budget=TTS_CACHE_MEMORY_BYTES) if TTS_CACHE_DIR else None
+        self.tts_router = CachedTTSRouter(self.tts_cache, self.tts_player, VCN, TTS_AUDIO_FORMAT)
+
+        # TTS下行：压缩编码的分片边收边解码，PCM交给缓存路由
+        self.tts_downlink = TTSDownlink(TTS_AUDIO_FORMAT, self.tts_router.on_remote_audio)
+        self.nlp_parts = []
+
+        # 识别结果增量拼接，中间结果同时交给本地指令匹配
+        self.iat = IATAssembler()
+        self.local_commands = LocalCommandDispatcher(LOCAL_COMMANDS)
+        self.local_commands.register('stop', self._on_local_stop)
+
+        # 播放期间本地VAD打断：监听线程中立即停止播放，再置标志由主循环发起新一轮交互
+        self.barge_in_event = threading.Event()
+        self.barge_in_monitor = None
+        if BARGE_IN_VAD:
+            self.barge_in_monitor = BargeInMonitor(self.audio, self.tts_player,
+                                                   self._on_vad_barge_in,
+                                                   device_index=audio_device_index)
+
+        # AIUI响应解码器：按payload键分发，只解码有订阅者的结果
+        self.decoder = AIUIResponseDecoder()
+        self.decoder.on_error(self._on_aiui_error)
+        self.decoder.subscribe('event', self._parse_event)
+        self.decoder.subscribe('iat', self._parse_iat)
+        self.decoder.subscribe('nlp', self._parse_nlp)
+        self.decoder.subscribe('cbm_semantic', self._parse_semantic)
+        self.decoder.subscribe('tts', self._parse_tts)
+        self.decoder.on_frame(self._on_aiui_frame)
+
+        # 多意图结果按意图序号组装，每个意图的技能结果到达即回调
+        self.intents = IntentAggregator()
+        self.intents.attach(self.decoder)
+        self.intents.on_intent(self._on_intent_ready)
 
         print("=" * 70)
         print("RK3328 环形麦克风阵列语音交互系统")
@@ -116,7 +220,7 @@ class VoiceInteractionSystem:
         print("\n[2/3] 连接AIUI云端服务...")
 
         # 生成鉴权URL
-        handshake_url = self._generate_auth_url()
+        handshake_url = generate_auth_url(AIUI_URL, AIUI_API_KEY, AIUI_API_SECRET)
 
         # 创建WebSocket连接
         self.ws = websocket.WebSocketApp(
@@ -143,43 +247,6 @@ class VoiceInteractionSystem:
             print("✗ AIUI连接超时")
             return False
 
-    def _generate_auth_url(self):
-        """生成AIUI鉴权URL"""
-        host = urlparse(AIUI_URL).netloc
-        path = urlparse(AIUI_URL).path
-
-        # 生成RFC1123格式时间戳
-        now = datetime.now()
-        date = format_date_time(mktime(now.timetuple()))
-
-        # 拼接签名原文
-        signature_origin = f"host: {host}\n"
-        signature_origin += f"date: {date}\n"
-        signature_origin += f"GET {path} HTTP/1.1"
-
-        # HMAC-SHA256加密
-        signature_sha = hmac.new(
-            AIUI_API_SECRET.encode('utf-8'),
-            signature_origin.encode('utf-8'),
-            digestmod=hashlib.sha256
-        ).digest()
-
-        signature_sha_base64 = base64.b64encode(signature_sha).decode('utf-8')
-
-        # 生成authorization
-        authorization_origin = f'api_key="{AIUI_API_KEY}", algorithm="hmac-sha256", ' \
-                                f'headers="host date request-line", signature="{signature_sha_base64}"'
-        authorization = base64.b64encode(authorization_origin.encode('utf-8')).decode('utf-8')
-
-        # 拼接URL参数
-        params = {
-            "host": host,
-            "date": date,
-            "authorization": authorization
-        }
-
-        return AIUI_URL + '?' + urlencode(params)
-
     def _on_ws_open(self, ws):
         """WebSocket连接建立"""
         self.ws_connected = True
@@ -187,105 +254,105 @@ class VoiceInteractionSystem:
 
     def _on_ws_message(self, ws, message):
         """接收AIUI返回消息"""
+        # 本轮下行消息字节数（含iat/nlp/tts），记入追踪
+        if self.trace:
+            self.trace.attrs['downlink_bytes'] = self.trace.attrs.get('downlink_bytes', 0) + len(message)
         try:
-            data = json.loads(message)
-            header = data.get('header', {})
-            payload = data.get('payload', {})
-
-            # 检查错误
-            code = header.get('code', 0)
-            if code != 0:
-                print(f"\n✗ AIUI错误: {code}, {json.dumps(data, ensure_ascii=False)}")
-                return
-
-            # 保存session ID
-            if 'sid' in header:
-                self.session_id = header['sid']
-
-            # 调试：显示收到的消息类型
-            msg_types = list(payload.keys())
-            if msg_types:
-                print(f"[AIUI响应] 包含: {', '.join(msg_types)}")
-
-            # 解析各类结果
-            self._parse_event(payload)
-            self._parse_iat(payload)
-            self._parse_nlp(payload)
-            self._parse_tts(payload)
-
-            # 结束标志
-            if header.get('status') == 2:
-                print("\n✓ 交互完成")
-                self._play_tts_audio()
-
+            self.decoder.feed(message)
         except Exception as e:
             print(f"\n✗ 解析消息失败: {e}")
             traceback.print_exc()
 
-    def _parse_event(self, payload):
-        """解析事件结果"""
-        if 'event' in payload:
-            event_text_b64 = payload['event']['text']
-            event_text = base64.b64decode(event_text_b64).decode('utf-8')
-            print(f"\n[事件] {event_text}")
+    def _on_aiui_error(self, frame):
+        """AIUI返回错误码"""
+        print(f"\n✗ AIUI错误: {frame.code}, {json.dumps(frame.header, ensure_ascii=False)}")
+
+    def _on_aiui_frame(self, frame):
+        """每条消息分发完成后的处理"""
+        # 保存session ID
+        if frame.sid:
+            self.session_id = frame.sid
+            if self.trace:
+                self.trace.set_sid(frame.sid)
+
+        # 结束标志
+        if frame.status == 2:
+            print("\n✓ 交互完成")
+            # 解码进程的剩余输出在后台等待，全部交付后再结束本轮播放
+            self.tts_downlink.end(self._on_tts_done)
+
+    def _on_tts_done(self):
+        """本轮TTS音频全部交付（有解码进程时在后台线程中调用）"""
+        self.tts_router.end()
+
+        # 没有TTS时本轮到此结束，否则在播放结束时写出追踪
+        if self.tts_player.bytes_received == 0:
+            self.tracer.finish(self.trace)
+
+    def _on_playback_finish(self, player, trace):
+        """一轮TTS播放结束（播放线程中调用）"""
+        if trace is None:
+            return
 
-    def _parse_iat(self, payload):
-        """解析语音识别结果"""
-        if 'iat' in payload:
-            iat_json = payload['iat']
-            iat_text_b64 = iat_json['text']
-            iat_text = base64.b64decode(iat_text_b64).decode('utf-8')
+        trace.add_span('playback', player.first_audio_time, player.end_time)
+        trace.attrs['underruns'] = player.underruns
+        self.tracer.finish(trace)
 
-            # 提取识别文本
-            result_text = self._extract_iat_text(iat_text)
-            status = iat_json.get('status', 0)
+    def _parse_event(self, event_text, block, frame):
+        """解析事件结果"""
+        print(f"\n[事件] {event_text}")
 
-            if status == 2:
-                print(f"\n[识别完成] {result_text}")
-            else:
-                print(f"[识别中] {result_text}", end='\r')
+    def _parse_iat(self, iat_data, block, frame):
+        """解析语音识别结果"""
+        # 按wpgs增量拼接识别文本
+        status = block.get('status', 0)
+        stable, unstable = self.iat.feed(iat_data, final=status == 2)
+        # 本轮首帧时self.session_id还未更新，用当前消息的sid
+        self.local_commands.on_update(stable, unstable, status == 2, sid=frame.sid)
+
+        if status == 2:
+            print(f"\n[识别完成] {stable}")
+            if self.trace:
+                self.trace.end('recognition')
+                self.trace.start('nlp')
+        else:
+            if self.trace:
+                self.trace.mark('first_iat')
+            print(f"[识别中] {stable}{unstable}", end='\r')
 
-    def _extract_iat_text(self, iat_json_str):
-        """从IAT结果中提取文本"""
-        try:
-            iat_data = json.loads(iat_json_str)
-            text = ""
-            for ws in iat_data.get('text', {}).get('ws', []):
-                for cw in ws.get('cw', []):
-                    text += cw.get('w', '')
-            return text
-        except:
-            return iat_json_str
-
-    def _parse_nlp(self, payload):
+    def _parse_nlp(self, nlp_text, block, frame):
         """解析语义理解结果"""
-        if 'nlp' in payload:
-            nlp_json = payload['nlp']
-            nlp_text_b64 = nlp_json['text']
-            nlp_text = base64.b64decode(nlp_text_b64).decode('utf-8')
-            print(f"\n[语义结果]\n{nlp_text}")
-
-        # 技能结果
-        if 'cbm_semantic' in payload:
-            semantic_json = payload['cbm_semantic']
-            semantic_text_b64 = semantic_json['text']
-            semantic_text = base64.b64decode(semantic_text_b64).decode('utf-8')
-            semantic_data = json.loads(semantic_text)
-
-            if semantic_data.get('rc') == 0:
-                answer = semantic_data.get('answer', {}).get('text', '')
-                category = semantic_data.get('category', '')
-                print(f"[技能] {category}")
-                print(f"[回复] {answer}")
-
-    def _parse_tts(self, payload):
+        print(f"\n[语义结果]\n{nlp_text}")
+        if self.trace:
+            self.trace.mark('first_nlp')
+
+        # 流式结果拼接完整后即TTS合成的文本，作为缓存键
+        self.nlp_parts.append(nlp_text)
+        if block.get('status') == 2:
+            if self.trace:
+                self.trace.end('nlp')
+            self.tts_router.on_answer_text(''.join(self.nlp_parts))
+
+    def _parse_semantic(self, semantic_data, block, frame):
+        """解析技能结果"""
+        if semantic_data.get('rc') == 0:
+            answer = semantic_data.get('answer', {}).get('text', '')
+            category = semantic_data.get('category', '')
+            print(f"[技能] {category}")
+            print(f"[回复] {answer}")
+
+    def _on_intent_ready(self, intent, turn):
+        """某个意图的技能结果已到达（回调线程中调用）"""
+        if self.trace:
+            self.trace.mark('first_intent')
+        print(f"[意图 {intent.index}] {intent.text} → {intent.category or '未命中技能'}")
+
+    def _parse_tts(self, audio_bytes, block, frame):
         """解析TTS合成音频"""
-        if 'tts' in payload:
-            audio_b64 = payload['tts'].get('audio')
-            if audio_b64:
-                audio_bytes = base64.b64decode(audio_b64)
-                self.tts_audio_buffer.append(audio_bytes)
-                print(f"[TTS] 收到 {len(audio_bytes)} 字节音频")
+        if audio_bytes:
+            if self.trace:
+                self.trace.mark('first_tts')
+            self.tts_downlink.feed(audio_bytes, block.get('encoding'))
 
     def _on_ws_error(self, ws, error):
         """WebSocket错误"""
@@ -305,10 +372,19 @@ class VoiceInteractionSystem:
 
         self.is_listening = True
 
+        if self.barge_in_monitor:
+            self.barge_in_monitor.start()
+
         try:
             while self.is_listening:
-                # 读取RK3328唤醒消息
-                msg = self.rk3328.read_device_message(timeout=1)
+                # 读取RK3328唤醒消息（短超时，及时响应本地VAD打断）
+                msg = self.rk3328.read_device_message(timeout=0.2)
+
+                # 播放期间检测到用户插话（播放已在监听线程中停止）
+                if self.barge_in_event.is_set():
+                    self.barge_in_event.clear()
+                    self.process_voice_interaction(interrupted=True)
+                    continue
 
                 # 调试：显示收到的所有消息
                 if msg:
@@ -339,7 +415,8 @@ class VoiceInteractionSystem:
                         print(f"{'='*70}")
 
                         # 开始录音并发送到AIUI
-                        self.process_voice_interaction()
+                        serial_span = (self.rk3328.last_message_rx_time, time.monotonic())
+                        self.process_voice_interaction(serial_span)
 
                         print(f"\n{'='*70}")
                         print("继续等待唤醒...")
@@ -348,30 +425,80 @@ class VoiceInteractionSystem:
         except KeyboardInterrupt:
             print("\n\n用户中断，退出系统")
 
-    def process_voice_interaction(self):
-        """处理一次完整的语音交互"""
+    def process_voice_interaction(self, serial_span=None, interrupted=False):
+        """处理一次完整的语音交互
+
+        Args:
+            serial_span: 唤醒消息的串口接收区间 (首字节到达时间, 解析完成时间)，用于追踪
+            interrupted: 播放已被本地VAD打断（不必再打断一次）
+        """
+        if self.tts_player.is_playing and not interrupted:
+            # 播放中被唤醒：打断播放，立即开始新一轮
+            self._barge_in()
+
+        # 本轮追踪，turn_id同时作为请求的stmid
+        trace = self.tracer.new_turn(DEVICE_SN)
+        self.trace = trace
+        if serial_span:
+            trace.add_span('serial', *serial_span)
+
         print("\n开始录音 (3秒)...")
 
         # 录制音频
+        trace.start('capture')
         audio_data = self._record_audio(duration=3)
+        trace.end('capture')
 
         if not audio_data:
             print("✗ 录音失败")
+            self.tracer.finish(trace, error='capture')
             return
 
         print(f"✓ 录音完成，共 {len(audio_data)} 字节")
         print("\n发送到AIUI进行识别...")
 
-        # 清空TTS缓冲
-        self.tts_audio_buffer.clear()
+        # 开始新一轮TTS播放
+        self.tts_player.begin(context=trace)
+        self.tts_router.begin()
+        self.tts_downlink.begin()
+        self.nlp_parts = []
+        self.iat.reset()
+        self.local_commands.reset()
+        self.intents.reset()
 
         # 分帧发送音频到AIUI
-        self._send_audio_to_aiui(audio_data)
+        if not self._send_audio_to_aiui(audio_data):
+            self.tracer.finish(trace, no_speech=True)
+            return
 
         # 等待结果
         print("等待识别和语义分析结果...")
         time.sleep(2)
 
+    def _on_vad_barge_in(self):
+        """本地VAD检测到插话（监听线程中调用）：立即停止播放，新一轮交互由主循环发起"""
+        self._barge_in()
+        self.barge_in_event.set()
+
+    def _barge_in(self):
+        """打断当前TTS播放，丢弃上一轮剩余的结果"""
+        print("\n⏹  打断播放")
+        if self.trace:
+            self.trace.attrs['barge_in'] = True
+        self.tts_downlink.cancel()
+        self.tts_player.flush()
+        self.decoder.drop_session(self.session_id)
+
+    def _on_local_stop(self, command, phrase, text, sid):
+        """本地指令"停止"：不再等待本轮云端回复"""
+        print(f"\n⏹  本地指令: {phrase}")
+        if self.trace:
+            self.trace.mark('local_command')
+        self.tts_downlink.cancel()
+        self.tts_player.flush()
+        self.decoder.drop_session(sid)
+        self.tracer.finish(self.trace, local_command=command)
+
     def _record_audio(self, duration=3):
         """录制音频
 
@@ -379,162 +506,145 @@ class VoiceInteractionSystem:
             duration: 录音时长（秒）
 
         Returns:
-            bytes: 音频数据
+            memoryview: 音频数据（预分配缓冲中已录制的部分）
         """
         try:
-            stream = self.audio.open(
-                format=pyaudio.paInt16,
-                channels=CHANNELS,
-                rate=SAMPLE_RATE,
-                input=True,
-                input_device_index=self.audio_device_index,
-                frames_per_buffer=CHUNK_SIZE
-            )
-
-            frames = []
-            num_chunks = int(SAMPLE_RATE / CHUNK_SIZE * duration)
-
-            for i in range(num_chunks):
-                data = stream.read(CHUNK_SIZE, exception_on_overflow=False)
-                frames.append(data)
-                # 显示进度
-                progress = int((i + 1) / num_chunks * 20)
-                print(f"\r录音中: [{'='*progress}{' '*(20-progress)}] {i+1}/{num_chunks}", end='')
+            source = create_capture_source(self.capture_source, audio=self.audio,
+                                           device_index=self.audio_device_index,
+                                           rate=SAMPLE_RATE, channels=CAPTURE_CHANNELS,
+                                           frame_samples=CHUNK_SIZE, speed=self.speed)
+
+            with source:
+                # 文件源打开后才知道实际的采样率和声道数；上行按SAMPLE_RATE声明，不做重采样
+                if source.rate != SAMPLE_RATE:
+                    raise ValueError(f"采集源采样率为 {source.rate} Hz，需要 {SAMPLE_RATE} Hz")
+
+                # 按录音时长和实际帧大小预分配，各帧直接读入对应位置
+                num_chunks = int(SAMPLE_RATE / CHUNK_SIZE * duration)
+                audio = bytearray(num_chunks * source.frame_bytes)
+                view = memoryview(audio)
+                size = 0
+
+                for i in range(num_chunks):
+                    frame = source.read_frame(into=view[size:])
+                    if frame is None:
+                        break
+                    size += len(frame)
+                    # 显示进度
+                    progress = int((i + 1) / num_chunks * 20)
+                    print(f"\r录音中: [{'='*progress}{' '*(20-progress)}] {i+1}/{num_chunks}", end='')
 
             print()  # 换行
-            stream.stop_stream()
-            stream.close()
 
-            return b''.join(frames)
+            if source.channels == 1:
+                return view[:size]
+
+            # 多声道：原始交织数据按需落盘，上行只取所选声道（按步长取出后复制为连续PCM）
+            samples = np.frombuffer(view[:size], dtype='<i2').reshape(-1, source.channels)
+            if RAW_CAPTURE_DIR:
+                self._save_raw_capture(view[:size], source.channels)
+            return to_pcm(select_channels(samples, UPLINK_CHANNEL, downmix=UPLINK_CHANNEL is None))
 
         except Exception as e:
             print(f"\n录音失败: {e}")
             return None
 
+    def _save_raw_capture(self, data, channels):
+        """保存多声道原始录音（WAV，交织）"""
+        try:
+            os.makedirs(RAW_CAPTURE_DIR, exist_ok=True)
+            path = os.path.join(RAW_CAPTURE_DIR,
+                                f"raw_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{channels}ch.wav")
+            with wave.open(path, 'wb') as wf:
+                wf.setnchannels(channels)
+                wf.setsampwidth(2)
+                wf.setframerate(SAMPLE_RATE)
+                wf.writeframes(data)
+            print(f"  原始多声道录音: {path}")
+        except OSError as e:
+            print(f"⚠ 原始录音保存失败: {e}")
+
     def _send_audio_to_aiui(self, audio_data):
         """分帧发送音频到AIUI
 
         Args:
             audio_data: 完整音频数据
+
+        Returns:
+            int: 实际发送的帧数
         """
         if not self.ws_connected:
             print("✗ WebSocket未连接")
-            return
+            self.tracer.finish(self.trace, error='ws')
+            return 0
 
         total_frames = len(audio_data) // CHUNK_SIZE
         offset = 0
+        # 按帧切片时不复制数据
+        audio_view = memoryview(audio_data)
 
         print(f"\n开始向AIUI发送音频...")
         print(f"总帧数: {total_frames}, 每帧: {CHUNK_SIZE} 字节")
 
+        # 编码和发送在编码线程中进行，本线程只按节奏投递PCM帧
+        stmid = self.trace.turn_id
+        uplink = UplinkEncoderWorker(
+            create_encoder(UPLINK_ENCODING, SAMPLE_RATE, CHANNELS),
+            lambda data, status, encoding: self.ws.send(build_audio_request(
+                AIUI_APPID, DEVICE_SN, SCENE, VCN, stmid, status, data,
+                sample_rate=SAMPLE_RATE, channels=CHANNELS,
+                tts_format=self.tts_downlink.request_format, encoding=encoding)))
+
+        # 静音抑制：由本地VAD决定发送哪些帧及其status
+        gate = SilenceGate() if UPLINK_SILENCE_SUPPRESSION else None
+        sent = 0
+
         for i in range(total_frames):
             # 提取音频帧
-            chunk = audio_data[offset:offset + CHUNK_SIZE]
+            chunk = audio_view[offset:offset + CHUNK_SIZE]
             offset += CHUNK_SIZE
+            last = i == total_frames - 1
 
             # 确定状态：0=首帧，1=中间帧，2=尾帧
-            if i == 0:
-                status = 0
-                status_name = "首帧"
-            elif i == total_frames - 1:
-                status = 2
-                status_name = "尾帧"
+            if gate:
+                frames = gate.process(chunk, last)
             else:
-                status = 1
-                status_name = "中间帧"
-
-            # 构造AIUI请求
-            request = self._build_audio_request(chunk, status)
-
-            # 发送
-            self.ws.send(json.dumps(request))
-
-            # 显示发送进度
-            if i == 0 or i == total_frames - 1 or i % 20 == 0:
-                print(f"[WebSocket] 发送 {status_name} ({i+1}/{total_frames})")
-
-            # 控制发送速率
-            time.sleep(FRAME_INTERVAL)
-
-        print(f"✓ 已发送 {total_frames} 帧音频到AIUI云端")
-
-    def _build_audio_request(self, audio_chunk, status):
-        """构造AIUI音频请求
-
-        Args:
-            audio_chunk: 音频数据块
-            status: 帧状态 (0=首帧, 1=中间帧, 2=尾帧)
-
-        Returns:
-            dict: AIUI请求结构
-        """
-        return {
-            "header": {
-                "appid": AIUI_APPID,
-                "sn": DEVICE_SN,
-                "stmid": f"rk3328-{int(time.time())}",
-                "status": status,
-                "scene": SCENE,
-                "interact_mode": "continuous"  # 连续交互模式
-            },
-            "parameter": {
-                "nlp": {
-                    "nlp": {
-                        "compress": "raw",
-                        "format": "json",
-                        "encoding": "utf8"
-                    },
-                    "new_session": True
-                },
-                "tts": {
-                    "vcn": VCN,  # 极速超拟人发音人
-                    "tts": {
-                        "channels": 1,
-                        "bit_depth": 16,
-                        "sample_rate": 16000,
-                        "encoding": "raw"  # PCM格式
-                    }
-                }
-            },
-            "payload": {
-                "audio": {
-                    "encoding": "raw",
-                    "sample_rate": SAMPLE_RATE,
-                    "channels": CHANNELS,
-                    "bit_depth": 16,
-                    "status": status,
-                    "audio": base64.b64encode(audio_chunk).decode()
-                }
-            }
-        }
-
-    def _play_tts_audio(self):
-        """播放TTS合成的音频"""
-        if not self.tts_audio_buffer:
-            return
-
-        print(f"\n播放TTS音频...")
-
-        try:
-            # 合并所有音频数据
-            audio_data = b''.join(self.tts_audio_buffer)
-
-            # 播放
-            stream = self.audio.open(
-                format=pyaudio.paInt16,
-                channels=1,
-                rate=16000,
-                output=True
-            )
-
-            stream.write(audio_data)
-            stream.stop_stream()
-            stream.close()
-
-            print("✓ 播放完成")
-
-        except Exception as e:
-            print(f"✗ 播放失败: {e}")
+                frames = [(chunk, 0 if i == 0 else 2 if last else 1)]
+
+            for frame, status in frames:
+                # 投递给编码线程
+                uplink.submit(frame, status)
+                if sent == 0:
+                    self.trace.start('uplink')
+                    self.trace.start('recognition')
+                if status == 2:
+                    self.trace.end('uplink')
+
+                # 显示发送进度
+                if status != 1 or sent % 20 == 0:
+                    print(f"[WebSocket] 发送 {FRAME_STATUS_NAMES[status]} ({i+1}/{total_frames})")
+                sent += 1
+
+            if gate and gate.finished:
+                break
+
+            # 控制发送速率（被抑制的静音帧不必等待）
+            if frames and self.speed:
+                time.sleep(FRAME_INTERVAL / self.speed)
+
+        uplink.close()
+        stats = uplink.stats()
+        self.trace.attrs['uplink'] = stats
+        if gate:
+            self.trace.attrs['uplink_gate'] = gate.stats()
+
+        if sent == 0:
+            print("⚠️  未检测到语音，本轮不上传")
+            return 0
+
+        print(f"✓ 已发送 {sent} 帧音频到AIUI云端"
+              f"（{stats['encoding']}，{stats['bytes_out']} 字节，每帧编码 {stats['cpu_us_per_frame']} us）")
+        return sent
 
     def cleanup(self):
         """清理资源"""
@@ -546,6 +656,21 @@ class VoiceInteractionSystem:
         if self.ws:
             self.ws.close()
 
+        if self.barge_in_monitor:
+            self.barge_in_monitor.stop()
+
+        if self.tts_player:
+            self.tts_player.stop()
+
+        if self.tts_cache:
+            self.tts_cache.close()
+
+        if self.intents:
+            self.intents.close()
+
+        if self.tracer:
+            self.tracer.close()
+
         if self.audio:
             self.audio.terminate()
 
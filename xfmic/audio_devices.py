@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+音频设备注册表
+枚举音频设备需要初始化PortAudio（扫描所有宿主API，开发板上要几秒），
+这里把枚举结果缓存到磁盘，以ALSA声卡列表（/proc/asound/cards）和ALSA配置
+为键：声卡没有变化时列设备、查找RK3328声卡都不需要初始化PortAudio。
+需要打开音频流时，整个进程共用一个PyAudio实例
+
+    python3 audio_devices.py                 # 列出输入设备
+    python3 audio_devices.py --rk3328        # 只输出RK3328声卡的设备索引（找不到时退出码为1），
+                                             # 匹配到的设备名输出到stderr供确认
+    python3 audio_devices.py --rk3328 --usb-id 1234:abcd   # 按USB id查找
+    python3 audio_devices.py --refresh       # 忽略缓存重新枚举
+
+RK3328降噪板的USB id可用环境变量 RK3328_USB_ID 指定（vendor:product，多个用逗号分隔，
+可用 lsusb 或 cat /proc/asound/card*/usbid 查看）
+"""
+
+import atexit
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+from typing import Dict, List, Optional
+
+
+ALSA_CARDS = '/proc/asound/cards'
+ALSA_CONFIGS = ('/etc/asound.conf', os.path.expanduser('~/.asoundrc'))
+
+CACHE_FILE = os.path.join(
+    os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'),
+    'xiaoyu-robot', 'audio_devices.json')
+
+# RK3328降噪板的识别方式：USB id（vendor:product）或设备/声卡名称片段（不区分大小写）；
+# 不用"USB Audio"这类通用名称，否则任意USB麦克风都会被当成降噪板
+RK3328_USB_IDS = tuple(usb_id.strip().lower()
+                       for usb_id in os.environ.get('RK3328_USB_ID', '').split(',') if usb_id.strip())
+RK3328_NAME_PATTERNS = ('rk3328', 'xfm')
+
+_pyaudio = None
+_pyaudio_lock = threading.Lock()
+_registry = None
+
+
+def get_pyaudio():
+    """进程内共享的PyAudio实例（首次调用时初始化PortAudio）"""
+    global _pyaudio
+    with _pyaudio_lock:
+        if _pyaudio is None:
+            import pyaudio
+            _pyaudio = pyaudio.PyAudio()
+            atexit.register(terminate_pyaudio)
+        return _pyaudio
+
+
+def terminate_pyaudio():
+    """释放共享的PyAudio实例（之后再调用get_pyaudio会重新初始化）"""
+    global _pyaudio
+    with _pyaudio_lock:
+        if _pyaudio is not None:
+            _pyaudio.terminate()
+            _pyaudio = None
+
+
+def alsa_cards() -> List[Dict]:
+    """解析 /proc/asound/cards
+
+    Returns:
+        [{card, id, driver, name, usb_id}]，非Linux系统返回空列表
+    """
+    try:
+        with open(ALSA_CARDS, encoding='utf-8', errors='replace') as f:
+            text = f.read()
+    except OSError:
+        return []
+
+    cards = []
+    for match in re.finditer(r'^\s*(\d+)\s+\[(\S+)\s*\]:\s*(\S+)\s+-\s+(.*)$', text, re.M):
+        card = int(match.group(1))
+        usb_id = None
+        try:
+            with open(f'/proc/asound/card{card}/usbid') as f:
+                usb_id = f.read().strip().lower()
+        except OSError:
+            pass
+
+        cards.append({
+            'card': card,
+            'id': match.group(2),
+            'driver': match.group(3),
+            'name': match.group(4).strip(),
+            'usb_id': usb_id,
+        })
+    return cards
+
+
+def cache_key() -> Optional[str]:
+    """ALSA声卡列表和配置文件的摘要，没有ALSA时返回None（不使用磁盘缓存）"""
+    try:
+        with open(ALSA_CARDS, 'rb') as f:
+            digest = hashlib.sha1(f.read())
+    except OSError:
+        return None
+
+    for path in ALSA_CONFIGS:
+        try:
+            digest.update(f"{path}:{os.stat(path).st_mtime_ns}".encode())
+        except OSError:
+            pass
+    return digest.hexdigest()
+
+
+class DeviceRegistry:
+    """音频设备注册表（枚举结果缓存在内存和磁盘）"""
+
+    def __init__(self, cache_file: Optional[str] = CACHE_FILE):
+        """初始化
+
+        Args:
+            cache_file: 磁盘缓存路径，None表示只缓存在内存
+        """
+        self.cache_file = cache_file
+        self._devices = None
+        self._key = None
+        self._lock = threading.Lock()
+
+    def devices(self) -> List[Dict]:
+        """所有音频设备
+
+        Returns:
+            [{index, name, max_input_channels, max_output_channels, default_sample_rate, card}]，
+            card为设备名中 (hw:N,M) 对应的ALSA声卡号，没有时为None
+        """
+        with self._lock:
+            key = cache_key()
+            if self._devices is not None and key == self._key:
+                return self._devices
+
+            devices = self._load_cache(key)
+            if devices is None:
+                devices = self._scan()
+                self._save_cache(key, devices)
+
+            self._devices, self._key = devices, key
+            return devices
+
+    def input_devices(self) -> List[Dict]:
+        """有输入通道的设备"""
+        return [d for d in self.devices() if d['max_input_channels'] > 0]
+
+    def refresh(self) -> List[Dict]:
+        """忽略缓存重新枚举"""
+        with self._lock:
+            self._devices = None
+            key = cache_key()
+            devices = self._scan()
+            self._save_cache(key, devices)
+            self._devices, self._key = devices, key
+            return devices
+
+    def get(self, index: int) -> Optional[Dict]:
+        """按索引查找设备"""
+        for device in self.devices():
+            if device['index'] == index:
+                return device
+        return None
+
+    def find(self, name: Optional[str] = None, usb_id: Optional[str] = None) -> Optional[int]:
+        """按名称片段或USB id查找输入设备
+
+        Args:
+            name: 设备名或ALSA声卡名中的片段（不区分大小写）
+            usb_id: USB id，形如 "1234:abcd"
+
+        Returns:
+            设备索引，找不到返回None
+        """
+        inputs = self.input_devices()
+
+        if usb_id:
+            cards = {c['card'] for c in alsa_cards() if c['usb_id'] == usb_id.lower()}
+            for device in inputs:
+                if device['card'] in cards:
+                    return device['index']
+
+        if name:
+            pattern = name.lower()
+            cards = {c['card'] for c in alsa_cards()
+                     if pattern in c['id'].lower() or pattern in c['name'].lower()}
+            for device in inputs:
+                if pattern in device['name'].lower() or device['card'] in cards:
+                    return device['index']
+
+        return None
+
+    def find_rk3328(self, usb_ids=None) -> Optional[int]:
+        """查找RK3328降噪板的输入设备（先按USB id，再按名称）
+
+        Args:
+            usb_ids: USB id列表，默认 RK3328_USB_IDS
+
+        Returns:
+            设备索引，找不到返回None；名称匹配只是猜测，调用方应显示设备名让用户确认
+        """
+        for usb_id in usb_ids or RK3328_USB_IDS:
+            index = self.find(usb_id=usb_id)
+            if index is not None:
+                return index
+
+        for pattern in RK3328_NAME_PATTERNS:
+            index = self.find(name=pattern)
+            if index is not None:
+                return index
+
+        return None
+
+    def _scan(self) -> List[Dict]:
+        """用共享的PyAudio实例枚举设备"""
+        audio = get_pyaudio()
+        devices = []
+        for i in range(audio.get_device_count()):
+            info = audio.get_device_info_by_index(i)
+            match = re.search(r'\(hw:(\d+),\d+\)', info['name'])
+            devices.append({
+                'index': i,
+                'name': info['name'],
+                'max_input_channels': info['maxInputChannels'],
+                'max_output_channels': info['maxOutputChannels'],
+                'default_sample_rate': info['defaultSampleRate'],
+                'card': int(match.group(1)) if match else None,
+            })
+        return devices
+
+    def _load_cache(self, key):
+        if key is None or not self.cache_file:
+            return None
+        try:
+            with open(self.cache_file, encoding='utf-8') as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if cached.get('key') != key:
+            return None
+        return cached.get('devices')
+
+    def _save_cache(self, key, devices):
+        if key is None or not self.cache_file:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+            tmp = f"{self.cache_file}.{os.getpid()}.tmp"
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump({'key': key, 'devices': devices}, f, ensure_ascii=False)
+            os.replace(tmp, self.cache_file)
+        except OSError as e:
+            print(f"⚠ 设备缓存写入失败: {e}")
+
+
+def get_registry() -> DeviceRegistry:
+    """进程内共享的设备注册表"""
+    global _registry
+    if _registry is None:
+        _registry = DeviceRegistry()
+    return _registry
+
+
+def print_input_devices(indent: str = '  ', details: bool = False):
+    """打印输入设备列表"""
+    for device in get_registry().input_devices():
+        print(f"{indent}[{device['index']}] {device['name']}")
+        if details:
+            print(f"{indent}    采样率: {int(device['default_sample_rate'])} Hz")
+            print(f"{indent}    输入通道: {device['max_input_channels']}")
+
+
+def main():
+    args = sys.argv[1:]
+    registry = get_registry()
+
+    if '--refresh' in args:
+        registry.refresh()
+
+    if '--rk3328' in args:
+        usb_ids = None
+        if '--usb-id' in args and args.index('--usb-id') + 1 < len(args):
+            usb_ids = [args[args.index('--usb-id') + 1]]
+
+        index = registry.find_rk3328(usb_ids)
+        if index is None:
+            sys.exit(1)
+        print(f"RK3328: [{index}] {registry.get(index)['name']}", file=sys.stderr)
+        print(index)
+        return
+
+    print_input_devices(details='-v' in args)
+
+
+if __name__ == '__main__':
+    main()
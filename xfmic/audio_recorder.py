@@ -10,6 +10,9 @@ import numpy as np
 from typing import Callable, Optional
 import sys
 
+from audio_devices import get_pyaudio, get_registry
+from capture_metrics import CaptureMetrics
+
 
 class AudioRecorder:
     """音频录制器"""
@@ -35,7 +38,13 @@ class AudioRecorder:
         self.format = format
         self.device_index = device_index
 
-        self.p = pyaudio.PyAudio()
+        # 流式录音的回调测量，record_stream开始时重置
+        self.metrics = CaptureMetrics('audio_recorder', rate, chunk)
+
+    @property
+    def p(self):
+        """进程内共享的PyAudio实例（首次使用时才初始化PortAudio）"""
+        return get_pyaudio()
 
     def list_devices(self):
         """列出所有可用的音频输入设备"""
@@ -43,14 +52,16 @@ class AudioRecorder:
         print("可用音频输入设备：")
         print("="*60)
 
-        for i in range(self.p.get_device_count()):
-            info = self.p.get_device_info_by_index(i)
-            if info['maxInputChannels'] > 0:
-                print(f"\n[设备 {i}]")
-                print(f"  名称: {info['name']}")
-                print(f"  采样率: {int(info['defaultSampleRate'])} Hz")
-                print(f"  输入通道: {info['maxInputChannels']}")
-                print(f"  输出通道: {info['maxOutputChannels']}")
+        # 设备列表来自注册表缓存，声卡没有变化时不重新扫描
+        registry = get_registry()
+        rk3328 = registry.find_rk3328()
+        for info in registry.input_devices():
+            mark = "  ← RK3328" if info['index'] == rk3328 else ""
+            print(f"\n[设备 {info['index']}]{mark}")
+            print(f"  名称: {info['name']}")
+            print(f"  采样率: {int(info['default_sample_rate'])} Hz")
+            print(f"  输入通道: {info['max_input_channels']}")
+            print(f"  输出通道: {info['max_output_channels']}")
 
         print("\n" + "="*60)
 
@@ -136,7 +147,8 @@ class AudioRecorder:
 
         Args:
             callback: 回调函数 callback(audio_data, frame_count)
-                audio_data: numpy数组，int16类型
+                audio_data: numpy数组，int16类型；多声道时形状为 [帧数, 声道]（交织数据的视图，不复制），
+                    单个声道可用 audio_data[:, i] 按步长访问
                 frame_count: 帧数
             duration: 录音时长（秒），None表示无限
         """
@@ -149,6 +161,7 @@ class AudioRecorder:
             frames_per_buffer=self.chunk,
             stream_callback=self._stream_callback_wrapper(callback)
         )
+        self.metrics.reset()
 
         stream.start_stream()
         print("开始流式录音...")
@@ -167,19 +180,22 @@ class AudioRecorder:
 
         stream.stop_stream()
         stream.close()
+        print(f"  {self.metrics.summary()}")
 
     def _stream_callback_wrapper(self, callback: Callable):
         """包装流回调函数"""
         def stream_callback(in_data, frame_count, time_info, status):
-            # 转换为numpy数组
+            # 转换为numpy数组（多声道时按 [帧, 声道] 重排视图）
             audio_data = np.frombuffer(in_data, dtype=np.int16)
+            if self.channels > 1:
+                audio_data = audio_data.reshape(-1, self.channels)
 
             # 调用用户回调
             callback(audio_data, frame_count)
 
             return (in_data, pyaudio.paContinue)
 
-        return stream_callback
+        return self.metrics.wrap(stream_callback)
 
     def record_with_vad(self,
                         output_file: str = 'output.wav',
@@ -243,8 +259,8 @@ class AudioRecorder:
         self._save_wav(output_file, frames)
 
     def close(self):
-        """关闭音频设备"""
-        self.p.terminate()
+        """关闭音频设备（共享的PortAudio上下文在进程退出时释放）"""
+        self.metrics.close()
 
 
 def main():
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+采集回调测量
+包装PortAudio流回调，统计：
+  - 回调到ADC的延迟（time_info中 current_time - input_buffer_adc_time）
+  - 回调间隔抖动直方图（实际间隔与 frames_per_buffer/rate 的偏差）
+  - 输入溢出/欠载等status标志次数
+  - 回调耗时（墙钟时间和线程CPU时间）及其占缓冲周期的比例
+回调中只做计数和比较，不分配内存；用 snapshot() / metrics_snapshot() 读出，
+据此确定 frames_per_buffer 和线程优先级
+"""
+
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+
+# PortAudio回调status标志（与pyaudio.paInputUnderflow等取值相同）
+STATUS_FLAGS = {
+    'input_underflow': 0x01,
+    'input_overflow': 0x02,
+    'output_underflow': 0x04,
+    'output_overflow': 0x08,
+    'priming_output': 0x10,
+}
+
+# 抖动直方图桶上限（毫秒，|实际间隔 - 期望间隔|）
+JITTER_BUCKETS_MS = (0.5, 1, 2, 5, 10, 20, 50, 100)
+
+# 进程内所有测量实例，供 metrics_snapshot() 汇总
+_registry: Dict[str, 'CaptureMetrics'] = {}
+_registry_lock = threading.Lock()
+
+
+class CaptureMetrics:
+    """一路采集流的回调测量"""
+
+    def __init__(self, name: str, rate: int, frames_per_buffer: Optional[int] = None,
+                 register: bool = True):
+        """初始化
+
+        Args:
+            name: 名称，作为 metrics_snapshot() 中的键（同名实例会替换旧实例）
+            rate: 采样率
+            frames_per_buffer: 打开流时的缓冲帧数，None时按每次回调的frame_count计算期望间隔
+            register: 是否登记到进程内注册表
+        """
+        self.name = name
+        self.rate = rate
+        self.frames_per_buffer = frames_per_buffer
+        self.reset()
+
+        if register:
+            with _registry_lock:
+                _registry[name] = self
+
+    def reset(self):
+        """清零所有计数"""
+        self.callbacks = 0
+        self.frames = 0
+        self.status_counts = dict.fromkeys(STATUS_FLAGS, 0)
+
+        self.adc_latency_sum = 0.0
+        self.adc_latency_samples = 0
+        self.adc_latency_max = 0.0
+
+        self.jitter_histogram = [0] * (len(JITTER_BUCKETS_MS) + 1)
+        self.jitter_max = 0.0
+        self.late_callbacks = 0
+
+        self.wall_sum = 0.0
+        self.wall_max = 0.0
+        self.cpu_sum = 0.0
+        self.cpu_max = 0.0
+
+        self._last_time = None
+
+    def wrap(self, callback: Callable) -> Callable:
+        """包装PortAudio流回调 callback(in_data, frame_count, time_info, status)
+
+        Returns:
+            签名相同的回调，传给 stream_callback
+        """
+        def instrumented(in_data, frame_count, time_info, status):
+            wall_start = time.perf_counter()
+            cpu_start = time.thread_time()
+            self._record_arrival(wall_start, frame_count, time_info, status)
+
+            try:
+                return callback(in_data, frame_count, time_info, status)
+            finally:
+                wall = time.perf_counter() - wall_start
+                cpu = time.thread_time() - cpu_start
+                self.wall_sum += wall
+                self.cpu_sum += cpu
+                if wall > self.wall_max:
+                    self.wall_max = wall
+                if cpu > self.cpu_max:
+                    self.cpu_max = cpu
+
+        return instrumented
+
+    def _record_arrival(self, now, frame_count, time_info, status):
+        self.callbacks += 1
+        self.frames += frame_count
+
+        if status:
+            for key, flag in STATUS_FLAGS.items():
+                if status & flag:
+                    self.status_counts[key] += 1
+
+        # 部分后端不提供ADC时间（为0）
+        if time_info:
+            adc_time = time_info.get('input_buffer_adc_time', 0)
+            current_time = time_info.get('current_time', 0)
+            if adc_time and current_time:
+                latency = current_time - adc_time
+                self.adc_latency_sum += latency
+                self.adc_latency_samples += 1
+                if latency > self.adc_latency_max:
+                    self.adc_latency_max = latency
+
+        last, self._last_time = self._last_time, now
+        if last is None:
+            return
+
+        period = (self.frames_per_buffer or frame_count) / self.rate
+        interval = now - last
+        deviation = abs(interval - period)
+        if deviation > self.jitter_max:
+            self.jitter_max = deviation
+        if interval > period * 1.5:
+            self.late_callbacks += 1
+
+        deviation_ms = deviation * 1000
+        bucket = 0
+        while bucket < len(JITTER_BUCKETS_MS) and deviation_ms > JITTER_BUCKETS_MS[bucket]:
+            bucket += 1
+        self.jitter_histogram[bucket] += 1
+
+    @property
+    def overflows(self) -> int:
+        return self.status_counts['input_overflow']
+
+    @property
+    def underflows(self) -> int:
+        return self.status_counts['input_underflow'] + self.status_counts['output_underflow']
+
+    def snapshot(self) -> dict:
+        """当前测量结果（时间单位：毫秒）"""
+        callbacks = self.callbacks
+        period = (self.frames_per_buffer or (self.frames / callbacks if callbacks else 0)) / self.rate
+
+        histogram = {}
+        lower = 0
+        for upper, count in zip(JITTER_BUCKETS_MS + (None,), self.jitter_histogram):
+            histogram[f"{lower}-{upper}" if upper is not None else f">{lower}"] = count
+            lower = upper
+
+        mean_wall = self.wall_sum / callbacks if callbacks else 0.0
+        mean_cpu = self.cpu_sum / callbacks if callbacks else 0.0
+
+        return {
+            'callbacks': callbacks,
+            'frames': self.frames,
+            'period_ms': round(period * 1000, 2),
+            'adc_latency_ms': {
+                'mean': round(self.adc_latency_sum / self.adc_latency_samples * 1000, 2)
+                if self.adc_latency_samples else None,
+                'max': round(self.adc_latency_max * 1000, 2) if self.adc_latency_samples else None,
+            },
+            'jitter_ms': {
+                'max': round(self.jitter_max * 1000, 2),
+                'histogram': histogram,
+            },
+            'late_callbacks': self.late_callbacks,
+            'status': dict(self.status_counts),
+            'callback_ms': {
+                'wall_mean': round(mean_wall * 1000, 3),
+                'wall_max': round(self.wall_max * 1000, 3),
+                'cpu_mean': round(mean_cpu * 1000, 3),
+                'cpu_max': round(self.cpu_max * 1000, 3),
+            },
+            # 回调平均耗时占缓冲周期的比例，接近1时应加大frames_per_buffer或提高线程优先级
+            'load': round(mean_wall / period, 4) if period else None,
+        }
+
+    def summary(self) -> str:
+        """单行摘要（用于状态行和结束统计）"""
+        snap = self.snapshot()
+        latency = snap['adc_latency_ms']['mean']
+        latency_text = f"{latency:.1f}ms" if latency is not None else "-"
+        return (f"ADC延迟 {latency_text} | 抖动最大 {snap['jitter_ms']['max']:.1f}ms"
+                f" | 溢出 {self.overflows} | 欠载 {self.underflows}"
+                f" | 回调 {snap['callback_ms']['wall_max']:.2f}ms(最长)")
+
+    def close(self):
+        """从注册表中移除"""
+        with _registry_lock:
+            if _registry.get(self.name) is self:
+                del _registry[self.name]
+
+
+def metrics_snapshot() -> Dict[str, dict]:
+    """进程内所有采集流的测量结果 {name: snapshot}"""
+    with _registry_lock:
+        items = list(_registry.items())
+    return {name: metrics.snapshot() for name, metrics in items}
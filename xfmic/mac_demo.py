@@ -60,16 +60,9 @@ def check_audio_input():
     print("\n正在检查音频设备...")
 
     try:
-        import pyaudio
-        p = pyaudio.PyAudio()
+        from audio_devices import get_registry
 
-        input_devices = []
-        for i in range(p.get_device_count()):
-            info = p.get_device_info_by_index(i)
-            if info['maxInputChannels'] > 0:
-                input_devices.append((i, info))
-
-        p.terminate()
+        input_devices = [(info['index'], info) for info in get_registry().input_devices()]
 
         if not input_devices:
             print("\n⚠️  未找到音频输入设备")
@@ -82,7 +75,7 @@ def check_audio_input():
         print(f"\n✓ 找到 {len(input_devices)} 个音频输入设备：")
         for i, (idx, info) in enumerate(input_devices):
             print(f"  [{i}] {info['name']}")
-            print(f"      采样率: {int(info['defaultSampleRate'])} Hz")
+            print(f"      采样率: {int(info['default_sample_rate'])} Hz")
 
         if len(input_devices) == 1:
             device_idx = input_devices[0][0]
@@ -12,6 +12,9 @@ import threading
 import time
 from collections import deque
 
+from audio_devices import get_pyaudio
+from capture_metrics import CaptureMetrics
+
 
 class RealtimeAudioStream:
     """实时音频流处理器"""
@@ -31,16 +34,23 @@ class RealtimeAudioStream:
         self.format = pyaudio.paInt16
         self.channels = 1
 
-        self.p = pyaudio.PyAudio()
         self.stream = None
         self.is_running = False
 
+        # 回调测量（延迟、抖动、溢出、回调耗时）
+        self.metrics = CaptureMetrics('realtime_audio_stream', rate, chunk)
+
         # 音频数据队列
         self.audio_queue = queue.Queue()
 
         # 音频缓冲区（用于VAD等需要历史数据的场景）
         self.buffer = deque(maxlen=int(rate * 2))  # 保留2秒历史数据
 
+    @property
+    def p(self):
+        """进程内共享的PyAudio实例"""
+        return get_pyaudio()
+
     def start(self):
         """启动音频流"""
         if self.is_running:
@@ -55,7 +65,7 @@ class RealtimeAudioStream:
                 input=True,
                 input_device_index=self.device_index,
                 frames_per_buffer=self.chunk,
-                stream_callback=self._audio_callback
+                stream_callback=self.metrics.wrap(self._audio_callback)
             )
 
             self.is_running = True
@@ -78,6 +88,7 @@ class RealtimeAudioStream:
             self.stream.close()
 
         print("✓ 音频流已停止")
+        print(f"  {self.metrics.summary()}")
 
     def _audio_callback(self, in_data, frame_count, time_info, status):
         """
@@ -110,6 +121,15 @@ class RealtimeAudioStream:
         except queue.Empty:
             return None
 
+    def get_metrics(self):
+        """
+        获取回调测量结果
+
+        Returns:
+            dict，见 CaptureMetrics.snapshot()
+        """
+        return self.metrics.snapshot()
+
     def get_buffer_data(self):
         """
         获取缓冲区的所有历史数据
@@ -122,7 +142,7 @@ class RealtimeAudioStream:
     def close(self):
         """关闭音频流"""
         self.stop()
-        self.p.terminate()
+        self.metrics.close()
 
 
 # ==================== 应用示例 ====================
@@ -38,6 +38,9 @@ class RK3328Controller:
         self.ser: Optional[serial.Serial] = None
         self.msg_id = 0
 
+        # 最近一条设备消息首字节到达的时间（time.monotonic），用于延迟追踪
+        self.last_message_rx_time: Optional[float] = None
+
     def connect(self) -> bool:
         """建立串口连接并完成握手
 
@@ -242,9 +245,12 @@ class RK3328Controller:
         """
         start_time = time.time()
         buffer = bytearray()
+        rx_time = None
 
         while time.time() - start_time < timeout:
             if self.ser.in_waiting > 0:
+                if not buffer:
+                    rx_time = time.monotonic()
                 data = self.ser.read(self.ser.in_waiting)
                 buffer.extend(data)
 
@@ -289,6 +295,7 @@ class RK3328Controller:
                                 # 清空已处理的消息
                                 buffer = buffer[total_len:]
 
+                                self.last_message_rx_time = rx_time
                                 return msg
                             except Exception as e:
                                 print(f"解析设备消息失败: {e}")